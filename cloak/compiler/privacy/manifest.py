@@ -1,7 +1,8 @@
+import hashlib
 import json
 import os
 from contextlib import contextmanager
-from typing import ContextManager
+from typing import ContextManager, List, Optional
 
 from cloak.config import cfg
 from cloak.utils.progress_printer import warn_print
@@ -12,6 +13,8 @@ class Manifest:
     cloak_version = 'zkay-version'
     solc_version = 'solc-version'
     cloak_options = 'zkay-options'
+    source_hash = 'source-hash'
+    verifier_names = 'verifier-names'
 
     @staticmethod
     def load(project_dir):
@@ -20,6 +23,41 @@ class Manifest:
             j = json.loads(f.read())
         return j
 
+    @staticmethod
+    def hash_source(code: str) -> str:
+        """Return the hash of the cloak code, which identifies the code the metadata in a manifest was derived from."""
+        return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_verifier_names(project_dir: str, manifest: Optional[dict] = None) -> List[str]:
+        """
+        Return the names of the verification contracts of the cloak contract in project dir.
+
+        The names are taken from the manifest, unless the cloak file was modified after they were recorded,
+        in which case they are derived from the cloak file again (and recorded in the manifest file).
+        """
+        with open(os.path.join(project_dir, 'contract.cloak')) as f:
+            code = f.read()
+        manifest_filename = os.path.join(project_dir, 'manifest.json')
+        if manifest is None and os.path.exists(manifest_filename):
+            manifest = Manifest.load(project_dir)
+
+        source_hash = Manifest.hash_source(code)
+        if manifest is not None and manifest.get(Manifest.source_hash) == source_hash and Manifest.verifier_names in manifest:
+            return manifest[Manifest.verifier_names]
+
+        from cloak.cloak_ast.process_ast import get_verification_contract_names
+        verifier_names = get_verification_contract_names(code)
+        if manifest is not None:
+            manifest[Manifest.source_hash] = source_hash
+            manifest[Manifest.verifier_names] = verifier_names
+            try:
+                with open(manifest_filename, 'w') as f:
+                    f.write(json.dumps(manifest))
+            except OSError:
+                pass
+        return verifier_names
+
     @staticmethod
     def import_manifest_config(manifest):
         # Check if zkay version matches
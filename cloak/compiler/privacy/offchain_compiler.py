@@ -1,7 +1,7 @@
 from contextlib import contextmanager
 from datetime import datetime
 from textwrap import dedent
-from typing import Dict, List, Optional, ContextManager, Set
+from typing import Dict, List, Optional, ContextManager, Set, Tuple
 
 from cloak.compiler.privacy.circuit_generation.circuit_helper import CircuitHelper, HybridArgumentIdf
 from cloak.config import cfg
@@ -445,19 +445,32 @@ class PythonOffchainVisitor(PythonCodeVisitor):
         if ast.can_be_external and circuit:
             # Encrypt parameters and add private circuit inputs (plain + randomness)
             enc_param_str = ''
-            for arg in self.current_params:
-                if arg.annotated_type.is_cipher():
-                    pname = self.visit(arg.idf)
-                    plain_val = pname
-                    plain_t = arg.annotated_type.type_name.plain_type.type_name
-                    if plain_t.is_signed_numeric:
-                        plain_val = self.handle_cast(pname, UintTypeName(f'uint{plain_t.elem_bitwidth}'))
-                    enc_param_str += f'{self.get_priv_value(arg.idf.name)} = {plain_val}\n'
-                    if cfg.is_symmetric_cipher():
-                        my_pk = f'{api("get_my_pk")}()[0]'
-                        enc_param_str += f'{pname} = CipherValue({api("enc")}({self.get_priv_value(arg.idf.name)})[0][:-1] + ({my_pk}, ))\n'
-                    else:
-                        enc_param_str += f'{pname}, {self.get_priv_value(f"{arg.idf.name}_R")} = {api("enc")}({self.get_priv_value(arg.idf.name)})\n'
+            cipher_params = [arg for arg in self.current_params if arg.annotated_type.is_cipher()]
+            for arg in cipher_params:
+                pname = self.visit(arg.idf)
+                plain_val = pname
+                plain_t = arg.annotated_type.type_name.plain_type.type_name
+                if plain_t.is_signed_numeric:
+                    plain_val = self.handle_cast(pname, UintTypeName(f'uint{plain_t.elem_bitwidth}'))
+                enc_param_str += f'{self.get_priv_value(arg.idf.name)} = {plain_val}\n'
+            if len(cipher_params) == 1:
+                arg = cipher_params[0]
+                pname = self.visit(arg.idf)
+                if cfg.is_symmetric_cipher():
+                    my_pk = f'{api("get_my_pk")}()[0]'
+                    enc_param_str += f'{pname} = CipherValue({api("enc")}({self.get_priv_value(arg.idf.name)})[0][:-1] + ({my_pk}, ))\n'
+                else:
+                    enc_param_str += f'{pname}, {self.get_priv_value(f"{arg.idf.name}_R")} = {api("enc")}({self.get_priv_value(arg.idf.name)})\n'
+            elif cipher_params:
+                # Encrypt all parameters in a single batch
+                plains = ', '.join([self.get_priv_value(arg.idf.name) for arg in cipher_params])
+                if cfg.is_symmetric_cipher():
+                    pnames = ', '.join([self.visit(arg.idf) for arg in cipher_params])
+                    my_pk = f'{api("get_my_pk")}()[0]'
+                    enc_param_str += f'{pnames} = [CipherValue(c[:-1] + ({my_pk}, )) for c, _ in {api("enc_many")}([{plains}])]\n'
+                else:
+                    targets = ', '.join([f'({self.visit(arg.idf)}, {self.get_priv_value(f"{arg.idf.name}_R")})' for arg in cipher_params])
+                    enc_param_str += f'{targets} = {api("enc_many")}([{plains}])\n'
 
             enc_param_comment_str = '\n# Encrypt parameters' if enc_param_str else ''
             enc_param_str = enc_param_str[:-1] if enc_param_str else ''
@@ -566,8 +579,22 @@ class PythonOffchainVisitor(PythonCodeVisitor):
     def visitStatementList(self, ast: StatementList):
         if ast.excluded_from_simulation:
             return None
-        else:
-            return super().visitStatementList(ast)
+
+        # Consecutive circuit inputs (e.g. the pre-statements of a private expression) are decrypted with a single dec_many call
+        stmts, inputs = [], []
+        for stmt in ast.statements + [None]:
+            if isinstance(stmt, CircuitInputStatement):
+                inputs.append(stmt)
+                continue
+            if len([i for i in inputs if i.lhs.member.corresponding_priv_expression is not None]) > 1:
+                stmts.append(self.handle_circuit_inputs(inputs))
+            else:
+                stmts += inputs
+            inputs = []
+            if stmt is not None:
+                stmts.append(stmt)
+        b = self.visit_list(stmts)
+        return b if b else 'pass'
 
     def visitBlock(self, ast: Block):
         # Introduce a new virtual local scope when visiting a block
@@ -588,18 +615,37 @@ class PythonOffchainVisitor(PythonCodeVisitor):
         version + the corresponding randomness to the private circuit input dict.
         """
         in_decrypt = ''
+        dec_args = self._get_decryption_args(ast)
+        if dec_args is not None:
+            target, cipher, constr = dec_args
+            in_decrypt += f'\n{target} = {api("dec")}({cipher}, {constr})'
+        return self.visitAssignmentStatement(ast) + in_decrypt
+
+    def handle_circuit_inputs(self, stmts: List[CircuitInputStatement]) -> str:
+        """
+        Generate code which assigns the specified values to several circuit input variables.
+
+        In contrast to visitCircuitInputStatement, all encrypted inputs are decrypted with a single dec_many call
+        after all assignments.
+        """
+        dec_args = [args for args in map(self._get_decryption_args, stmts) if args is not None]
+        targets, ciphers, constrs = zip(*dec_args)
+        in_decrypt = f'{", ".join(f"({t})" for t in targets)} = {api("dec_many")}([{", ".join(ciphers)}], [{", ".join(constrs)}])'
+        return '\n'.join([self.visitAssignmentStatement(stmt) for stmt in stmts] + [in_decrypt])
+
+    def _get_decryption_args(self, ast: CircuitInputStatement) -> Optional[Tuple[str, str, str]]:
+        """Return assignment target, cipher and plain type constructor for decrypting an encrypted circuit input (None if it is not encrypted)."""
         in_idf = ast.lhs.member
         assert isinstance(in_idf, HybridArgumentIdf)
-        if in_idf.corresponding_priv_expression is not None:
-            plain_idf_name = self.get_priv_value(
-                in_idf.corresponding_priv_expression.idf.name)
-            constr = self._get_type_constr(in_idf.t.plain_type.type_name)
-            dec_call = f'{api("dec")}({self.visit(in_idf.get_loc_expr())}, {constr})'
-            if cfg.is_symmetric_cipher():
-                in_decrypt += f'\n{plain_idf_name}, _ = {dec_call}'
-            else:
-                in_decrypt += f'\n{plain_idf_name}, {self.get_priv_value(f"{in_idf.name}_R")} = {dec_call}'
-        return self.visitAssignmentStatement(ast) + in_decrypt
+        if in_idf.corresponding_priv_expression is None:
+            return None
+        plain_idf_name = self.get_priv_value(in_idf.corresponding_priv_expression.idf.name)
+        constr = self._get_type_constr(in_idf.t.plain_type.type_name)
+        if cfg.is_symmetric_cipher():
+            target = f'{plain_idf_name}, _'
+        else:
+            target = f'{plain_idf_name}, {self.get_priv_value(f"{in_idf.name}_R")}'
+        return target, self.visit(in_idf.get_loc_expr()), constr
 
     def visitCircuitComputationStatement(self, ast: CircuitComputationStatement):
         """
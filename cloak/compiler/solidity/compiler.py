@@ -1,13 +1,19 @@
+import hashlib
 import json
 import os
 import pathlib
+import re
+import subprocess
 import tempfile
+import threading
+from collections import OrderedDict
 # get relevant paths
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List
 
-from solcx import compile_standard
-from solcx.exceptions import SolcError
+from solcx.install import get_executable
+from solcx.exceptions import SolcError, SolcNotInstalled
 
+from cloak import my_logging
 from cloak.config import zk_print, cfg
 from cloak.cloak_ast.ast import get_code_error_msg
 
@@ -17,20 +23,184 @@ class SolcException(Exception):
     pass
 
 
+_import_re = re.compile(r'''\bimport\s+(?:[^'";]*?\s+from\s+)?["']([^"']+)["']''')
+
+
+def hash_solidity_sources(sol_filenames: List[str], base_path: str, include_paths: Tuple = ()) -> Dict[str, Optional[str]]:
+    """
+    Return the sha256 hashes of the given solidity files and all files they (transitively) import.
+
+    :return: dictionary containing <path relative to base_path, hash> pairs (hash is None for missing files)
+    """
+    sources, todo = {}, [pathlib.Path(f).absolute() for f in sol_filenames]
+    while todo:
+        path = todo.pop()
+        name = os.path.relpath(path, base_path)
+        if name in sources:
+            continue
+        try:
+            with open(path, 'rb') as f:
+                code = f.read()
+        except OSError:
+            sources[name] = None
+            continue
+        sources[name] = hashlib.sha256(code).hexdigest()
+        for imp in _import_re.findall(code.decode('utf-8', errors='replace')):
+            if imp.startswith('.'):
+                todo.append(pathlib.Path(os.path.normpath(path.parent / imp)))
+            else:
+                candidates = [pathlib.Path(os.path.normpath(pathlib.Path(root) / imp)) for root in (base_path, *include_paths)]
+                todo.append(next((c for c in candidates if c.exists()), candidates[0]))
+    return sources
+
+
+class SolcCache:
+    """
+    Content addressed cache of solc standard-json outputs.
+
+    Outputs are keyed by the source unit names, the contents of all (transitively) imported sources, the compiler
+    settings and the solc version, but not by the location of the files (e.g. the same contract compiled from two
+    temporary directories hits the cache). They are kept in memory (the max_memory_entries most recently used ones)
+    and, depending on cfg.solc_cache, in cfg.data_dir/solc_cache (least recently used files are removed once the
+    directory exceeds max_disk_size bytes).
+    """
+
+    max_memory_entries = 128
+    max_disk_size = 256 * 1024 * 1024
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._outputs: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(json_in: Dict, sol_filenames: List[str], base_path: str, include_paths: Tuple = ()) -> str:
+        """Return the cache key of compiling json_in (whose sources are sol_filenames) with the given import roots."""
+        sources = hash_solidity_sources(sol_filenames, base_path, include_paths)
+        for sol_filename in sol_filenames:
+            # Identify the compiled files by their source unit names instead of their location
+            sources[pathlib.Path(sol_filename).name] = sources.pop(os.path.relpath(pathlib.Path(sol_filename).absolute(), base_path))
+        location_independent_input = {**json_in, 'sources': sorted(json_in['sources'])}
+        key_data = json.dumps({'solc': cfg.solc_version, 'input': location_independent_input, 'sources': sources}, sort_keys=True)
+        return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _cache_file(key: str) -> str:
+        return os.path.join(cfg.data_dir, 'solc_cache', f'{key}.json')
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a (fresh) copy of the cached output or None."""
+        with self._lock:
+            out = self._outputs.get(key)
+            if out is not None:
+                self._outputs.move_to_end(key)
+        if out is None and cfg.solc_cache == 'disk':
+            filename = self._cache_file(key)
+            try:
+                with open(filename) as f:
+                    out = f.read()
+                os.utime(filename)
+            except OSError:
+                pass
+            else:
+                self._remember(key, out)
+
+        with self._lock:
+            if out is None:
+                self.misses += 1
+                my_logging.data('solcCacheMisses', self.misses)
+            else:
+                self.hits += 1
+                my_logging.data('solcCacheHits', self.hits)
+        return None if out is None else json.loads(out)
+
+    def put(self, key: str, output: Dict):
+        out = json.dumps(output)
+        self._remember(key, out)
+        if cfg.solc_cache == 'disk':
+            filename = self._cache_file(key)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(out)
+            os.replace(tmp_filename, filename)
+            self._evict_files(os.path.dirname(filename))
+
+    def _remember(self, key: str, out: str):
+        with self._lock:
+            self._outputs[key] = out
+            self._outputs.move_to_end(key)
+            while len(self._outputs) > self.max_memory_entries:
+                self._outputs.popitem(last=False)
+
+    def _evict_files(self, cache_dir: str):
+        """Remove the least recently used cache files until the cache directory holds at most max_disk_size bytes."""
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+solc_cache = SolcCache()
+
+
 def compile_solidity_json(sol_filename: str, libs: Optional[Dict[str, str]] = None, optimizer_runs: int = -1,
                           output_selection: Tuple = ('metadata', 'evm.bytecode', 'evm.deployedBytecode'),
-                          cwd: str = None) -> Dict:
+                          cwd: str = None, include_paths: Tuple = ()) -> Dict:
     """
     Compile the given solidity file using solc json interface with the provided options.
 
+    Outputs are taken from the solc cache (see SolcCache) if the same sources were already compiled with the same settings.
+
     :param sol_filename: path to solidity file
     :param libs: [OPTIONAL] dictionary containing <LibraryContractName, LibraryContractAddress> pairs, used for linking
     :param optimizer_runs: controls the optimize-runs flag, negative values disable the optimizer
     :param output_selection: determines which fields are included in the compiler output dict
-    :param cwd: working directory
+    :param cwd: base path against which (non-relative) imports are resolved (default: directory of sol_filename)
+    :param include_paths: additional directories in which imports are looked up (requires solc >= 0.8.8)
     :return: dictionary with the compilation results according to output_selection
     """
-    solp = pathlib.Path(sol_filename)
+    return compile_solidity_sources([sol_filename], None, libs, optimizer_runs, output_selection, cwd, include_paths)
+
+
+def compile_solidity_sources(sol_filenames: List[str], contract_names: Optional[Dict[str, List[str]]] = None,
+                             libs: Optional[Dict[str, str]] = None, optimizer_runs: int = -1,
+                             output_selection: Tuple = ('metadata', 'evm.bytecode', 'evm.deployedBytecode'),
+                             cwd: str = None, include_paths: Tuple = ()) -> Dict:
+    """
+    Compile all given solidity files with a single invocation of the solc json interface.
+
+    The results for the individual contracts are contained in output['contracts'][<file name>][<contract name>].
+    Imports are resolved by solc against the base path and include paths (the process working directory is never
+    changed), hence this function can safely be called from multiple threads.
+
+    :param sol_filenames: paths to solidity files (file names must be unique)
+    :param contract_names: [OPTIONAL] dictionary containing <file name, list of contract names> pairs, if given, output is only                            generated for these contracts (and not for any other contracts in the files or their imports)
+    :param libs: [OPTIONAL] dictionary containing <LibraryContractName, LibraryContractAddress> pairs, used for linking all files
+    :param optimizer_runs: controls the optimize-runs flag, negative values disable the optimizer
+    :param output_selection: determines which fields are included in the compiler output dict
+    :param cwd: base path against which (non-relative) imports are resolved (default: directory of the first file)
+    :param include_paths: additional directories in which imports are looked up (requires solc >= 0.8.8)
+    :return: dictionary with the compilation results according to output_selection
+    """
+    solps = [pathlib.Path(f) for f in sol_filenames]
+    if len({solp.name for solp in solps}) != len(solps):
+        raise ValueError(f'Solidity file names must be unique: {sol_filenames}')
+
     json_in = {
         'language': 'Solidity',
         'sources': {
@@ -38,11 +208,14 @@ def compile_solidity_json(sol_filename: str, libs: Optional[Dict[str, str]] = No
                 'urls': [
                     str(solp.absolute())
                 ]
-            }
+            } for solp in solps
         },
         'settings': {
             'outputSelection': {
                 '*': {'*': list(output_selection)}
+            } if contract_names is None else {
+                sol_name: {contract_name: list(output_selection) for contract_name in names}
+                for sol_name, names in contract_names.items()
             },
         }
     }
@@ -55,18 +228,53 @@ def compile_solidity_json(sol_filename: str, libs: Optional[Dict[str, str]] = No
 
     if libs is not None:
         json_in['settings']['libraries'] = {
-            solp.name: libs
+            solp.name: libs for solp in solps
         }
 
-    if cwd is None:
-        cwd = solp.absolute().parent
-    old_cwd = os.getcwd()
-    os.chdir(cwd)
-    ret = compile_standard(json_in, allow_paths='.')
-    os.chdir(old_cwd)
+    base_path = str(solps[0].absolute().parent if cwd is None else pathlib.Path(cwd).absolute())
+    include_paths = tuple(str(pathlib.Path(p).absolute()) for p in include_paths)
+
+    key = None
+    if cfg.solc_cache != 'off':
+        key = solc_cache.key(json_in, sol_filenames, base_path, include_paths)
+        ret = solc_cache.get(key)
+        if ret is not None:
+            return ret
+
+    allow_paths = list(dict.fromkeys([base_path, *include_paths, *(str(solp.absolute().parent) for solp in solps)]))
+    ret = _compile_standard(json_in, base_path, include_paths, allow_paths)
+
+    if key is not None:
+        solc_cache.put(key, ret)
     return ret
 
 
+def _compile_standard(json_in: Dict, base_path: str, include_paths: Tuple, allow_paths: List[str]) -> Dict:
+    """Run solc --standard-json on json_in (like solcx.compile_standard, but with include path support)."""
+    try:
+        solc_binary = get_executable(cfg.solc_version)
+    except SolcNotInstalled:
+        solc_binary = get_executable()
+
+    cmd = [str(solc_binary), '--standard-json', '--base-path', base_path]
+    for include_path in include_paths:
+        cmd += ['--include-path', include_path]
+    cmd += ['--allow-paths', ','.join(allow_paths)]
+
+    stdin_data = json.dumps(json_in)
+    proc = subprocess.run(cmd, input=stdin_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf8')
+    if proc.returncode != 0:
+        raise SolcError(proc.stderr, command=cmd, return_code=proc.returncode, stdin_data=stdin_data,
+                        stdout_data=proc.stdout, stderr_data=proc.stderr)
+
+    output = json.loads(proc.stdout)
+    errors = [error for error in output.get('errors', []) if error['severity'] == 'error']
+    if errors:
+        raise SolcError('\n'.join(error['formattedMessage'] for error in errors), command=cmd, return_code=proc.returncode,
+                        stdin_data=stdin_data, stdout_data=proc.stdout, stderr_data=proc.stderr, error_dict=output['errors'])
+    return output
+
+
 def _get_line_col(code: str, idx: int):
     """ Get line and column (1-based) from character index """
     line = len(code[:idx + 1].splitlines())
@@ -146,11 +354,12 @@ def check_for_cloak_solc_errors(cloak_code: str, fake_solidity_code: str):
     :param fake_solidity_code: Corresponding "fake solidity code"
     """
 
-    # dump fake solidity code into temporary file
-    with tempfile.NamedTemporaryFile('w', suffix='.sol') as f:
-        f.write(fake_solidity_code)
-        f.flush()
-        check_compilation(f.name, True, display_code=cloak_code)
+    # dump fake solidity code into temporary file (with a fixed name, such that the solc cache can be hit)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'contract.sol')
+        with open(filename, 'w') as f:
+            f.write(fake_solidity_code)
+        check_compilation(filename, True, display_code=cloak_code)
 
 
 def compile_solidity_code(code: str, working_directory: Optional[str] = None, optimizer_runs=cfg.opt_solc_optimizer_runs) -> Dict:
@@ -163,12 +372,14 @@ def compile_solidity_code(code: str, working_directory: Optional[str] = None, op
     :return: json compilation output
     """
 
-    with tempfile.NamedTemporaryFile('w', suffix='.sol') as f:
+    # Fixed file name, such that the solc cache can be hit
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'contract.sol')
         if working_directory is None:
-            working_directory = os.path.dirname(f.name)
+            working_directory = tmp_dir
         elif not os.path.exists(working_directory):
             os.makedirs(working_directory)
 
-        f.write(code)
-        f.flush()
-        return compile_solidity_json(f.name, cwd=working_directory, optimizer_runs=optimizer_runs)
+        with open(filename, 'w') as f:
+            f.write(code)
+        return compile_solidity_json(filename, cwd=working_directory, optimizer_runs=optimizer_runs)
@@ -170,6 +170,10 @@ class Config(UserConfig):
         """Names of all solidity libraries in verify_libs.sol, which need to be linked against."""
         return provingschemeparams[self.proving_scheme]['external_sol_libs']
 
+    def use_jvm_pool(self, operation: str) -> bool:
+        """Return true if the java operation should run in the jvm pool instead of a fresh jvm (see jvm_pool_operations)."""
+        return operation in [op.strip() for op in self.jvm_pool_operations.split(',')]
+
     def should_use_hash(self, circuit: 'CircuitHelper') -> bool:
         """
         This function determines whether input hashing is used for a particular circuit.
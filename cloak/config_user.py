@@ -40,22 +40,52 @@ class UserConfig:
         self._crypto_backend: str = 'ecdh-aes'
         self._crypto_backend_values = ['dummy', 'rsa-pkcs1.5', 'rsa-oaep', 'ecdh-aes', 'ecdh-chaskey']
 
+        self._crypto_impl: str = 'python'
+        self._crypto_impl_values = ['python', 'java']
+
+        self._ecdh_key_cache_size: int = 256
+
+        self._jvm_pool_operations: str = ''
+        self._jvm_pool_operations_values = ['compile', 'prove', 'ecdh', 'chaskey']
+        self._jvm_pool_max_workers: int = 1
+
         self._blockchain_backend: str = 'w3-eth-tester'
-        self._blockchain_backend_values = ['w3-eth-tester', 'w3-ganache', 'w3-ipc', 'w3-websocket', 'w3-http', 'w3-custom']
+        self._blockchain_backend_values = ['w3-eth-tester', 'w3-ganache', 'w3-ipc', 'w3-websocket', 'w3-http', 'w3-http-async', 'w3-custom']
 
         self._cloak_network: str = 'w3-ccf'
         self._cloak_network_values = ['w3-ccf']
+        self._ccf_transport: str = 'tester'
+        self._ccf_transport_values = ['tester', 'pooled']
+
+        self._keystore_backend: str = 'simple'
+        self._keystore_backend_values = ['simple', 'sqlite']
+        self._keystore_pk_cache_blocks: int = 5760
+        self._state_prefetch: bool = True
+        self._deployment_registry: str = 'confirm'
+        self._reverify: bool = False
+        self._deployment_registry_values = ['confirm', 'trust', 'off']
+        self._strict_state_reads: bool = True
+        self._pipelined_transactions: bool = False
+        self._gas_estimate_cache: bool = False
+        self._special_variables_cache: str = 'head'
+        self._special_variables_cache_values = ['head', 'subscription', 'off']
 
         self._blockchain_node_uri: Union[Any, str, None] = 'http://localhost:7545'
         self._blockchain_pki_address: str = ''
         self._blockchain_service_address: str = ''
         self._blockchain_crypto_lib_addresses: str = ''
         self._blockchain_default_account: Union[int, str, None] = 0
+        self._blockchain_http_pool_size: int = 10
+        self._blockchain_http_keepalive: bool = True
+        self._blockchain_http_timeout: int = 10
+        self._blockchain_signing_keys: str = ''
 
         self._indentation: str = ' ' * 4
         self._libsnark_check_verify_locally_during_proof_generation: bool = False
 
         self._opt_solc_optimizer_runs: int = 50
+        self._solc_cache: str = 'disk'
+        self._solc_cache_values = ['disk', 'memory', 'off']
         self._opt_hash_threshold: int = 1
         self._opt_eval_constexpr_in_circuit: bool = True
         self._opt_cache_circuit_inputs: bool = True
@@ -108,6 +138,76 @@ class UserConfig:
         _check_is_one_of(val, self._crypto_backend_values)
         self._crypto_backend = val
 
+    @property
+    def crypto_impl(self) -> str:
+        """
+        Implementation of the elliptic curve key derivation and key exchange used by the ecdh-aes and ecdh-chaskey backends,
+        and of the Chaskey-LTS cipher used by ecdh-chaskey.
+
+        python : in-process implementation
+        java   : reference implementation in the jsnark interface jar (see jvm_pool_operations)
+
+        Available Options: [python, java]
+        """
+        return self._crypto_impl
+
+    @crypto_impl.setter
+    def crypto_impl(self, val: str):
+        _check_is_one_of(val, self._crypto_impl_values)
+        self._crypto_impl = val
+
+    @property
+    def ecdh_key_cache_size(self) -> int:
+        """
+        Maximum number of ecdh shared keys (per own address and peer public key) which are cached by the ecdh-* backends.
+
+        0 disables the cache.
+        """
+        return self._ecdh_key_cache_size
+
+    @ecdh_key_cache_size.setter
+    def ecdh_key_cache_size(self, val: int):
+        _type_check(val, int)
+        if val < 0:
+            raise ValueError(f'Invalid config value {val}, must not be negative')
+        self._ecdh_key_cache_size = val
+
+    @property
+    def jvm_pool_operations(self) -> str:
+        """
+        Comma separated list of the java operations which run in a pool of long-lived jvm processes.
+
+        Operations which are not listed launch a new jvm on every call (by default, all operations do).
+        compile : jsnark circuit compilation
+        prove   : jsnark circuit evaluation during proof generation
+        ecdh    : ecdh key derivation (only if crypto_impl is java)
+        chaskey : chaskey encryption (only if crypto_impl is java)
+        """
+        return self._jvm_pool_operations
+
+    @jvm_pool_operations.setter
+    def jvm_pool_operations(self, val: str):
+        _type_check(val, str)
+        for op in filter(None, val.split(',')):
+            _check_is_one_of(op.strip(), self._jvm_pool_operations_values)
+        self._jvm_pool_operations = val
+
+    @property
+    def jvm_pool_max_workers(self) -> int:
+        """
+        Maximum number of concurrently running jvm pool processes (per cloak process).
+
+        Every jvm process reserves a large heap, so this should be kept small.
+        """
+        return self._jvm_pool_max_workers
+
+    @jvm_pool_max_workers.setter
+    def jvm_pool_max_workers(self, val: int):
+        _type_check(val, int)
+        if val < 1:
+            raise ValueError(f'Invalid config value {val}, must be positive')
+        self._jvm_pool_max_workers = val
+
     @property
     def blockchain_backend(self) -> str:
         """
@@ -116,7 +216,9 @@ class UserConfig:
         Running unit tests is only supported with w3-eth-tester and w3-ganache at the moment (because they need pre-funded dummy accounts).
         See https://web3py.readthedocs.io/en/stable/providers.html for more information.
 
-        Available Options: [w3-eth-tester, w3-ganache, w3-ipc, w3-websocket, w3-http, w3-custom]
+        w3-http-async additionally provides awaitable read APIs (see Web3AsyncHttpBlockchain).
+
+        Available Options: [w3-eth-tester, w3-ganache, w3-ipc, w3-websocket, w3-http, w3-http-async, w3-custom]
         """
         return self._blockchain_backend
 
@@ -142,6 +244,173 @@ class UserConfig:
         _check_is_one_of(val, self._cloak_network_values)
         self._cloak_network = val
 
+    @property
+    def ccf_transport(self) -> str:
+        """
+        How the w3-ccf backend connects to the cloak TEE network.
+
+        tester : in-process ethereum tester chain which stands in for the TEE network
+        pooled : CCF node configured in cloak/transaction/blockchain/ccf_config.py, requests share a pool of
+                 cfg.blockchain_http_pool_size keep-alive connections
+
+        Available Options: [tester, pooled]
+        """
+        return self._ccf_transport
+
+    @ccf_transport.setter
+    def ccf_transport(self, val: str):
+        _check_is_one_of(val, self._ccf_transport_values)
+        self._ccf_transport = val
+
+    @property
+    def keystore_backend(self) -> str:
+        """
+        Backend which stores the local key pairs and caches the public keys of other accounts.
+
+        simple : in-memory keystore, keys are loaded from the key files of the crypto backend in every process
+        sqlite : persistent keystore in a single indexed database file in data_dir, which also caches foreign public keys
+
+        Available Options: [simple, sqlite]
+        """
+        return self._keystore_backend
+
+    @keystore_backend.setter
+    def keystore_backend(self, val: str):
+        _check_is_one_of(val, self._keystore_backend_values)
+        self._keystore_backend = val
+
+    @property
+    def keystore_pk_cache_blocks(self) -> int:
+        """
+        Number of blocks for which a public key requested from the pki remains valid in the persistent keystore cache.
+
+        0 disables persistent caching of foreign public keys (only used by the sqlite keystore).
+        """
+        return self._keystore_pk_cache_blocks
+
+    @keystore_pk_cache_blocks.setter
+    def keystore_pk_cache_blocks(self, val: int):
+        _type_check(val, int)
+        if val < 0:
+            raise ValueError(f'Invalid config value {val}, must not be negative')
+        self._keystore_pk_cache_blocks = val
+
+    @property
+    def deployment_registry(self) -> str:
+        """
+        How to use the local registry of deployed contracts (keyed by chain id and deployed bytecode hash), which allows
+        to link existing verification contracts instead of deploying them again.
+
+        confirm : reuse a registered deployment if the code at its address (getCode) matches the local bytecode
+        trust : reuse registered deployments without querying their code
+        off : always deploy verification contracts
+
+        Available Options: [confirm, trust, off]
+        """
+        return self._deployment_registry
+
+    @deployment_registry.setter
+    def deployment_registry(self, val: str):
+        _check_is_one_of(val, self._deployment_registry_values)
+        self._deployment_registry = val
+
+    @property
+    def reverify(self) -> bool:
+        """
+        If enabled, the integrity of deployed contracts is always checked by compiling and comparing the local sources,
+        even if the same check (same chain, address, deployed code and local sources) succeeded before.
+        """
+        return self._reverify
+
+    @reverify.setter
+    def reverify(self, val: bool):
+        _type_check(val, bool)
+        self._reverify = val
+
+    @property
+    def state_prefetch(self) -> bool:
+        """
+        If enabled, the state locations which the privacy policy of an externally called function reads or mutates
+        are requested from the chain in a single batch before the function body runs (as far as their keys can be
+        resolved before the call, e.g. me/msg.sender). Locations which are not prefetched are still requested lazily.
+        """
+        return self._state_prefetch
+
+    @state_prefetch.setter
+    def state_prefetch(self, val: bool):
+        _type_check(val, bool)
+        self._state_prefetch = val
+
+    @property
+    def strict_state_reads(self) -> bool:
+        """
+        If enabled, every transaction (and view, e.g. get_plain) requests all state values it reads from the chain.
+
+        If disabled, values which an earlier transaction or view read at the same chain head are reused (until the head
+        advances, or until an own transaction writes the location). A reused value is only stale if the chain state
+        changed without the head advancing (e.g. when other parties transact on an instant-mining development chain
+        between the reads). Note that views then request the current head first, use StateDict.view_scope to share
+        it between several views.
+        """
+        return self._strict_state_reads
+
+    @strict_state_reads.setter
+    def strict_state_reads(self, val: bool):
+        _type_check(val, bool)
+        self._strict_state_reads = val
+
+    @property
+    def pipelined_transactions(self) -> bool:
+        """
+        If enabled, contract functions which issue a transaction return as soon as it was submitted (with a
+        PendingTransaction handle instead of the receipt), such that a sender can have many transactions in flight.
+        Nonces are then assigned locally (otherwise by the node, except for the accounts in cfg.blockchain_signing_keys),
+        hence no other client may send transactions from the same accounts in the meantime.
+        Use ContractSimulator.wait_for_transactions to wait for a batch of handles.
+        """
+        return self._pipelined_transactions
+
+    @pipelined_transactions.setter
+    def pipelined_transactions(self, val: bool):
+        _type_check(val, bool)
+        self._pipelined_transactions = val
+
+    @property
+    def gas_estimate_cache(self) -> bool:
+        """
+        If enabled, the gas estimate of a function call is reused for later calls of the same function (on the same
+        contract, by the same sender) whose call data has a similar size. An estimate is discarded if a transaction
+        which used it fails.
+
+        Note that estimating gas also detects transactions which would revert before they are sent. With a cached
+        estimate, such transactions are sent anyway and only fail on chain (consuming gas).
+        """
+        return self._gas_estimate_cache
+
+    @gas_estimate_cache.setter
+    def gas_estimate_cache(self, val: bool):
+        _type_check(val, bool)
+        self._gas_estimate_cache = val
+
+    @property
+    def special_variables_cache(self) -> str:
+        """
+        When the block and tx values (pending block, coinbase, gas price) for a transaction are requested from the chain.
+
+        head : once per chain head, costs one request (eth_blockNumber) per transaction to check whether the head moved
+        subscription : once per chain head, new heads are detected by polling a new block filter in the background,
+        such that no request is made before a transaction if the head did not move (zero requests per transaction)
+        off : before every transaction (one batched request per transaction, several if the node does not support batches)
+
+        Available Options: [head, subscription, off]
+        """
+        return self._special_variables_cache
+
+    @special_variables_cache.setter
+    def special_variables_cache(self, val: str):
+        _check_is_one_of(val, self._special_variables_cache_values)
+        self._special_variables_cache = val
+
 
     @property
     def blockchain_node_uri(self) -> Union[Any, str, None]:
@@ -152,6 +421,7 @@ class UserConfig:
         w3-ipc        : path to ipc socket file
         w3-websocket  : web socket uri
         w3-http       : url
+        w3-http-async : url
         w3-custom     : web3 instance, must not be None
         """
         return self._blockchain_node_uri
@@ -224,6 +494,56 @@ class UserConfig:
         _type_check(val, (int, str, None))
         self._blockchain_default_account = val
 
+    @property
+    def blockchain_http_pool_size(self) -> int:
+        """
+        Maximum number of concurrent connections to the ethereum node (http backends).
+
+        Requests wait for a free pooled connection instead of opening additional short-lived connections.
+        """
+        return self._blockchain_http_pool_size
+
+    @blockchain_http_pool_size.setter
+    def blockchain_http_pool_size(self, val: int):
+        _type_check(val, int)
+        self._blockchain_http_pool_size = val
+
+    @property
+    def blockchain_http_keepalive(self) -> bool:
+        """If enabled, connections to the ethereum node are kept open and reused for later requests (http backends)."""
+        return self._blockchain_http_keepalive
+
+    @blockchain_http_keepalive.setter
+    def blockchain_http_keepalive(self, val: bool):
+        _type_check(val, bool)
+        self._blockchain_http_keepalive = val
+
+    @property
+    def blockchain_http_timeout(self) -> int:
+        """Timeout in seconds for a single request to the ethereum node (http backends)."""
+        return self._blockchain_http_timeout
+
+    @blockchain_http_timeout.setter
+    def blockchain_http_timeout(self, val: int):
+        _type_check(val, int)
+        self._blockchain_http_timeout = val
+
+    @property
+    def blockchain_signing_keys(self) -> str:
+        """
+        Path of a file with hex-encoded private keys (one per line) of accounts whose transactions are signed locally.
+
+        Transactions of these accounts are sent as raw transactions, hence the node does not need to manage them.
+        If empty, all transactions are signed by the node.
+        If set, an int blockchain_default_account refers to the accounts in this file.
+        """
+        return self._blockchain_signing_keys
+
+    @blockchain_signing_keys.setter
+    def blockchain_signing_keys(self, val: str):
+        _type_check(val, str)
+        self._blockchain_signing_keys = val
+
     @property
     def indentation(self) -> str:
         """Specifies the identation which should be used for the generated code output."""
@@ -255,6 +575,24 @@ class UserConfig:
         _type_check(val, int)
         self._opt_solc_optimizer_runs = val
 
+    @property
+    def solc_cache(self) -> str:
+        """
+        Cache for solc compilation outputs, keyed by the hash of the sources (including imports), solc version and settings.
+
+        disk : outputs are kept in memory and stored in data_dir/solc_cache, such that they survive the process
+        memory : outputs are only kept in memory
+        off : solc is invoked for every compilation
+
+        Available Options: [disk, memory, off]
+        """
+        return self._solc_cache
+
+    @solc_cache.setter
+    def solc_cache(self, val: str):
+        _check_is_one_of(val, self._solc_cache_values)
+        self._solc_cache = val
+
     @property
     def opt_hash_threshold(self) -> int:
         """
@@ -160,6 +160,8 @@ def compile_cloak(code: str, output_dir: str, import_keys: bool = False, **kwarg
                 Manifest.cloak_version: cfg.cloak_version,
                 Manifest.solc_version: cfg.solc_version,
                 Manifest.cloak_options: cfg.export_compiler_settings(),
+                Manifest.source_hash: Manifest.hash_source(code),
+                Manifest.verifier_names: get_verification_contract_names(cloak_ast),
             }
             _dump_to_output(json.dumps(manifest), output_dir, 'manifest.json')
     elif not os.path.exists(os.path.join(output_dir, 'manifest.json')):
@@ -297,8 +299,7 @@ def _collect_package_contents(contract_dir: str, check_all_files: bool) -> List[
     manifest = Manifest.load(contract_dir)
 
     files = ['contract.cloak', 'manifest.json']
-    with open(cloak_filename) as f:
-        verifier_names = get_verification_contract_names(f.read())
+    verifier_names = Manifest.get_verifier_names(contract_dir, manifest)
     with Manifest.with_manifest_config(manifest):
         gen_cls = generator_classes[cfg.snark_backend]
         files += [os.path.join(cfg.get_circuit_output_dir_name(v), k)
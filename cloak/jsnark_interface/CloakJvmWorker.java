@@ -0,0 +1,80 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+
+/**
+ * Long-lived jvm which runs the main method of jsnark interface classes on request (see cloak/jsnark_interface/jvm_pool.py).
+ *
+ * Request: one line with tab separated fields "[additional classpath directory or empty] [main class] [arguments...]"
+ * Response: "[exit code] [#stdout bytes] [#stderr bytes]\n" followed by the stdout and stderr output of the main method.
+ *
+ * Classes from the additional classpath directory are loaded by a fresh class loader for every request
+ * (circuit classes all have the same name), classes from the jar stay loaded and jit-compiled across requests.
+ */
+public class CloakJvmWorker {
+    public static void main(String[] args) throws IOException {
+        OutputStream protocolOut = new FileOutputStream(FileDescriptor.out);
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, "UTF-8"));
+
+        String line;
+        while ((line = in.readLine()) != null) {
+            ByteArrayOutputStream out = new ByteArrayOutputStream();
+            ByteArrayOutputStream err = new ByteArrayOutputStream();
+            int status = run(line.split("\t", -1), out, err);
+
+            byte[] outBytes = out.toByteArray();
+            byte[] errBytes = err.toByteArray();
+            String header = status + " " + outBytes.length + " " + errBytes.length + "\n";
+            protocolOut.write(header.getBytes("UTF-8"));
+            protocolOut.write(outBytes);
+            protocolOut.write(errBytes);
+            protocolOut.flush();
+        }
+    }
+
+    private static int run(String[] request, ByteArrayOutputStream out, ByteArrayOutputStream err) {
+        PrintStream oldOut = System.out;
+        PrintStream oldErr = System.err;
+        PrintStream reqOut = new PrintStream(out, true);
+        PrintStream reqErr = new PrintStream(err, true);
+        System.setOut(reqOut);
+        System.setErr(reqErr);
+        try {
+            if (request.length < 2) {
+                throw new IllegalArgumentException("Malformed request");
+            }
+            ClassLoader loader = CloakJvmWorker.class.getClassLoader();
+            if (!request[0].isEmpty()) {
+                loader = new URLClassLoader(new URL[]{new File(request[0]).toURI().toURL()}, loader);
+            }
+            Class<?> mainClass = Class.forName(request[1], true, loader);
+            Method mainMethod = mainClass.getMethod("main", String[].class);
+
+            String[] mainArgs = new String[request.length - 2];
+            System.arraycopy(request, 2, mainArgs, 0, mainArgs.length);
+            mainMethod.invoke(null, new Object[]{mainArgs});
+            return 0;
+        } catch (InvocationTargetException e) {
+            e.getCause().printStackTrace(reqErr);
+            return 1;
+        } catch (Throwable e) {
+            e.printStackTrace(reqErr);
+            return 1;
+        } finally {
+            reqOut.flush();
+            reqErr.flush();
+            System.setOut(oldOut);
+            System.setErr(oldErr);
+        }
+    }
+}
@@ -5,5 +5,6 @@ This package contains glue code to interact with the external jsnark and libsnar
 Submodules
 ==========
 * :py:mod:`.jsnark_interface`: Jsnark circuit compilation and evaluation (preparation steps for key and proof generation).
+* :py:mod:`.jvm_pool`: Pool of long-lived jvm processes which run jsnark interface classes.
 * :py:mod:`.libsnark_interface`: Libsnark key and proof generation.
 """
\ No newline at end of file
@@ -1,16 +1,96 @@
+import atexit
 import os
-from typing import List
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import List, Optional, Tuple
 
 from cloak.compiler.privacy.circuit_generation.circuit_helper import CircuitHelper
 from cloak.config import cfg
+from cloak.jsnark_interface.jvm_pool import JvmPool
 from cloak.utils.helpers import hash_file
-from cloak.utils.run_command import run_command
+from cloak.utils.run_command import run_command, get_command
 from cloak.cloak_ast.ast import indent
 
 # path jo jsnark interface jar
 circuit_builder_jar = os.path.join(os.path.dirname(os.path.realpath(__file__)),  'JsnarkCircuitBuilder.jar')
 circuit_builder_jar_hash = hash_file(circuit_builder_jar).hex()
 
+# source of the long-lived jvm used by the jvm pool
+jvm_worker_src = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'CloakJvmWorker.java')
+
+_jvm_cmd_prefix = ['java', '-Xms4096m', '-Xmx16384m']
+
+_jvm_pool: Optional[JvmPool] = None
+_jvm_pool_pid: Optional[int] = None
+_jvm_pool_lock = threading.Lock()
+
+
+def _compile_jvm_worker() -> str:
+    """Compile CloakJvmWorker.java (once per source version) and return the directory containing the class file."""
+    worker_dir = os.path.join(cfg.data_dir, 'jvm_worker', hash_file(jvm_worker_src).hex()[:16])
+    if not os.path.exists(os.path.join(worker_dir, 'CloakJvmWorker.class')):
+        os.makedirs(os.path.dirname(worker_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(worker_dir))
+        try:
+            run_command(['javac', '-d', tmp_dir, jvm_worker_src])
+            try:
+                os.rename(tmp_dir, worker_dir)
+            except OSError:
+                # Compiled concurrently by another process
+                pass
+        finally:
+            # Nothing is left to remove if the rename succeeded
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return worker_dir
+
+
+def _get_jvm_pool() -> JvmPool:
+    """Return the jvm pool of this process, the pool is created on first use (and anew in forked child processes)."""
+    global _jvm_pool, _jvm_pool_pid
+    with _jvm_pool_lock:
+        if _jvm_pool is None or _jvm_pool_pid != os.getpid():
+            worker_dir = _compile_jvm_worker()
+            _jvm_pool = JvmPool([*_jvm_cmd_prefix, '-cp', f'{circuit_builder_jar}:{worker_dir}', 'CloakJvmWorker'],
+                                cfg.jvm_pool_max_workers)
+            _jvm_pool_pid = os.getpid()
+            atexit.register(_jvm_pool.shutdown)
+        return _jvm_pool
+
+
+def run_java_main(operation: str, main_class: str, args: List[str], *, classpath_dir: Optional[str] = None,
+                  cwd: Optional[str] = None, allow_verbose: bool = False) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Run the main method of a class from the jsnark interface jar (or from classpath_dir).
+
+    Depending on cfg.jvm_pool_operations, the method runs either in a pooled jvm or in a newly launched jvm.
+
+    :param operation: kind of operation (one of cfg.jvm_pool_operations_values)
+    :param main_class: name of the class with the main method
+    :param args: arguments for the main method
+    :param classpath_dir: [OPTIONAL] additional directory with compiled classes
+    :param cwd: [OPTIONAL] working directory, output files are stored here
+    :param allow_verbose: if true, print output (see run_command)
+    :raise SubprocessError: if the main method throws an exception
+    :return: output and error output (see run_command)
+    """
+    if not cfg.use_jvm_pool(operation):
+        classpath = circuit_builder_jar if classpath_dir is None else f'{circuit_builder_jar}:{classpath_dir}'
+        return run_command([*_jvm_cmd_prefix, '-cp', classpath, main_class, *args], cwd=cwd, allow_verbose=allow_verbose)
+
+    if cwd is not None:
+        cwd = os.path.abspath(cwd)
+    status, output, error = _get_jvm_pool().run(main_class, args, classpath_dir, cwd)
+    if allow_verbose and cfg.verbosity >= 2 and not cfg.is_unit_test:
+        print(output, end='')
+        print(error, end='')
+    if status != 0:
+        cmd = get_command([main_class, *args])
+        msg = f"Non-zero exit status {status} for pooled jvm command:\n{cwd}: $ {cmd}\n\n{output}\n{error}"
+        raise subprocess.SubprocessError(msg)
+    return output.rstrip(), error.rstrip()
+
 
 def compile_circuit(circuit_dir: str, javacode: str):
     """
@@ -28,7 +108,7 @@ def compile_circuit(circuit_dir: str, javacode: str):
     run_command(['javac', '-cp', f'{circuit_builder_jar}', jfile], cwd=circuit_dir)
 
     # Run jsnark to generate the circuit
-    run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}:{circuit_dir}', cfg.jsnark_circuit_classname, 'compile'], cwd=circuit_dir, allow_verbose=True)
+    run_java_main('compile', cfg.jsnark_circuit_classname, ['compile'], classpath_dir=circuit_dir, cwd=circuit_dir, allow_verbose=True)
 
 
 def prepare_proof(circuit_dir: str, output_dir: str, serialized_args: List[int]):
@@ -43,7 +123,7 @@ def prepare_proof(circuit_dir: str, output_dir: str, serialized_args: List[int])
     serialized_arg_str = [format(arg, 'x') for arg in serialized_args]
 
     # Run jsnark to evaluate the circuit and compute prover inputs
-    run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}:{circuit_dir}', cfg.jsnark_circuit_classname, 'prove', *serialized_arg_str], cwd=output_dir, allow_verbose=True)
+    run_java_main('prove', cfg.jsnark_circuit_classname, ['prove', *serialized_arg_str], classpath_dir=circuit_dir, cwd=output_dir, allow_verbose=True)
 
 
 _class_template_str = '' + '''\
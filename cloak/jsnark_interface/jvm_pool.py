@@ -0,0 +1,139 @@
+"""
+Pool of long-lived jvm worker processes (see CloakJvmWorker.java) which run java main classes on request.
+
+Launching a new jvm for every jsnark or crypto operation is slow (jvm startup, class loading, no jit warm-up).
+Pool workers are started lazily on first use and are reused for subsequent requests.
+The number of concurrently running workers is bounded, since every worker reserves a large heap.
+
+The jsnark classes write their output files into the current working directory, which cannot be changed within a
+running jvm. Every worker therefore runs in its own scratch directory, and files which were created there during
+a request are moved to the requested working directory once the request has finished.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple, ContextManager
+
+
+class JvmWorker:
+    """A single jvm process running CloakJvmWorker, which processes one request at a time."""
+
+    def __init__(self, command: List[str]):
+        self.scratch_dir = tempfile.mkdtemp(prefix='cloak_jvm_')
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, cwd=self.scratch_dir)
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, main_class: str, args: List[str], classpath_dir: Optional[str] = None, cwd: Optional[str] = None) -> Tuple[int, str, str]:
+        """
+        Run main_class.main(args) in this jvm.
+
+        :param main_class: fully qualified name of the class with the main method
+        :param args: arguments for the main method
+        :param classpath_dir: [OPTIONAL] additional class directory from which main_class may be loaded
+        :param cwd: [OPTIONAL] directory into which files created by the main method are moved
+        :raise SubprocessError: if the worker process terminated
+        :return: exit code (0 on success), stdout output and stderr output of the main method
+        """
+        fields = ['' if classpath_dir is None else os.path.abspath(classpath_dir), main_class, *args]
+        if any('\t' in f or '\n' in f for f in fields):
+            raise ValueError('jvm worker request fields must not contain tabs or newlines')
+        try:
+            self.process.stdin.write(('\t'.join(fields) + '\n').encode('utf-8'))
+            self.process.stdin.flush()
+            header = self.process.stdout.readline().split()
+            if len(header) != 3:
+                raise EOFError()
+            status, out_len, err_len = map(int, header)
+            output = self._read_exactly(out_len).decode('utf-8')
+            error = self._read_exactly(err_len).decode('utf-8')
+        except (OSError, EOFError, ValueError):
+            self.close()
+            raise subprocess.SubprocessError(f'jvm worker terminated while running {main_class}')
+        finally:
+            self._collect_files(cwd)
+        return status, output, error
+
+    def close(self):
+        """Terminate the jvm process (it exits as soon as its stdin is closed) and remove the scratch directory."""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def _read_exactly(self, n: int) -> bytes:
+        data = self.process.stdout.read(n)
+        if len(data) != n:
+            raise EOFError()
+        return data
+
+    def _collect_files(self, cwd: Optional[str]):
+        if not os.path.isdir(self.scratch_dir):
+            return
+        for name in os.listdir(self.scratch_dir):
+            src = os.path.join(self.scratch_dir, name)
+            if cwd is None:
+                if os.path.isdir(src):
+                    shutil.rmtree(src, ignore_errors=True)
+                else:
+                    os.remove(src)
+            else:
+                dst = os.path.join(cwd, name)
+                if os.path.isdir(dst):
+                    shutil.rmtree(dst)
+                shutil.move(src, dst)
+
+
+class JvmPool:
+    """Bounded pool of JvmWorkers, workers are started on demand and reused."""
+
+    def __init__(self, command: List[str], max_workers: int):
+        assert max_workers > 0
+        self.command = command
+        self.max_workers = max_workers
+        self._idle: List[JvmWorker] = []
+        self._worker_count = 0
+        self._cond = threading.Condition()
+
+    def run(self, main_class: str, args: List[str], classpath_dir: Optional[str] = None, cwd: Optional[str] = None) -> Tuple[int, str, str]:
+        """Run main_class.main(args) in a pooled jvm, blocks while all max_workers workers are busy. See JvmWorker.run."""
+        with self._worker() as worker:
+            return worker.run(main_class, args, classpath_dir, cwd)
+
+    def shutdown(self):
+        """Terminate all idle workers."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._worker_count -= len(idle)
+            self._cond.notify_all()
+        for worker in idle:
+            worker.close()
+
+    @contextmanager
+    def _worker(self) -> ContextManager[JvmWorker]:
+        with self._cond:
+            while not self._idle and self._worker_count >= self.max_workers:
+                self._cond.wait()
+            worker = self._idle.pop() if self._idle else None
+            if worker is None:
+                self._worker_count += 1
+
+        try:
+            if worker is None:
+                worker = JvmWorker(self.command)
+            yield worker
+        finally:
+            with self._cond:
+                if worker is not None and worker.is_alive:
+                    self._idle.append(worker)
+                else:
+                    self._worker_count -= 1
+                self._cond.notify()
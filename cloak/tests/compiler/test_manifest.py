@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from cloak.compiler.privacy.manifest import Manifest
+from cloak.tests.cloak_unit_test import CloakTestCase
+
+code = 'pragma cloak ^0.2.0;\n\ncontract Test {\n}\n'
+
+
+class TestManifestMetadata(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.project_dir = self.tmp_dir.name
+        with open(os.path.join(self.project_dir, 'contract.cloak'), 'w') as f:
+            f.write(code)
+        self.write_manifest({Manifest.source_hash: Manifest.hash_source(code), Manifest.verifier_names: ['Verify_Test_f']})
+        self.derived = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def write_manifest(self, manifest):
+        with open(os.path.join(self.project_dir, 'manifest.json'), 'w') as f:
+            f.write(json.dumps(manifest))
+
+    def derive(self, code):
+        self.derived.append(code)
+        return ['Verify_Test_g']
+
+    def test_recorded_names(self):
+        with patch('cloak.cloak_ast.process_ast.get_verification_contract_names', self.derive):
+            self.assertEqual(Manifest.get_verifier_names(self.project_dir), ['Verify_Test_f'])
+        self.assertEqual(self.derived, [])
+
+    def test_rederived_on_hash_mismatch(self):
+        with open(os.path.join(self.project_dir, 'contract.cloak'), 'a') as f:
+            f.write('\n')
+        with patch('cloak.cloak_ast.process_ast.get_verification_contract_names', self.derive):
+            self.assertEqual(Manifest.get_verifier_names(self.project_dir), ['Verify_Test_g'])
+            self.assertEqual(Manifest.get_verifier_names(self.project_dir), ['Verify_Test_g'])
+        self.assertEqual(self.derived, [code + '\n'])
+        self.assertEqual(Manifest.load(self.project_dir)[Manifest.source_hash], Manifest.hash_source(code + '\n'))
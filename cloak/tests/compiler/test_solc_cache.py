@@ -0,0 +1,135 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from cloak.compiler.solidity import compiler
+from cloak.compiler.solidity.compiler import compile_solidity_code, compile_solidity_json, compile_solidity_sources, SolcCache
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+
+
+class FakeSolc:
+    """Stands in for the solc invocation and counts the invocations."""
+
+    def __init__(self):
+        self.calls = 0
+        self.json_in = None
+        self.base_paths = []
+
+    def __call__(self, json_in, base_path, include_paths, allow_paths):
+        self.calls += 1
+        self.json_in = json_in
+        self.base_paths.append(base_path)
+        return {'contracts': {}, 'call': self.calls}
+
+
+class TestSolcCache(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.old_data_dir, self.old_solc_cache = cfg.data_dir, cfg.solc_cache
+        cfg.data_dir = os.path.join(self.tmp_dir.name, 'data')
+        self.solc = FakeSolc()
+        self.patches = [patch.object(compiler, '_compile_standard', self.solc), patch.object(compiler, 'solc_cache', SolcCache())]
+        for p in self.patches:
+            p.start()
+
+        self.main = self.write('Main.sol', 'import "./Lib.sol";\ncontract Main {}')
+        self.write('Lib.sol', 'library Lib {}')
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        cfg.data_dir, cfg.solc_cache = self.old_data_dir, self.old_solc_cache
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def write(self, name: str, code: str) -> str:
+        filename = os.path.join(self.tmp_dir.name, name)
+        with open(filename, 'w') as f:
+            f.write(code)
+        return filename
+
+    def test_hit(self):
+        self.assertEqual(compile_solidity_json(self.main)['call'], 1)
+        self.assertEqual(compile_solidity_json(self.main)['call'], 1)
+        self.assertEqual(self.solc.calls, 1)
+        self.assertEqual((compiler.solc_cache.hits, compiler.solc_cache.misses), (1, 1))
+
+    def test_key_covers_settings_and_imports(self):
+        compile_solidity_json(self.main)
+        compile_solidity_json(self.main, optimizer_runs=200)
+        compile_solidity_json(self.main, libs={'Lib': '0x' + '11' * 20})
+        compile_solidity_json(self.main, output_selection=('abi', ))
+        self.assertEqual(self.solc.calls, 4)
+
+        self.write('Lib.sol', 'library Lib { }')
+        compile_solidity_json(self.main)
+        self.assertEqual(self.solc.calls, 5)
+
+    def test_persisted_on_disk(self):
+        compile_solidity_json(self.main)
+        with patch.object(compiler, 'solc_cache', SolcCache()):
+            self.assertEqual(compile_solidity_json(self.main)['call'], 1)
+
+            cfg.solc_cache = 'off'
+            self.assertEqual(compile_solidity_json(self.main)['call'], 2)
+
+    def test_single_invocation_for_all_sources(self):
+        other = self.write('Other.sol', 'import "./Lib.sol";\ncontract Other {}')
+        compile_solidity_sources([self.main, other], {'Main.sol': ['Main'], 'Other.sol': ['Other']}, output_selection=('abi', ))
+        self.assertEqual(self.solc.calls, 1)
+        self.assertEqual(sorted(self.solc.json_in['sources']), ['Main.sol', 'Other.sol'])
+        self.assertEqual(self.solc.json_in['settings']['outputSelection'], {'Main.sol': {'Main': ['abi']}, 'Other.sol': {'Other': ['abi']}})
+
+        with self.assertRaises(ValueError):
+            compile_solidity_sources([self.main, os.path.join(self.tmp_dir.name, 'data', 'Main.sol')])
+
+    def test_include_paths(self):
+        lib_dir = os.path.join(self.tmp_dir.name, 'lib')
+        os.makedirs(lib_dir)
+        with open(os.path.join(lib_dir, 'Ext.sol'), 'w') as f:
+            f.write('library Ext {}')
+        main = self.write('Ext_user.sol', 'import "Ext.sol";\ncontract User {}')
+
+        compile_solidity_json(main, include_paths=(lib_dir, ))
+        with open(os.path.join(lib_dir, 'Ext.sol'), 'w') as f:
+            f.write('library Ext { }')
+        compile_solidity_json(main, include_paths=(lib_dir, ))
+        self.assertEqual(self.solc.calls, 2)
+
+    def test_thread_safe_without_chdir(self):
+        cwd = os.getcwd()
+        dirs = [os.path.join(self.tmp_dir.name, f'project{i}') for i in range(8)]
+        for d in dirs:
+            os.makedirs(d)
+            with open(os.path.join(d, 'Main.sol'), 'w') as f:
+                f.write(f'contract Main {{ /* {d} */ }}')
+
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda d: compile_solidity_json(os.path.join(d, 'Main.sol')), dirs))
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(sorted(self.solc.base_paths), sorted(dirs))
+
+    def test_independent_of_location(self):
+        for _ in range(2):
+            with tempfile.TemporaryDirectory() as project_dir:
+                with open(os.path.join(project_dir, 'Pki.sol'), 'w') as f:
+                    f.write('contract Pki {}')
+                compile_solidity_json(os.path.join(project_dir, 'Pki.sol'))
+        self.assertEqual(self.solc.calls, 1)
+        self.assertEqual(len(os.listdir(os.path.join(cfg.data_dir, 'solc_cache'))), 1)
+
+        # Code compiled from a string hits the cache as well, although it is written to a fresh temporary directory every time
+        compile_solidity_code('contract C {}')
+        compile_solidity_code('contract C {}')
+        self.assertEqual(self.solc.calls, 2)
+
+    def test_bounded(self):
+        with patch.object(SolcCache, 'max_memory_entries', 2), patch.object(SolcCache, 'max_disk_size', 1):
+            for runs in range(4):
+                compile_solidity_json(self.main, optimizer_runs=runs)
+            self.assertEqual(len(compiler.solc_cache._outputs), 2)
+            self.assertLessEqual(len(os.listdir(os.path.join(cfg.data_dir, 'solc_cache'))), 1)
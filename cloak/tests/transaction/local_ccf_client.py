@@ -0,0 +1,51 @@
+import http
+import json
+import threading
+from typing import Callable, Dict, Any, List
+
+
+class LocalCCFResponse:
+
+    class Body:
+        def __init__(self, data: bytes):
+            self.data = data
+
+        def json(self) -> Any:
+            return json.loads(self.data)
+
+    def __init__(self, status_code: int, body: Any):
+        self.status_code = status_code
+        self.body = LocalCCFResponse.Body(json.dumps(body).encode('utf-8'))
+
+
+class LocalCCFClient:
+    """
+    Minimal in-process stand-in for a ccf.clients.CCFClient connected to a cloak TEE node.
+
+    The app methods are served by the handlers dict (method name -> function(params) -> result) and listed under /app/api.
+    All calls are counted, such that tests can check how often a method was polled.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[List], Any]]):
+        self.handlers = handlers
+        self.calls: List[str] = []
+        self._lock = threading.Lock()
+        self._request_id = 0
+
+    def get(self, path: str) -> LocalCCFResponse:
+        if path == '/node/state':
+            return LocalCCFResponse(http.HTTPStatus.OK, {'state': 'partOfNetwork'})
+        if path == '/app/api':
+            return LocalCCFResponse(http.HTTPStatus.OK, {'paths': {f'/{m}': {'post': {}} for m in self.handlers}})
+        return LocalCCFResponse(http.HTTPStatus.NOT_FOUND, {})
+
+    def call(self, path: str, params: Any, http_verb: str = 'POST') -> LocalCCFResponse:
+        method = path[len('/app/'):]
+        with self._lock:
+            self.calls.append(method)
+            self._request_id += 1
+            request_id = self._request_id
+        try:
+            return LocalCCFResponse(http.HTTPStatus.OK, {'jsonrpc': '2.0', 'id': request_id, 'result': self.handlers[method](params)})
+        except Exception as e:
+            return LocalCCFResponse(http.HTTPStatus.OK, {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32000, 'message': str(e)}})
@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict, Any, List
+
+
+class LocalCCFServer:
+    """
+    Minimal local mock of a cloak CCF node, served over plain http (keep-alive connections).
+
+    Serves GET /node/state, GET /app/api (listing the handlers) and POST /app/<method>, where the request body holds
+    the params and the response is a JSON-RPC response with the result of handlers[method](params).
+    Every app call takes at least latency seconds (to emulate enclave processing time when benchmarking throughput).
+    Received HTTP requests, app calls and connections are counted, as well as the maximum number of concurrent app calls.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[List], Any]], latency: float = 0.0):
+        self.handlers = handlers
+        self.latency = latency
+        self.http_requests = 0
+        self.calls: List[str] = []
+        self.connections = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                with server._lock:
+                    server.http_requests += 1
+                if self.path == '/node/state':
+                    self.respond(200, {'state': 'partOfNetwork'})
+                elif self.path == '/app/api':
+                    self.respond(200, {'paths': {f'/{m}': {'post': {}} for m in server.handlers}})
+                else:
+                    self.respond(404, {})
+
+            def do_POST(self):
+                params = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with server._lock:
+                    server.http_requests += 1
+                if not self.path.startswith('/app/') or self.path[len('/app/'):] not in server.handlers:
+                    self.respond(404, {})
+                else:
+                    self.respond(200, server._handle(self.path[len('/app/'):], params))
+
+            def respond(self, status: int, body: Any):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        return self._httpd.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def _handle(self, method: str, params: List) -> Dict:
+        with self._lock:
+            self.calls.append(method)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            time.sleep(self.latency)
+            return {'jsonrpc': '2.0', 'id': 0, 'result': self.handlers[method](params)}
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32000, 'message': str(e)}}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def __enter__(self) -> 'LocalCCFServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._httpd.shutdown()
+        self._httpd.server_close()
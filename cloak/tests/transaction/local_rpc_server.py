@@ -0,0 +1,70 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict, Any, List
+
+
+class LocalJsonRpcServer:
+    """
+    Minimal local stand-in for an ethereum JSON-RPC node (supports batch requests and keep-alive connections).
+
+    Methods are served by the handlers dict (method name -> function(params) -> result).
+    All received HTTP requests and JSON-RPC calls are counted, such that tests can check how many round trips were made.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[List], Any]]):
+        self.handlers = {'web3_clientVersion': lambda params: 'LocalJsonRpcServer', 'eth_chainId': lambda params: '0x539',
+                         **handlers}
+        self.http_requests = 0
+        self.calls: List[str] = []
+        self.connections = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def do_POST(self):
+                server.http_requests += 1
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if isinstance(body, list):
+                    response = [server._handle(r) for r in body]
+                else:
+                    response = server._handle(body)
+                data = json.dumps(response).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._httpd.server_address[1]}'
+
+    def _handle(self, request: Dict) -> Dict:
+        self.calls.append(request['method'])
+        try:
+            result = self.handlers[request['method']](request.get('params', []))
+            return {'jsonrpc': '2.0', 'id': request['id'], 'result': result}
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': -32000, 'message': str(e)}}
+
+    def __enter__(self) -> 'LocalJsonRpcServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._httpd.shutdown()
+        self._httpd.server_close()
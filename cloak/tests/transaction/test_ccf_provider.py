@@ -0,0 +1,115 @@
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from web3 import Web3
+
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.tests.transaction.local_ccf_server import LocalCCFServer
+from cloak.transaction.blockchain import ccf_config
+from cloak.transaction.blockchain.ccf_provider import CloakCCFProvider
+from cloak.transaction.blockchain.ccf_transport import CCFHttpTransport
+from cloak.transaction.blockchain.web3py import Web3CloakCCFNetwork
+
+contract_address = '0x' + '11' * 20
+
+# uint256 getter with a single uint256 key, the mock node returns 2 * key
+getter_abi = [{'name': 'cipher', 'type': 'function', 'stateMutability': 'view',
+               'inputs': [{'name': '', 'type': 'uint256'}], 'outputs': [{'name': '', 'type': 'uint256'}]}]
+
+
+def eth_call(params):
+    return '0x' + format(2 * int(params[0]['data'][10:], 16), '064x')
+
+
+class TestCloakCCFProvider(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.old_data_dir = cfg.data_dir
+        cfg.data_dir = self.tmp_dir.name
+        self.server = LocalCCFServer({'eth_call': eth_call, 'cloak_echo': lambda params: params}, latency=0.05).__enter__()
+        self.transports = []
+
+    def tearDown(self):
+        for transport in self.transports:
+            transport.close()
+        self.server.__exit__()
+        cfg.data_dir = self.old_data_dir
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def provider(self) -> CloakCCFProvider:
+        transport = CCFHttpTransport(self.server.host, self.server.port, pool_size=4)
+        self.transports.append(transport)
+        return CloakCCFProvider(transport)
+
+    def test_keepalive(self):
+        provider = self.provider()
+        for i in range(3):
+            self.assertEqual(provider.make_request('cloak_echo', [i])['result'], [i])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_pipelined_requests(self):
+        provider = self.provider()
+        start = time.monotonic()
+        for i in range(8):
+            provider.make_request('cloak_echo', [i])
+        sequential = time.monotonic() - start
+
+        start = time.monotonic()
+        responses = provider.make_requests([('cloak_echo', [i]) for i in range(8)])
+        pipelined = time.monotonic() - start
+
+        self.assertEqual([r['result'] for r in responses], [[i] for i in range(8)])
+        self.assertLess(pipelined, sequential / 2)
+        self.assertEqual(self.server.max_in_flight, 4)
+        self.assertLessEqual(self.server.connections, 4)
+
+    def test_method_table_cached_per_node(self):
+        self.provider()
+        self.assertEqual(len(os.listdir(os.path.join(cfg.data_dir, 'ccf_api'))), 1)
+        requests_before = self.server.http_requests
+        provider = self.provider()
+        self.assertEqual(self.server.http_requests, requests_before)
+        self.assertTrue(provider.supports('cloak_echo'))
+
+        # Methods which are missing from the cached table are looked up again
+        self.server.handlers['cloak_new'] = lambda params: 1
+        self.assertTrue(provider.supports('cloak_new'))
+        self.assertFalse(provider.supports('cloak_unknown'))
+
+    def test_quiet(self):
+        out = io.StringIO()
+        with redirect_stdout(out), self.assertLogs(level='DEBUG') as logs:
+            self.provider().make_request('cloak_echo', [1])
+        self.assertEqual(out.getvalue(), '')
+        self.assertTrue(any('cloak_echo' in line for line in logs.output))
+
+    def test_network_state_reads(self):
+        provider = self.provider()
+        with patch.object(Web3CloakCCFNetwork, '_create_w3_instance', lambda obj: Web3(provider)):
+            network = Web3CloakCCFNetwork()
+        contract = network.w3.eth.contract(address=Web3.toChecksumAddress(contract_address), abi=getter_abi)
+        self.assertEqual(network.req_state_vars(contract, [('cipher', (i, )) for i in range(8)]), [2 * i for i in range(8)])
+        self.assertEqual(self.server.max_in_flight, 4)
+
+    def test_pooled_transport_config(self):
+        old_transport, cfg.ccf_transport = cfg.ccf_transport, 'pooled'
+        try:
+            with patch.multiple(ccf_config, host=self.server.host, port=self.server.port, ca=None, cert=None, key=None):
+                network = Web3CloakCCFNetwork()
+        finally:
+            cfg.ccf_transport = old_transport
+        transport = network.w3.provider.ccf_client
+        self.transports.append(transport)
+        self.assertIsInstance(transport, CCFHttpTransport)
+
+        contract = network.w3.eth.contract(address=Web3.toChecksumAddress(contract_address), abi=getter_abi)
+        self.assertEqual(network.req_state_vars(contract, [('cipher', (i, )) for i in range(8)]), [2 * i for i in range(8)])
+        self.assertEqual(self.server.max_in_flight, min(8, cfg.blockchain_http_pool_size))
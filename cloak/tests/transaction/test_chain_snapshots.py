@@ -0,0 +1,116 @@
+from unittest.mock import patch
+
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.transaction.blockchain.web3py import Web3TesterBlockchain
+from cloak.transaction.interface import BlockChainError
+from cloak.transaction.keystore.simple import SimpleKeystore
+from cloak.transaction.offchain import ContractSimulator
+from cloak.transaction.runtime import Runtime
+from cloak.transaction.state_cache import StateCache
+from cloak.transaction.types import AddressValue, KeyPair, PublicKeyValue, PrivateKeyValue
+
+# Contract without constructor arguments, whose runtime code returns 1 (stands in for all library contracts)
+runtime_code = '600160005260206000f3'
+contract_interface = {'abi': [], 'bin': '600a600c600039600a6000f3' + runtime_code, 'deployed_bin': runtime_code}
+
+
+class TestChainSnapshots(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.compiled = 0
+
+        def compile_contracts(contracts, *args, **kwargs):
+            self.compiled += 1
+            return {name: contract_interface for _, name in contracts}
+
+        self.patches = [
+            patch.dict(Web3TesterBlockchain._bootstrap_states, clear=True),
+            patch.object(Web3TesterBlockchain, 'compile_contracts', staticmethod(compile_contracts)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        super().tearDown()
+
+    def test_libraries_deployed_once(self):
+        first = Web3TesterBlockchain()
+        pki_address = first.pki_contract.address
+        head = first.w3.eth.blockNumber
+
+        second = Web3TesterBlockchain()
+        self.assertEqual(second.pki_contract.address, pki_address)
+        self.assertEqual(second.lib_addresses, first.lib_addresses)
+        self.assertEqual(self.compiled, 1)
+        self.assertEqual(second.w3.eth.blockNumber, head)
+        self.assertEqual(second.w3.eth.getCode(pki_address).hex(), '0x' + runtime_code)
+
+        # Both chains evolve independently from the bootstrap state
+        sender = second.w3.eth.accounts[0]
+        second._deploy_contract(sender, contract_interface)
+        self.assertEqual(second.w3.eth.blockNumber, head + 1)
+        self.assertEqual(first.w3.eth.blockNumber, head)
+        third = Web3TesterBlockchain()
+        third.pki_contract
+        self.assertEqual(third.w3.eth.getTransactionCount(sender), first.w3.eth.getTransactionCount(sender))
+
+    def test_no_bootstrap_state_after_genesis(self):
+        Web3TesterBlockchain().pki_contract
+        chain = Web3TesterBlockchain()
+        chain._deploy_contract(chain.w3.eth.accounts[0], contract_interface)
+        chain.pki_contract
+        self.assertEqual(self.compiled, 2)
+
+    def test_revert(self):
+        chain = Web3TesterBlockchain()
+        sender = chain.w3.eth.accounts[0]
+        chain.pki_contract
+        snapshot = chain.snapshot()
+        head = chain.w3.eth.blockNumber
+
+        account = chain.create_test_accounts(1)[0]
+        handle = chain._deploy_contract(sender, contract_interface)
+        chain.revert(snapshot)
+        self.assertEqual(chain.w3.eth.blockNumber, head)
+        self.assertEqual(chain.w3.eth.getCode(handle.address).hex(), '0x')
+        self.assertEqual(chain.create_test_accounts(1)[0], account)
+
+        # Locally assigned nonces start over as well
+        self.assertEqual(chain._deploy_contract(sender, contract_interface).address, handle.address)
+
+        chain.revert(snapshot)
+        self.assertEqual(chain.w3.eth.blockNumber, head)
+        with self.assertRaises(BlockChainError):
+            chain.revert(((12345, 1), (None, None, None)))
+
+    def test_revert_before_libraries(self):
+        chain = Web3TesterBlockchain()
+        snapshot = chain.snapshot()
+        chain.pki_contract
+        chain.revert(snapshot)
+        self.assertEqual(chain.w3.eth.blockNumber, 0)
+        chain.pki_contract
+        self.assertEqual(chain.w3.eth.getCode(chain.pki_contract.address).hex(), '0x' + runtime_code)
+
+    def test_simulator_revert_drops_key_state(self):
+        chain = Web3TesterBlockchain()
+        keystore = SimpleKeystore(chain)
+        key_pair = KeyPair(PublicKeyValue([1] * cfg.key_len), PrivateKeyValue(1))
+        keystore.add_keypair(AddressValue(chain.create_test_accounts(1)[0]), key_pair)
+        with patch.object(Runtime, 'blockchain', return_value=chain), patch.object(Runtime, 'keystore', return_value=keystore), \
+                patch.object(Runtime, 'state_cache', return_value=StateCache()):
+            snapshot = ContractSimulator.snapshot_chain()
+            account = AddressValue(chain.create_test_accounts(1)[0])
+            keystore.add_keypair(account, key_pair)
+            keystore.local_pk_store[AddressValue(1)] = key_pair.pk
+            ContractSimulator.revert_chain(snapshot)
+
+        # The account is handed out again and its keys have to be initialized again
+        self.assertEqual(AddressValue(chain.create_test_accounts(1)[0]), account)
+        self.assertFalse(keystore.has_initialized_keys_for(account))
+        self.assertEqual(len(keystore.local_key_pairs), 1)
+        self.assertEqual(keystore.local_pk_store, {})
@@ -0,0 +1,209 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.transaction.crypto import ec_curve
+from cloak.transaction.crypto.chaskey import ChaskeyLtsCbc
+from cloak.transaction.crypto.ecdh_base import SharedKeyCache
+from cloak.transaction.crypto.ecdh_chaskey import EcdhChaskeyCrypto
+from cloak.transaction.interface import ZkayKeystoreInterface
+from cloak.transaction.types import AddressValue, CipherValue, KeyPair, PrivateKeyValue, PublicKeyValue
+
+# (randomness, pk, sk) as output by 'java -cp JsnarkCircuitBuilder.jar zkay.ZkayECDHGenerator <randomness>'
+keygen_vectors = [
+    ('0000000000000000000000000000000000000000000000000000000000000001',
+     '163c93360ebb9ed86f9868448d2802fa77e92f337e1324277bd388127c5170cb',
+     '1000000000000000000000000000000000000000000000000000000000000000'),
+    ('0102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f20',
+     '28bece9a78a0d79a3ab5441f09dcd34c979f0afd1ada15db2d2c0002a15a5d4e',
+     '1102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f20'),
+    ('ffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffff',
+     '25cf8f4d9ab799e6b0d3336800fd1f8e935477da6bd46003369119ee1e2c8ad',
+     '1ffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffff8'),
+    ('9f3c2a7be1d04f6a8c5e7d2b1a0f9e8d7c6b5a4938271605f4e3d2c1b0a99887',
+     '21698591a2f6d79a0fc5331d9a3bf131288c353a4486c659e11617526887eb5f',
+     '1f3c2a7be1d04f6a8c5e7d2b1a0f9e8d7c6b5a4938271605f4e3d2c1b0a99880'),
+    ('00000000000000000000000000000000000000000000000000000000000000ff',
+     'df419e869d6467e1475df4d1d361ef839a7c0e124165da0b1daee01a5d2b0ed',
+     '10000000000000000000000000000000000000000000000000000000000000f8'),
+    ('5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a',
+     '53bd4afb3d2fc5aac92db6c4e5a735e24be32a7204d0486be540beefc0aeb4a',
+     '1a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a58'),
+]
+
+# (sk, other pk, key) as output by 'java -cp JsnarkCircuitBuilder.jar zkay.ZkayECDHGenerator <sk> <other pk>'
+ecdh_vectors = [
+    ('1102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f20',
+     '163c93360ebb9ed86f9868448d2802fa77e92f337e1324277bd388127c5170cb',
+     'c36201ef611b24e8531af060c4c9acad'),
+    ('1000000000000000000000000000000000000000000000000000000000000000',
+     '28bece9a78a0d79a3ab5441f09dcd34c979f0afd1ada15db2d2c0002a15a5d4e',
+     'c36201ef611b24e8531af060c4c9acad'),
+    ('1f3c2a7be1d04f6a8c5e7d2b1a0f9e8d7c6b5a4938271605f4e3d2c1b0a99880',
+     'df419e869d6467e1475df4d1d361ef839a7c0e124165da0b1daee01a5d2b0ed',
+     '2a6b9c816614d01171e15175cc63fde4'),
+    ('10000000000000000000000000000000000000000000000000000000000000f8',
+     '21698591a2f6d79a0fc5331d9a3bf131288c353a4486c659e11617526887eb5f',
+     '2a6b9c816614d01171e15175cc63fde4'),
+    ('1a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a5a58',
+     '21698591a2f6d79a0fc5331d9a3bf131288c353a4486c659e11617526887eb5f',
+     '3ccc58e7be1e2be5cf5792de5a37d28d'),
+]
+
+# (key, iv, plain, cipher) as output by 'java -cp JsnarkCircuitBuilder.jar zkay.ChaskeyLtsCbc enc <key> <iv> <plain>'
+chaskey_vectors = [
+    ('000102030405060708090a0b0c0d0e0f', '00000000000000000000000000000000',
+     '0000000000000000000000000000000000000000000000000000000000000001',
+     '6f7f63643cbb612fb78f949c4d9b479985e961f778377c3fef2d80e44507e90f'),
+    ('2b7e151628aed2a6abf7158809cf4f3c', '000102030405060708090a0b0c0d0e0f',
+     '30c81c46a35ce411e5fbc1191a0a52eff69f2445df4f9b17ad2b417be66c3710',
+     '2fa8c8db40cc01a1983f7d6b57e23ccb9dbb749dd5342c771059e13f7dd6eced'),
+    ('c36201ef611b24e8531af060c4c9acad', 'f0e1d2c3b4a5968778695a4b3c2d1e0f',
+     '00000000000000000000000000000000000000000000000000000000deadbeef',
+     '8296a0ce4c880f4968bb3f1d0b4bc63e6539bcb4240b0460a4fe2bbbe4b153e8'),
+    # from 'java -cp JsnarkCircuitBuilder.jar zkay.ChaskeyLtsCbc dec <key> <iv> <cipher>'
+    ('c36201ef611b24e8531af060c4c9acad', 'f0e1d2c3b4a5968778695a4b3c2d1e0f',
+     '0f19cae55d5696cd10c7ccedaa68d2c5fedb5d416058cda596722c3ee011feda',
+     '0123456789abcdeffedcba98765432100123456789abcdeffedcba9876543210'),
+]
+
+
+class TestEcCurve(CloakTestCase):
+
+    def test_keygen_matches_jsnark(self):
+        for rnd, pk, sk in keygen_vectors:
+            secret = ec_curve.secret_from_randomness(bytes.fromhex(rnd))
+            self.assertEqual(secret, int(sk, 16))
+            self.assertEqual(ec_curve.derive_pk(secret), int(pk, 16))
+
+    def test_ecdh_matches_jsnark(self):
+        for sk, other_pk, key in ecdh_vectors:
+            self.assertEqual(ec_curve.ecdh_sha256(int(other_pk, 16), int(sk, 16)), bytes.fromhex(key))
+
+    def test_invalid_point(self):
+        invalid_x = next(x for x in range(1, 100) if not ec_curve.is_on_curve(x))
+        with self.assertRaises(ValueError):
+            ec_curve.scalar_mult(ec_curve.secret_from_randomness(bytes(32)), invalid_x)
+
+
+class TestChaskey(CloakTestCase):
+
+    def test_encrypt_matches_jsnark(self):
+        for key, iv, plain, cipher in chaskey_vectors:
+            c = ChaskeyLtsCbc(bytes.fromhex(key))
+            self.assertEqual(c.encrypt(bytes.fromhex(iv), bytes.fromhex(plain)).hex(), cipher)
+
+    def test_decrypt_matches_jsnark(self):
+        for key, iv, plain, cipher in chaskey_vectors:
+            c = ChaskeyLtsCbc(bytes.fromhex(key))
+            self.assertEqual(c.decrypt(bytes.fromhex(iv), bytes.fromhex(cipher)).hex(), plain)
+
+    def test_key_schedule_cached(self):
+        key = bytes.fromhex(chaskey_vectors[0][0])
+        self.assertIs(ChaskeyLtsCbc.for_key(key), ChaskeyLtsCbc.for_key(key))
+
+    def test_invalid_length(self):
+        c = ChaskeyLtsCbc(bytes(16))
+        with self.assertRaises(ValueError):
+            c.encrypt(bytes(16), bytes(20))
+
+
+class TestSharedKeyCache(CloakTestCase):
+
+    def test_lru(self):
+        cache = SharedKeyCache(2)
+        cache.put('a', 1, b'1')
+        cache.put('a', 2, b'2')
+        self.assertEqual(cache.get('a', 1), b'1')
+        cache.put('b', 1, b'3')
+        self.assertIsNone(cache.get('a', 2))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_invalidate(self):
+        cache = SharedKeyCache(4)
+        cache.put('a', 1, b'1')
+        cache.put('b', 1, b'2')
+        cache.invalidate('a')
+        self.assertIsNone(cache.get('a', 1))
+        self.assertEqual(cache.get('b', 1), b'2')
+
+    def test_backend_uses_cache(self):
+        crypto = EcdhChaskeyCrypto(None)
+        sk, other_pk, key = ecdh_vectors[0]
+        crypto._sk_owners[int(sk, 16)] = 'a'
+        for _ in range(3):
+            self.assertEqual(crypto._shared_key(int(other_pk, 16), int(sk, 16)), bytes.fromhex(key))
+        self.assertEqual((crypto.shared_keys.hits, crypto.shared_keys.misses), (2, 1))
+
+
+class TestBatchEncryption(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.keystore = ZkayKeystoreInterface(None)
+        self.crypto = EcdhChaskeyCrypto(self.keystore)
+        self.addrs = [AddressValue(bytes([i]) * 20) for i in range(3)]
+        for addr, (rnd, pk, sk) in zip(self.addrs, keygen_vectors):
+            self.keystore.add_keypair(addr, KeyPair(PublicKeyValue([int(pk, 16)]), PrivateKeyValue(int(sk, 16))))
+            self.keystore.local_pk_store[addr] = self.keystore.pk(addr)
+
+    def test_enc_many_dec_many(self):
+        plains = [1, 2, 3, 4]
+        targets = [self.addrs[1], self.addrs[2], self.addrs[1], self.addrs[2]]
+        ciphers = [c for c, _ in self.crypto.enc_many(plains, self.addrs[0], targets)]
+        self.assertEqual(len(set(ciphers)), len(ciphers))
+
+        for target in self.addrs[1:]:
+            # Sender public key is stored in the last cipher element
+            own = [CipherValue(c[:-1] + (self.keystore.pk(self.addrs[0])[0], )) for c, t in zip(ciphers, targets) if t == target]
+            expected = [p for p, t in zip(plains, targets) if t == target]
+            self.assertEqual([p for p, _ in self.crypto.dec_many(own, target)], expected)
+            self.assertEqual([self.crypto.dec(c, target)[0] for c in own], expected)
+
+    def test_dec_many_empty_cipher(self):
+        self.assertEqual(self.crypto.dec_many([CipherValue()], self.addrs[0]), [(0, None)])
+
+
+class TestKeyFile(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_data_dir = cfg.data_dir
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        cfg.data_dir = self.tmp_dir.name
+        self.crypto = EcdhChaskeyCrypto(None)
+
+    def tearDown(self):
+        cfg.data_dir = self.old_data_dir
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def test_load_without_derivation(self):
+        address = '11' * 20
+        key_pair = self.crypto._generate_or_load_key_pair(address)
+        with patch.object(EcdhChaskeyCrypto, '_gen_keypair', side_effect=AssertionError):
+            loaded = self.crypto._generate_or_load_key_pair(address)
+        self.assertEqual((loaded.pk, loaded.sk), (key_pair.pk, key_pair.sk))
+
+    def test_legacy_file_upgraded(self):
+        rnd, pk, sk = keygen_vectors[1]
+        key_file = os.path.join(cfg.data_dir, 'keys', f'ec_{"22" * 20}.bin')
+        os.makedirs(os.path.dirname(key_file))
+        with open(key_file, 'wb') as f:
+            f.write(bytes.fromhex(rnd))
+        key_pair = self.crypto._generate_or_load_key_pair('22' * 20)
+        self.assertEqual((key_pair.pk[0], key_pair.sk.val), (int(pk, 16), int(sk, 16)))
+        self.assertGreater(os.path.getsize(key_file), 32)
+        self.assertEqual(self.crypto._generate_or_load_key_pair('22' * 20).sk, key_pair.sk)
+
+    def test_corrupted_file(self):
+        address = '33' * 20
+        self.crypto._generate_or_load_key_pair(address)
+        key_file = os.path.join(cfg.data_dir, 'keys', f'ec_{address}.bin')
+        with open(key_file, 'r+b') as f:
+            f.seek(50)
+            f.write(b'\x00\x01')
+        with self.assertRaises(ValueError):
+            self.crypto._generate_or_load_key_pair(address)
@@ -0,0 +1,63 @@
+import hashlib
+import os
+import tempfile
+
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.transaction.blockchain.deployment_registry import DeploymentRegistry
+from cloak.transaction.blockchain.web3py import Web3TesterBlockchain
+
+# Contract without constructor arguments, whose runtime code returns 1
+runtime_code = '600160005260206000f3'
+contract_interface = {'abi': [], 'bin': '600a600c600039600a6000f3' + runtime_code, 'deployed_bin': runtime_code}
+
+
+class TestDeploymentRegistry(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_registry = cfg.deployment_registry
+        self.chain = Web3TesterBlockchain()
+        self.sender = self.chain.w3.eth.accounts[0]
+
+    def tearDown(self):
+        cfg.deployment_registry = self.old_registry
+        super().tearDown()
+
+    def deployments(self) -> int:
+        return self.chain.w3.eth.getTransactionCount(self.sender)
+
+    def test_existing_deployment_linked(self):
+        address = self.chain._deploy_or_link_contract(self.sender, 'Verify', contract_interface)
+        self.assertEqual(self.chain._deploy_or_link_contract(self.sender, 'Verify', contract_interface), address)
+        self.assertEqual(self.deployments(), 1)
+
+    def test_stale_deployment_replaced(self):
+        self.chain.deployment_registry.register(self.chain.chain_id, self.code_hash(), '0x' + '11' * 20, 'Verify')
+        address = self.chain._deploy_or_link_contract(self.sender, 'Verify', contract_interface)
+        self.assertNotEqual(address, '0x' + '11' * 20)
+        self.assertEqual(self.deployments(), 1)
+
+        cfg.deployment_registry = 'trust'
+        self.chain.deployment_registry.register(self.chain.chain_id, self.code_hash(), '0x' + '11' * 20, 'Verify')
+        self.assertEqual(self.chain._deploy_or_link_contract(self.sender, 'Verify', contract_interface), '0x' + '11' * 20)
+
+    def test_off(self):
+        cfg.deployment_registry = 'off'
+        self.chain._deploy_or_link_contract(self.sender, 'Verify', contract_interface)
+        self.chain._deploy_or_link_contract(self.sender, 'Verify', contract_interface)
+        self.assertEqual(self.deployments(), 2)
+
+    def test_persisted(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            registry = DeploymentRegistry(os.path.join(tmp_dir, 'deployments.sqlite'))
+            registry.register(1, 'abc', '0x' + '22' * 20, 'Verify')
+            registry.close()
+            registry = DeploymentRegistry(os.path.join(tmp_dir, 'deployments.sqlite'))
+            self.assertEqual(registry.lookup(1, 'abc'), '0x' + '22' * 20)
+            self.assertIsNone(registry.lookup(2, 'abc'))
+            registry.close()
+
+    @staticmethod
+    def code_hash() -> str:
+        return hashlib.sha256(runtime_code.encode()).hexdigest()
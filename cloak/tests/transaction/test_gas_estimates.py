@@ -0,0 +1,109 @@
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.tests.transaction.local_rpc_server import LocalJsonRpcServer
+from cloak.transaction.blockchain.web3py import Web3HttpBlockchain
+from cloak.transaction.interface import TransactionFailedException
+from cloak.transaction.types import AddressValue
+
+contract_address = '0x' + '11' * 20
+sender = '0x' + '22' * 20
+
+abi = [{'name': 'f', 'type': 'function', 'stateMutability': 'nonpayable',
+        'inputs': [{'name': '', 'type': 'uint256[]'}], 'outputs': []}]
+
+
+class TestGasEstimates(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_uri, self.old_gas_estimate_cache = cfg.blockchain_node_uri, cfg.gas_estimate_cache
+        self.old_pipelined = cfg.pipelined_transactions
+        self.block_number = 5
+        self.sent = []
+        self.failing = False
+        self.server = LocalJsonRpcServer({
+            'eth_getBlockByNumber': lambda params: {'number': hex(self.block_number), 'gasLimit': hex(8000000)},
+            'eth_estimateGas': lambda params: hex(100000),
+            'eth_gasPrice': lambda params: '0x1',
+            'eth_getTransactionCount': lambda params: '0x0',
+            'eth_sendTransaction': self.send_transaction,
+            'eth_getTransactionReceipt': self.get_receipt,
+        }).__enter__()
+        cfg.blockchain_node_uri, cfg.gas_estimate_cache = self.server.url, True
+        self.chain = Web3HttpBlockchain()
+        self.contract = self.chain.w3.eth.contract(address=self.chain.w3.toChecksumAddress(contract_address), abi=abi)
+
+    def tearDown(self):
+        self.server.__exit__()
+        cfg.blockchain_node_uri, cfg.gas_estimate_cache = self.old_uri, self.old_gas_estimate_cache
+        cfg.pipelined_transactions = self.old_pipelined
+        super().tearDown()
+
+    def send_transaction(self, params):
+        self.sent.append(params[0])
+        return '0x' + format(len(self.sent), '064x')
+
+    def get_receipt(self, params):
+        return {'transactionHash': params[0], 'transactionIndex': '0x0', 'blockHash': '0x' + '33' * 32,
+                'blockNumber': hex(self.block_number), 'from': sender, 'to': contract_address, 'cumulativeGasUsed': '0x5208',
+                'gasUsed': '0x5208', 'contractAddress': None, 'logs': [], 'logsBloom': '0x' + '00' * 256,
+                'status': '0x0' if self.failing else '0x1'}
+
+    def block_requests(self) -> int:
+        # web3 itself requests the latest block once per sent transaction to fill in the fee fields
+        return self.server.calls.count('eth_getBlockByNumber') - len(self.sent)
+
+    def transact(self, arg, from_address=sender):
+        return self.chain.transact(self.contract, AddressValue(from_address), 'f', [arg], [False])
+
+    def test_estimate_and_gas_limit_reused(self):
+        for i in range(3):
+            self.transact([i, i + 1])
+        self.assertEqual(self.server.calls.count('eth_estimateGas'), 1)
+        self.assertEqual(self.block_requests(), 1)
+        self.assertEqual([int(tx['gas'], 16) for tx in self.sent], [120000] * 3)
+        self.assertEqual(len({tx['data'] for tx in self.sent}), 3)
+
+        # Different size class
+        self.transact(list(range(20)))
+        self.assertEqual(self.server.calls.count('eth_estimateGas'), 2)
+
+        # Gas limit is requested again once a new block was observed
+        self.block_number += 1
+        self.transact([1, 2])
+        self.transact([1, 2])
+        self.assertEqual(self.block_requests(), 2)
+
+    def test_estimate_per_sender(self):
+        self.transact([1])
+        self.transact([1], from_address='0x' + '44' * 20)
+        self.transact([2])
+        self.assertEqual(self.server.calls.count('eth_estimateGas'), 2)
+
+    def test_estimate_discarded_after_failure(self):
+        self.transact([1])
+        self.failing = True
+        with self.assertRaises(TransactionFailedException):
+            self.transact([2])
+        self.failing = False
+        self.transact([3])
+        self.assertEqual(self.server.calls.count('eth_estimateGas'), 2)
+
+    def test_off(self):
+        cfg.gas_estimate_cache = False
+        self.transact([1])
+        self.transact([1])
+        self.assertEqual(self.server.calls.count('eth_estimateGas'), 2)
+
+    def test_nonce_assigned_by_node(self):
+        cfg.pipelined_transactions = False
+        self.transact([1])
+        self.transact([2])
+        self.assertNotIn('eth_getTransactionCount', self.server.calls)
+        self.assertTrue(all('nonce' not in tx for tx in self.sent))
+
+        # Pipelined transactions get local nonces
+        cfg.pipelined_transactions = True
+        self.transact([3])
+        self.assertEqual(self.server.calls.count('eth_getTransactionCount'), 1)
+        self.assertEqual(int(self.sent[-1]['nonce'], 16), 0)
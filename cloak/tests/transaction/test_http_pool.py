@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.tests.transaction.local_rpc_server import LocalJsonRpcServer
+from cloak.transaction.blockchain.web3py import Web3HttpBlockchain, Web3AsyncHttpBlockchain
+from cloak.transaction.interface import BlockChainError, PendingTransaction
+from cloak.transaction.types import AddressValue
+
+contract_address = '0x' + '11' * 20
+sender = '0x' + '22' * 20
+
+# uint256 getter with a single uint256 key, the stand-in node returns 2 * key
+getter_abi = [{'name': 'cipher', 'type': 'function', 'stateMutability': 'view',
+               'inputs': [{'name': '', 'type': 'uint256'}], 'outputs': [{'name': '', 'type': 'uint256'}]}]
+
+
+class TestHttpPool(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old = cfg.blockchain_node_uri, cfg.blockchain_http_pool_size, cfg.blockchain_http_keepalive, cfg.blockchain_http_timeout
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = LocalJsonRpcServer({'eth_call': self.eth_call, 'eth_getTransactionReceipt': self.get_receipt}).__enter__()
+        cfg.blockchain_node_uri = self.server.url
+        cfg.blockchain_http_pool_size = 4
+
+    def tearDown(self):
+        self.server.__exit__()
+        cfg.blockchain_node_uri, cfg.blockchain_http_pool_size, cfg.blockchain_http_keepalive, cfg.blockchain_http_timeout = self.old
+        super().tearDown()
+
+    def eth_call(self, params):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        key = int(params[0]['data'][10:], 16)
+        if key == 99:
+            raise ValueError('execution reverted')
+        return '0x' + format(2 * key, '064x')
+
+    @staticmethod
+    def get_receipt(params):
+        if params[0].endswith('02'):
+            return None
+        return {'transactionHash': params[0], 'transactionIndex': '0x0', 'blockHash': '0x' + '33' * 32, 'blockNumber': '0x1',
+                'from': sender, 'to': contract_address, 'cumulativeGasUsed': '0x5208', 'gasUsed': '0x5208',
+                'contractAddress': None, 'logs': [], 'logsBloom': '0x' + '00' * 256, 'status': '0x1'}
+
+    def contract(self, chain):
+        return chain.w3.eth.contract(address=chain.w3.toChecksumAddress(contract_address), abi=getter_abi)
+
+    def test_keepalive(self):
+        chain = Web3HttpBlockchain()
+        contract = self.contract(chain)
+        for i in range(5):
+            self.assertEqual(chain.req_state_var(contract, 'cipher', i), 2 * i)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(chain.w3.provider.get_request_kwargs()['timeout'], cfg.blockchain_http_timeout)
+
+    def test_keepalive_off(self):
+        cfg.blockchain_http_keepalive = False
+        chain = Web3HttpBlockchain()
+        contract = self.contract(chain)
+        for i in range(3):
+            chain.req_state_var(contract, 'cipher', i)
+        self.assertEqual(self.server.connections, self.server.http_requests)
+
+    def test_async_reads_overlap(self):
+        chain = Web3AsyncHttpBlockchain()
+        contract = self.contract(chain)
+
+        async def read():
+            try:
+                vals = await chain.req_state_vars_async(contract, [('cipher', (i, )) for i in range(12)])
+                ret = await chain.call_async(contract, AddressValue(sender), 'cipher', 7)
+                return vals, ret
+            finally:
+                await chain.close_async()
+
+        vals, ret = asyncio.run(read())
+        self.assertEqual(vals, [2 * i for i in range(12)])
+        self.assertEqual(ret, 14)
+        self.assertGreater(self.max_in_flight, 1)
+        self.assertLessEqual(self.max_in_flight, cfg.blockchain_http_pool_size)
+
+    def test_async_error(self):
+        chain = Web3AsyncHttpBlockchain()
+
+        async def read():
+            try:
+                await chain.req_state_var_async(self.contract(chain), 'cipher', 99)
+            finally:
+                await chain.close_async()
+
+        with self.assertRaises(BlockChainError):
+            asyncio.run(read())
+
+    def test_async_receipts(self):
+        chain = Web3AsyncHttpBlockchain()
+        pending = PendingTransaction(chain, '0x' + '00' * 31 + '01', 'f')
+
+        async def wait():
+            try:
+                self.assertIsNone(await chain.get_receipt_async('0x' + '00' * 31 + '02'))
+                return await chain.wait_for_transactions_async([pending])
+            finally:
+                await chain.close_async()
+
+        receipts = asyncio.run(wait())
+        self.assertEqual(receipts[0]['gasUsed'], 21000)
+        self.assertTrue(pending.done())
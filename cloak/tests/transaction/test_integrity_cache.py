@@ -0,0 +1,89 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.transaction.blockchain.web3py import Web3TesterBlockchain
+from cloak.transaction.interface import IntegrityError
+
+runtime_code = '600160005260206000f3'
+contract_interface = {'abi': [], 'bin': '600a600c600039600a6000f3' + runtime_code, 'deployed_bin': runtime_code}
+
+
+class TestIntegrityCache(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_reverify = cfg.reverify
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sol_file = os.path.join(self.tmp_dir.name, 'Verify.sol')
+        with open(self.sol_file, 'w') as f:
+            f.write('contract Verify {}')
+
+        self.chain = Web3TesterBlockchain()
+        self.address = self.chain._deploy_contract(self.chain.w3.eth.accounts[0], contract_interface).address
+        self.compiled = []
+
+    def tearDown(self):
+        cfg.reverify = self.old_reverify
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def compile_contract(self, sol_filename, contract_name, libs=None, cwd=None):
+        self.compiled.append(contract_name)
+        return contract_interface
+
+    def verify(self):
+        with patch.object(Web3TesterBlockchain, 'compile_contract', self.compile_contract):
+            return self.chain._verify_contract_integrity(self.address, self.sol_file, contract_name='Verify')
+
+    def test_check_recorded(self):
+        self.verify()
+        self.verify()
+        self.assertEqual(self.compiled, ['Verify'])
+        entry, = self.chain.integrity_cache.entries()
+        self.assertEqual((entry['address'], entry['contract_name'], entry['source_file']), (self.address, 'Verify', self.sol_file))
+
+    def test_source_change_or_reverify_checks_again(self):
+        self.verify()
+        cfg.reverify = True
+        self.verify()
+        cfg.reverify = False
+        with open(self.sol_file, 'w') as f:
+            f.write('contract Verify { }')
+        self.verify()
+        self.assertEqual(self.compiled, ['Verify'] * 3)
+
+    def test_mismatch_not_recorded(self):
+        contract_interface_other = {**contract_interface, 'deployed_bin': '6000'}
+        with patch.object(Web3TesterBlockchain, 'compile_contract', lambda *args, **kwargs: contract_interface_other):
+            with self.assertRaises(IntegrityError):
+                self.chain._verify_contract_integrity(self.address, self.sol_file, contract_name='Verify')
+        self.assertEqual(self.chain.integrity_cache.entries(), [])
+
+    def test_library_links_recorded(self):
+        # Contract whose runtime code pushes the address of library Lib (PUSH20 <address>, POP, STOP)
+        lib_sol = os.path.join(self.tmp_dir.name, 'Lib.sol')
+        with open(lib_sol, 'w') as f:
+            f.write('library Lib {}')
+        with open(self.sol_file, 'w') as f:
+            f.write('contract Main {}')
+        placeholder = f'__${self.chain.w3.solidityKeccak(["string"], ["Lib.sol:Lib"]).hex()[2:36]}$__'
+        linked_code = '73' + self.address[2:].lower() + '5000'
+        main_address = self.chain._deploy_contract(self.chain.w3.eth.accounts[0], {
+            'abi': [], 'bin': '6017600c60003960176000f3' + linked_code}).address
+
+        def compile_contract(sol_filename, contract_name, libs=None, cwd=None):
+            self.compiled.append(contract_name)
+            return {'abi': [], 'deployed_bin': '73' + placeholder + '5000'}
+
+        verified = []
+        with patch.object(Web3TesterBlockchain, 'compile_contract', side_effect=compile_contract), \
+                patch.object(Web3TesterBlockchain, '_verify_contract_integrity', side_effect=lambda addr, *args, **kwargs: verified.append(addr)):
+            for _ in range(2):
+                addresses = self.chain._verify_library_integrity([('Lib', lib_sol)], main_address, self.sol_file)
+                self.assertEqual(addresses, {'Lib': self.address})
+        self.assertEqual(self.compiled, ['Main'])
+        # The library itself is still checked on every connect (which is served by its own cache entry)
+        self.assertEqual(verified, [self.address] * 2)
@@ -0,0 +1,185 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.transaction.blockchain.web3py import Web3TesterBlockchain
+from cloak.transaction.crypto.ecdh_chaskey import EcdhChaskeyCrypto
+from cloak.transaction.keystore.sqlite import SqliteKeystore
+from cloak.transaction.types import AddressValue, CipherValue, KeyPair, PublicKeyValue, PrivateKeyValue
+
+
+class FakeChain:
+    """Stands in for the blockchain backend, serves public keys pk(address) = [int(address)]."""
+
+    def __init__(self):
+        self.block_number = 100
+        self.requests = []
+        self.block_number_requests = 0
+
+    @staticmethod
+    def is_debug_backend() -> bool:
+        return False
+
+    def get_block_number(self) -> int:
+        self.block_number_requests += 1
+        return self.block_number
+
+    def req_public_keys(self, addresses):
+        self.requests.append(list(addresses))
+        return [PublicKeyValue([int.from_bytes(a.val, byteorder='big')] * cfg.key_len) for a in addresses]
+
+
+class TestSqliteKeystore(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, 'keystore.sqlite')
+        self.chain = FakeChain()
+        self.addrs = [AddressValue(i) for i in range(1, 5)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def new_keystore(self) -> SqliteKeystore:
+        return SqliteKeystore(self.chain, self.db_file)
+
+    def test_key_pairs_persisted(self):
+        ks = self.new_keystore()
+        for i, addr in enumerate(self.addrs):
+            ks.add_keypair(addr, KeyPair(PublicKeyValue([i] * cfg.key_len), PrivateKeyValue(1000 + i)))
+        ks.close()
+
+        ks = self.new_keystore()
+        self.assertFalse(AddressValue(99) in ks.local_key_pairs)
+        self.assertEqual(ks.sk(self.addrs[2]).val, 1002)
+        # Stored pairs only serve as an index, the crypto backend still has to load its keys
+        self.assertFalse(ks.has_initialized_keys_for(self.addrs[2]))
+        self.assertEqual(ks.load_key_pairs(), len(self.addrs))
+        self.assertEqual(ks.pk(self.addrs[3])[:], (3, ) * cfg.key_len)
+
+    def test_bulk_load(self):
+        ks = self.new_keystore()
+        ks.add_keypair(self.addrs[0], KeyPair(PublicKeyValue([0] * cfg.key_len), PrivateKeyValue(1000)))
+        ks.close()
+
+        ks = self.new_keystore()
+        with patch.object(ks, 'load_key_pairs', wraps=ks.load_key_pairs) as load:
+            self.assertEqual(ks.load_key_pairs(self.addrs), 1)
+            # Addresses which were looked up (even without stored keys) are not looked up again
+            self.assertEqual([a in ks.local_key_pairs for a in self.addrs], [True, False, False, False])
+            self.assertEqual(ks.pk(self.addrs[0])[0], 0)
+            with self.assertRaises(KeyError):
+                ks.sk(self.addrs[1])
+            self.assertEqual(load.call_count, 1)
+
+    def test_prefetch_single_request(self):
+        ks = self.new_keystore()
+        ks.prefetch_public_keys(self.addrs)
+        self.assertEqual(len(self.chain.requests), 1)
+        self.assertEqual(self.chain.block_number_requests, 1)
+        self.assertEqual(ks.getPk(self.addrs[1])[0], 2)
+        self.assertEqual(len(self.chain.requests), 1)
+
+    def test_foreign_keys_cached_until_stale(self):
+        self.new_keystore().prefetch_public_keys(self.addrs)
+        self.assertEqual(len(self.chain.requests), 1)
+
+        self.chain.block_number += cfg.keystore_pk_cache_blocks
+        self.new_keystore().prefetch_public_keys(self.addrs)
+        self.assertEqual(len(self.chain.requests), 1)
+
+        self.chain.block_number += 1
+        self.new_keystore().getPk(self.addrs[0])
+        self.assertEqual(self.chain.requests[1:], [[self.addrs[0]]])
+
+
+    def test_forget_chain_state(self):
+        ks = self.new_keystore()
+        ks.add_keypair(self.addrs[0], KeyPair(PublicKeyValue([0] * cfg.key_len), PrivateKeyValue(1000)))
+        ks.add_keypair(self.addrs[1], KeyPair(PublicKeyValue([1] * cfg.key_len), PrivateKeyValue(1001)))
+        ks.prefetch_public_keys(self.addrs[2:])
+        ks.forget_chain_state(keep_key_pairs=self.addrs[:1])
+        self.assertEqual(list(ks.local_key_pairs), self.addrs[:1])
+        self.assertEqual(ks.local_pk_store, {})
+
+        # Foreign keys are requested from the pki again, dropped key pairs are loaded from the database again
+        ks.prefetch_public_keys(self.addrs[2:])
+        self.assertEqual(self.chain.requests, [self.addrs[2:]] * 2)
+        with patch.object(ks, 'load_key_pairs', wraps=ks.load_key_pairs) as load:
+            self.assertEqual(ks.sk(self.addrs[1]).val, 1001)
+            self.assertEqual(ks.sk(self.addrs[0]).val, 1000)
+            self.assertEqual(load.call_count, 1)
+        self.assertEqual([ks.has_initialized_keys_for(a) for a in self.addrs[:2]], [True, False])
+
+
+class TestSqliteKeystoreCrypto(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_data_dir, self.old_crypto_backend = cfg.data_dir, cfg.crypto_backend
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        cfg.data_dir = self.tmp_dir.name
+        cfg.crypto_backend = 'ecdh-chaskey'
+        self.chain = FakeChain()
+        self.addrs = [AddressValue(bytes([i]) * 20) for i in range(1, 3)]
+
+    def tearDown(self):
+        cfg.data_dir, cfg.crypto_backend = self.old_data_dir, self.old_crypto_backend
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def init_keys(self, ks: SqliteKeystore, crypto: EcdhChaskeyCrypto):
+        # Same as ContractSimulator.initialize_keys_for
+        for addr in self.addrs:
+            if not ks.has_initialized_keys_for(addr):
+                crypto.generate_or_load_key_pair(addr)
+            ks.local_pk_store[addr] = ks.pk(addr)
+
+    def test_loaded_key_pair_decrypts(self):
+        ks = SqliteKeystore(self.chain)
+        self.init_keys(ks, EcdhChaskeyCrypto(ks))
+        sks = [ks.sk(addr).val for addr in self.addrs]
+        ks.close()
+
+        ks = SqliteKeystore(self.chain)
+        crypto = EcdhChaskeyCrypto(ks)
+        self.assertEqual(ks.load_key_pairs(self.addrs), 2)
+        self.init_keys(ks, crypto)
+        self.assertEqual([ks.sk(addr).val for addr in self.addrs], sks)
+        self.assertEqual(crypto._sk_owners, {sk: addr.val.hex() for sk, addr in zip(sks, self.addrs)})
+
+        # Encrypted by the sender with a fresh backend, decrypted by the receiver with the keys loaded from the database
+        sender = EcdhChaskeyCrypto(ks)
+        cipher, _ = sender.enc(42, self.addrs[0], self.addrs[1])
+        cipher = CipherValue(cipher[:-1] + (ks.pk(self.addrs[0])[0], ))
+        self.assertEqual(crypto.dec(cipher, self.addrs[1])[0], 42)
+        ks.close()
+
+    def test_key_file_wins(self):
+        ks = SqliteKeystore(self.chain)
+        self.init_keys(ks, EcdhChaskeyCrypto(ks))
+        key_pair = ks.local_key_pairs[self.addrs[0]]
+        ks.add_keypair(self.addrs[0], KeyPair(PublicKeyValue([1]), PrivateKeyValue(1)))
+        ks.close()
+
+        # The stored pair drifted from the key file, it is replaced once the crypto backend loads the key file
+        ks = SqliteKeystore(self.chain)
+        self.init_keys(ks, EcdhChaskeyCrypto(ks))
+        self.assertEqual(ks.sk(self.addrs[0]), key_pair.sk)
+        ks.close()
+        self.assertEqual(SqliteKeystore(self.chain).sk(self.addrs[0]), key_pair.sk)
+
+
+class TestBatchedPublicKeys(CloakTestCase):
+
+    def test_single_batch(self):
+        chain = Web3TesterBlockchain()
+        chain._pki_contract = object()
+        with patch.object(chain, '_req_state_vars', return_value=[[1] * cfg.key_len, [2] * cfg.key_len]) as req:
+            pks = chain.req_public_keys([AddressValue(1), AddressValue(2)])
+        self.assertEqual([pk[0] for pk in pks], [1, 2])
+        req.assert_called_once_with(chain._pki_contract, [('getPk', (AddressValue(1).val, )), ('getPk', (AddressValue(2).val, ))])
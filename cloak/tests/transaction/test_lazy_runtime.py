@@ -0,0 +1,121 @@
+import asyncio
+from unittest.mock import patch
+
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.transaction import runtime
+from cloak.transaction.crypto.ecdh_base import SharedKeyCache
+from cloak.transaction.offchain import ApiWrapper
+from cloak.transaction.runtime import Runtime
+from cloak.transaction.types import AddressValue
+
+
+class FakeBackend:
+    created = []
+
+    def __init__(self, *args):
+        FakeBackend.created.append(type(self).__name__)
+
+
+class FakeBlockchain(FakeBackend):
+    def get_balance(self, address):
+        return 0
+
+    def call(self, contract_handle, sender, fname, *args):
+        return 1
+
+
+class FakeNetwork(FakeBackend):
+    pass
+
+
+class FakeKeystore(FakeBackend):
+    pass
+
+
+class FakeCrypto(FakeBackend):
+    pass
+
+
+class FakeProver(FakeBackend):
+    pass
+
+
+class TestLazyRuntime(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        FakeBackend.created = []
+        self.patches = [
+            patch.dict(runtime._blockchain_classes, {runtime.cfg.blockchain_backend: FakeBlockchain,
+                                                      runtime.cfg.cloak_network: FakeNetwork}),
+            patch.dict(runtime._keystore_classes, {runtime.cfg.keystore_backend: FakeKeystore}),
+            patch.dict(runtime._crypto_classes, {runtime.cfg.crypto_backend: FakeCrypto}),
+            patch.dict(runtime._prover_classes, {runtime.cfg.snark_backend: FakeProver}),
+        ]
+        for p in self.patches:
+            p.start()
+        Runtime.reset()
+
+    def tearDown(self):
+        Runtime.reset()
+        for p in reversed(self.patches):
+            p.stop()
+        super().tearDown()
+
+    def test_backends_created_on_first_use(self):
+        api = ApiWrapper('.', 'Contract', AddressValue(0))
+        self.assertEqual(FakeBackend.created, [])
+        self.assertEqual(Runtime.init_times(), {})
+
+        self.assertEqual(api.call('get', [], [(False, int)]), 1)
+        self.assertEqual(FakeBackend.created, ['FakeBlockchain'])
+
+        api.keystore
+        api.blockchain
+        self.assertEqual(FakeBackend.created, ['FakeBlockchain', 'FakeKeystore'])
+        self.assertEqual(set(Runtime.init_times()), {'blockchain', 'keystore'})
+
+    def test_init_times_reset(self):
+        Runtime.crypto()
+        self.assertEqual(set(Runtime.init_times()), {'blockchain', 'keystore', 'crypto'})
+        self.assertTrue(all(t >= 0 for t in Runtime.init_times().values()))
+        Runtime.reset()
+        self.assertEqual(Runtime.init_times(), {})
+
+    def test_cache_statistics_logged_on_reset(self):
+        Runtime.crypto().shared_keys = SharedKeyCache(4)
+        with patch.object(runtime.my_logging, 'data') as data:
+            for _ in range(3):
+                Runtime.crypto().shared_keys.get('a', 1)
+                Runtime.state_cache().get('c', 'x', 0)
+            Runtime.crypto().shared_keys.put('a', 1, b'k')
+            Runtime.crypto().shared_keys.get('a', 1)
+            self.assertEqual(data.call_count, 0)
+
+            Runtime.reset()
+            self.assertEqual(sorted(c.args for c in data.call_args_list),
+                             [('ecdhKeyCacheHits', 1), ('ecdhKeyCacheMisses', 3), ('stateCacheHits', 0), ('stateCacheMisses', 3)])
+
+    def test_cipher_return_values_decrypted_at_once(self):
+        api = ApiWrapper('.', 'Contract', AddressValue(0))
+        ciphers = []
+
+        def dec_many(cs, my_addr):
+            ciphers.append(cs)
+            return [(c[0], None) for c in cs]
+
+        with patch.object(FakeBlockchain, 'call', return_value=[[3, 0], 4, [0, 0]]), \
+                patch.object(FakeCrypto, 'dec_many', side_effect=dec_many, create=True):
+            self.assertEqual(api.call('get', [], [(True, int), (False, int), (True, bool)]), (3, 4, False))
+        self.assertEqual(len(ciphers), 1)
+        self.assertEqual([c[0] for c in ciphers[0]], [3, 0])
+
+    def test_call_async(self):
+        api = ApiWrapper('.', 'Contract', AddressValue(0))
+
+        async def call_async(contract_handle, sender, fname, *args):
+            return 2
+
+        self.assertEqual(asyncio.run(api.call_async('get', [], [(False, int)])), 1)
+        with patch.object(FakeBlockchain, 'call_async', side_effect=call_async, create=True):
+            self.assertEqual(asyncio.run(api.call_async('get', [], [(False, int)])), 2)
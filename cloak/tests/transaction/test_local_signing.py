@@ -0,0 +1,78 @@
+import os
+import tempfile
+from unittest.mock import patch, PropertyMock
+
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.transaction.blockchain.local_signer import LocalAccountPool
+from cloak.transaction.blockchain.web3py import Web3TesterBlockchain
+from cloak.transaction.types import AddressValue
+
+# Contract without constructor arguments, whose runtime code returns 1
+runtime_code = '600160005260206000f3'
+contract_interface = {'abi': [], 'bin': '600a600c600039600a6000f3' + runtime_code}
+
+
+class TestLocalAccountPool(CloakTestCase):
+
+    def test_derived_accounts(self):
+        pool = LocalAccountPool()
+        addresses = pool.derive_accounts('load-test', 5)
+        self.assertEqual(len(set(addresses)), 5)
+        self.assertEqual(LocalAccountPool().derive_accounts(b'load-test', 2, start=3), addresses[3:])
+        self.assertIn(addresses[0].lower(), pool)
+        self.assertNotIn('0x' + '11' * 20, pool)
+
+    def test_key_file(self):
+        keys = ['0x' + format(i, '064x') for i in (1, 2)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'keys.txt')
+            with open(filename, 'w') as f:
+                f.write(f'# load-test accounts\n{keys[0]}\n\n{keys[1]}\n')
+            pool = LocalAccountPool.from_key_file(filename)
+        self.assertEqual(pool.addresses, [pool.account(a).address for a in pool.addresses])
+        self.assertEqual(pool.addresses[0], '0x7E5F4552091A69125d5DfCb7b8C2659029395Bdf')
+        self.assertEqual(len(pool), 2)
+
+
+class TestLocalSigning(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.chain = Web3TesterBlockchain()
+        self.accounts = self.chain.signer.derive_accounts('load-test', 20)
+        funder = self.chain.w3.eth.accounts[0]
+        for account in self.accounts:
+            self.chain.w3.eth.sendTransaction({'from': funder, 'to': account, 'value': 10 ** 18})
+
+    def test_signed_in_process(self):
+        with patch.object(self.chain.w3.eth, 'sendTransaction', side_effect=AssertionError('node-side signing')):
+            handle = self.chain._deploy_contract(self.accounts[0].lower(), contract_interface)
+        self.assertEqual(self.chain.w3.eth.getCode(handle.address).hex(), '0x' + runtime_code)
+        self.assertEqual(self.chain.w3.eth.getTransactionCount(self.accounts[0]), 1)
+
+    def test_account_pool(self):
+        w3 = self.chain.w3
+        factory = w3.eth.contract(abi=contract_interface['abi'], bytecode=contract_interface['bin'])
+        with patch.object(type(w3.eth), 'gasPrice', new_callable=PropertyMock, return_value=1) as gas_price:
+            # Several transactions per account in flight at once, nonces are assigned locally per account
+            pending = [self.chain.submit(factory, AddressValue(account), 'constructor', [], [])
+                       for _ in range(2) for account in self.accounts]
+        receipts = self.chain.wait_for_transactions(pending)
+        self.assertTrue(all(r['status'] == 1 for r in receipts))
+        self.assertTrue(all(w3.eth.getTransactionCount(account) == 2 for account in self.accounts))
+        # The gas price is only requested again once a newer block was observed
+        self.assertEqual(gas_price.call_count, 1)
+        self.assertIsNone(self.chain._gas_price)
+
+    def test_default_account(self):
+        old_keys = cfg.blockchain_signing_keys
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg.blockchain_signing_keys = os.path.join(tmp_dir, 'keys.txt')
+            with open(cfg.blockchain_signing_keys, 'w') as f:
+                f.write('0x' + format(1, '064x'))
+            try:
+                chain = Web3TesterBlockchain()
+                self.assertEqual(chain.default_address, AddressValue('0x7E5F4552091A69125d5DfCb7b8C2659029395Bdf'))
+            finally:
+                cfg.blockchain_signing_keys = old_keys
@@ -0,0 +1,103 @@
+import time
+from unittest.mock import patch
+
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.tests.transaction.local_rpc_server import LocalJsonRpcServer
+from cloak.transaction.blockchain import web3py
+from cloak.transaction.blockchain.web3py import Web3HttpBlockchain, Web3TesterBlockchain
+from cloak.transaction.types import AddressValue
+
+sender = AddressValue('0x' + '22' * 20)
+coinbase = '0x' + '44' * 20
+
+
+class TestSpecialVariablesCache(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_uri, self.old_mode = cfg.blockchain_node_uri, cfg.special_variables_cache
+        self.head = 10
+        self.new_heads = []
+        self.server = LocalJsonRpcServer({
+            'eth_blockNumber': lambda params: hex(self.head),
+            'eth_getBlockByNumber': lambda params: {'number': hex(self.head + 1), 'difficulty': '0x1', 'gasLimit': hex(8000000),
+                                                   'timestamp': hex(1000 + self.head)},
+            'eth_coinbase': lambda params: coinbase,
+            'eth_gasPrice': lambda params: '0x3',
+            'eth_newBlockFilter': lambda params: '0x1',
+            'eth_getFilterChanges': self.filter_changes,
+        }).__enter__()
+        cfg.blockchain_node_uri = self.server.url
+        self.chain = Web3HttpBlockchain()
+
+    def tearDown(self):
+        if self.chain._head_subscription is not None:
+            self.chain._head_subscription.stop()
+        self.server.__exit__()
+        cfg.blockchain_node_uri, cfg.special_variables_cache = self.old_uri, self.old_mode
+        super().tearDown()
+
+    def filter_changes(self, params):
+        changes, self.new_heads = self.new_heads, []
+        return changes
+
+    def advance_head(self):
+        self.head += 1
+        self.new_heads.append('0x' + format(self.head, '064x'))
+
+    def block(self):
+        _, block, tx = self.chain.get_special_variables(sender)
+        self.assertEqual((block.coinbase, block.gaslimit, block.timestamp - block.number, tx.gasprice), (AddressValue(coinbase), 8000000, 999, 3))
+        return block.number
+
+    def test_head(self):
+        self.assertEqual([self.block() for _ in range(3)], [11] * 3)
+        self.assertEqual(self.server.calls.count('eth_getBlockByNumber'), 1)
+        self.assertEqual(self.server.calls.count('eth_blockNumber'), 2)
+        # Apart from checking the head, a transaction at an unchanged head makes no request
+        requests_before = self.server.http_requests
+        self.block()
+        self.assertEqual(self.server.http_requests - requests_before, 1)
+
+        self.advance_head()
+        self.assertEqual(self.block(), 12)
+        self.assertEqual(self.server.calls.count('eth_getBlockByNumber'), 2)
+
+    def test_single_round_trip_per_refresh(self):
+        requests_before = self.server.http_requests
+        self.block()
+        self.assertEqual(self.server.http_requests - requests_before, 1)
+        self.assertEqual(self.server.calls.count('eth_coinbase'), 1)
+
+    def test_subscription(self):
+        cfg.special_variables_cache = 'subscription'
+        with patch.object(web3py, 'head_poll_interval', 0.01):
+            self.block()
+            self.assertEqual([self.block() for _ in range(3)], [11] * 3)
+            self.assertEqual(self.server.calls.count('eth_blockNumber'), 0)
+            self.assertEqual(self.server.calls.count('eth_getBlockByNumber'), 1)
+
+            self.advance_head()
+            deadline = time.monotonic() + 5
+            while self.block() != 12 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(self.block(), 12)
+
+    def test_off(self):
+        cfg.special_variables_cache = 'off'
+        self.block()
+        self.block()
+        self.assertEqual(self.server.calls.count('eth_getBlockByNumber'), 2)
+
+
+class TestTesterSpecialVariables(CloakTestCase):
+
+    def test_receipt_advances_head(self):
+        chain = Web3TesterBlockchain()
+        account = AddressValue(chain.w3.eth.accounts[0])
+        _, block, _ = chain.get_special_variables(account)
+        contract = chain.w3.eth.contract(abi=[], bytecode='600a600c600039600a6000f3' + '600160005260206000f3')
+        chain.transact(contract, account, 'constructor', [], [])
+        _, next_block, _ = chain.get_special_variables(account)
+        self.assertEqual(next_block.number, block.number + 1)
@@ -0,0 +1,112 @@
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.transaction.offchain import StateDict
+from cloak.transaction.state_cache import StateCache
+
+contract = '0x' + '11' * 20
+
+
+class FakeApi:
+    """Stands in for the ApiWrapper, serves the number of requests made so far as state value."""
+
+    def __init__(self):
+        self.requests = 0
+        self.verifier_contract_address = contract
+        self.blockchain = self
+        self.block_number = 10
+        self.block_number_requests = 0
+
+    def get_block_number(self):
+        self.block_number_requests += 1
+        return self.block_number
+
+    def _req_state_var(self, name, *indices, count=0):
+        self.requests += 1
+        return self.requests
+
+    def _req_state_vars(self, requests):
+        self.requests += 1
+        return [self.requests] * len(requests)
+
+
+class TestStateCache(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_strict, cfg.strict_state_reads = cfg.strict_state_reads, False
+        self.api = FakeApi()
+        self.cache = StateCache()
+        self.state = StateDict(self.api, self.cache)
+        self.state.decl('x')
+        self.state.decl('m')
+
+    def tearDown(self):
+        cfg.strict_state_reads = self.old_strict
+        super().tearDown()
+
+    def test_reused_at_same_block(self):
+        self.state.clear(contract, 10)
+        self.assertEqual(self.state['x'], 1)
+        self.state.clear(contract, 10)
+        self.assertEqual(self.state['x'], 1)
+        self.state.prefetch(['x', ('m', 3)])
+        self.assertEqual(self.api.requests, 2)
+        self.state.clear(contract, 10)
+        self.assertEqual(self.state['m', 3], 2)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+        self.assertEqual(self.cache.hit_rate, 0.5)
+
+    def test_invalidated_when_head_advances(self):
+        self.state.clear(contract, 10)
+        self.assertEqual(self.state['x'], 1)
+        self.state.clear(contract, 11)
+        self.assertEqual(self.state['x'], 2)
+
+    def test_invalidated_by_own_write(self):
+        self.state.clear(contract, 10)
+        self.assertEqual(self.state['x'], 1)
+        self.assertEqual(self.state['m', 1], 2)
+        self.state['x'] = 42
+        self.state.clear(contract, 10)
+        self.assertEqual(self.state['x'], 3)
+        self.assertEqual(self.state['m', 1], 2)
+
+    def test_no_reuse_without_scope(self):
+        self.state.clear(contract, 10)
+        self.assertEqual(self.state['x'], 1)
+        self.state.clear()
+        self.assertEqual(self.state['x'], 2)
+        self.state.clear(contract, 10)
+        self.assertEqual(self.state['x'], 1)
+
+    def test_views_reused_at_same_head(self):
+        self.assertEqual(self.state.get_raw('m', 1), 1)
+        self.assertEqual(self.state.get_raw('m', 1), 1)
+        self.assertEqual(self.state.get_plain('x'), 2)
+        self.assertEqual(self.state.get_plain('x'), 2)
+        self.api.block_number += 1
+        self.assertEqual(self.state.get_raw('m', 1), 3)
+
+        # Shared with transactions at the same head
+        self.state.clear(contract, self.api.block_number + 1)
+        self.assertEqual(self.state['m', 1], 3)
+
+        cfg.strict_state_reads = True
+        self.state.clear()
+        self.assertEqual(self.state.get_raw('m', 1), 4)
+
+    def test_view_scope(self):
+        with self.state.view_scope():
+            self.assertEqual([self.state.get_raw('m', i) for i in range(3)], [1, 2, 3])
+            self.assertEqual(self.state.get_raw('m', 1), 2)
+        self.assertEqual(self.api.block_number_requests, 1)
+        with self.state.view_scope(block_number=self.api.block_number):
+            self.assertEqual(self.state.get_plain('m', 0), 1)
+        self.assertEqual(self.api.block_number_requests, 1)
+
+    def test_strict_by_default(self):
+        cfg.strict_state_reads = self.old_strict
+        self.assertTrue(cfg.strict_state_reads)
+        self.assertEqual(self.state.get_raw('m', 1), 1)
+        self.assertEqual(self.state.get_raw('m', 1), 2)
+        self.assertEqual(self.api.block_number_requests, 0)
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.transaction.interface import BlockChainError
+from cloak.transaction.offchain import ContractSimulator
+from cloak.transaction.types import AddressValue
+
+user = AddressValue(7)
+
+policy = {
+    'contract': 'Token',
+    'states': [],
+    'functions': [
+        {'type': 'function', 'name': 'transfer', 'privacy': 1, 'entry': '0x00000000',
+         'inputs': [{'name': 'to', 'type': 'address', 'owner': 'all'}],
+         'read': [{'name': 'total'}, {'name': 'balances', 'keys': ['msg.sender', 'to']},
+                  {'name': 'allowed', 'keys': ['me:to', 'me:1']}],
+         'mutate': [{'name': 'balances', 'keys': ['msg.sender', 'to']}]},
+        {'type': 'function', 'name': 'secret', 'privacy': 3, 'entry': '0x00000001',
+         'read': [{'name': 'total'}]},
+    ]
+}
+
+
+class FakeApi:
+    """Stands in for the ApiWrapper, serves state value len(location)."""
+
+    def __init__(self, project_dir, contract_name, user_addr):
+        self.user_address = user_addr
+        self.requests = []
+        self.fail = False
+
+    def _req_state_vars(self, requests):
+        self.requests.append(requests)
+        if self.fail:
+            raise BlockChainError('location does not exist')
+        return [len(name) + len(indices) for name, indices, _ in requests]
+
+    async def _req_state_vars_async(self, requests):
+        await asyncio.sleep(0)
+        return self._req_state_vars(requests)
+
+    def _req_state_var(self, name, *indices, count=0):
+        self.requests.append([(name, indices, count)])
+        return len(name) + len(indices)
+
+
+class TestStatePrefetch(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        with patch('cloak.transaction.offchain.ApiWrapper', FakeApi):
+            self.sim = ContractSimulator(self.tmp_dir.name, user, 'Token')
+        for name in ['total', 'balances', 'allowed']:
+            self.sim.state.decl(name)
+        self.sim.policy_path = os.path.join(self.tmp_dir.name, 'policy.json')
+        with open(self.sim.policy_path, 'w') as f:
+            json.dump(policy, f)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def test_statically_known_keys(self):
+        self.assertEqual(self.sim._policy_state_keys('transfer'),
+                         [('total', ), ('balances', user), ('allowed', user, 1), ('balances', user)])
+        self.assertEqual(self.sim._policy_state_keys('secret'), [])
+        self.assertEqual(self.sim._policy_state_keys('unknown'), [])
+
+    def test_single_request(self):
+        self.sim._prefetch_state('transfer')
+        self.assertEqual(len(self.sim.api.requests), 1)
+        self.assertEqual(len(self.sim.api.requests[0]), 3)
+
+        # Prefetched values are served without further requests
+        self.assertEqual(self.sim.state['balances', user], len('balances') + 1)
+        self.assertEqual(self.sim.state['allowed', user, 1], len('allowed') + 2)
+        self.assertEqual(len(self.sim.api.requests), 1)
+
+    def test_failure_falls_back_to_lazy_reads(self):
+        self.sim.api.fail = True
+        self.sim._prefetch_state('transfer')
+        self.sim.api.fail = False
+        self.assertEqual(self.sim.state['total'], len('total'))
+        self.assertEqual(len(self.sim.api.requests), 2)
+
+    def test_prefetch_async(self):
+        asyncio.run(self.sim.state.prefetch_async(['total', ('balances', user), 'total']))
+        asyncio.run(self.sim.state.prefetch_async([('balances', user)]))
+        self.assertEqual(self.sim.api.requests, [[('total', (), 0), ('balances', (user, ), 0)]])
+        self.assertEqual(self.sim.state['balances', user], len('balances') + 1)
+        self.assertEqual(len(self.sim.api.requests), 1)
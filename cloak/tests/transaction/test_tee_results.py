@@ -0,0 +1,97 @@
+import threading
+import time
+from unittest.mock import patch
+
+from web3 import Web3
+
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.tests.transaction.local_ccf_client import LocalCCFClient
+from cloak.transaction.blockchain import web3py
+from cloak.transaction.blockchain.ccf_provider import CloakCCFProvider
+from cloak.transaction.blockchain.tee_results import poll_with_backoff
+from cloak.transaction.blockchain.web3py import Web3CloakCCFNetwork
+from cloak.transaction.interface import BlockChainError
+from cloak.transaction.types import AddressValue
+
+sender = '0x' + '22' * 20
+tee_contract_address = '0x' + '11' * 20
+
+compare_abi = [{'name': 'compareToAverage', 'type': 'function', 'stateMutability': 'nonpayable', 'inputs': [],
+                'outputs': [{'name': '', 'type': 'uint256'}]}]
+
+
+class LocalTeeNode:
+    """Stand-in TEE node, which executes a transaction once the other parties provided their inputs."""
+
+    def __init__(self, parties: int):
+        self.missing_inputs = parties
+        self.lock = threading.Lock()
+        self.client = LocalCCFClient({
+            'eth_blockNumber': lambda params: '0x1',
+            'eth_estimateGas': lambda params: hex(50000),
+            'eth_getBlockByNumber': lambda params: {'number': '0x1', 'gasLimit': hex(8000000)},
+            'eth_gasPrice': lambda params: '0x1',
+            'eth_sendTransaction': lambda params: '0x' + 'ab' * 32,
+            'eth_getTransactionReceipt': self.get_receipt,
+            'cloak_getTransactionResult': self.get_result,
+        })
+
+    def provide_input(self):
+        with self.lock:
+            self.missing_inputs -= 1
+
+    def get_receipt(self, params):
+        return {'transactionHash': params[0], 'transactionIndex': '0x0', 'blockHash': '0x' + '33' * 32, 'blockNumber': '0x1',
+                'from': sender, 'to': tee_contract_address, 'cumulativeGasUsed': '0x5208', 'gasUsed': '0x5208',
+                'contractAddress': None, 'logs': [], 'logsBloom': '0x' + '00' * 256, 'status': '0x1'}
+
+    def get_result(self, params):
+        with self.lock:
+            return 42 if self.missing_inputs == 0 else None
+
+
+class TestTeeResults(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.node = LocalTeeNode(parties=2)
+        with patch.object(Web3CloakCCFNetwork, '_create_w3_instance', lambda obj: Web3(CloakCCFProvider(self.node.client))):
+            self.network = Web3CloakCCFNetwork()
+        self.contract = self.network.w3.eth.contract(address=Web3.toChecksumAddress(tee_contract_address), abi=compare_abi)
+
+    def test_result_as_soon_as_inputs_provided(self):
+        # The other parties provide their inputs after 50ms and 100ms
+        timers = [threading.Timer(delay, self.node.provide_input) for delay in (0.05, 0.1)]
+        for t in timers:
+            t.start()
+
+        start = time.monotonic()
+        with patch.object(web3py, 'count', 0):
+            result = self.network.transact(self.contract, AddressValue(sender), 'compareToAverage', [], [])
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(result, 42)
+        self.assertLess(elapsed, 1)
+        self.assertLess(self.node.client.calls.count('cloak_getTransactionResult'), 15)
+
+    def test_timeout(self):
+        with self.assertRaises(BlockChainError):
+            poll_with_backoff(lambda: None, timeout=0.05)
+        self.assertEqual(poll_with_backoff(iter([None, None, 3]).__next__, timeout=1), 3)
+
+
+class TestTesterTeeNetwork(CloakTestCase):
+
+    def test_no_fixed_wait(self):
+        network = Web3CloakCCFNetwork()
+        account = AddressValue(network.w3.eth.accounts[0])
+        # Contract whose runtime code returns 1 for every call
+        handle = network._deploy_contract(account.val, {'abi': compare_abi, 'bin': '600a600c600039600a6000f3' + '600160005260206000f3'})
+        self.assertFalse(network.tee_results.supported())
+
+        start = time.monotonic()
+        with patch.object(web3py, 'count', 0):
+            for _ in range(3):
+                receipt = network.transact(handle, account, 'compareToAverage', [], [])
+                self.assertEqual(receipt['status'], 1)
+        self.assertLess(time.monotonic() - start, 2)
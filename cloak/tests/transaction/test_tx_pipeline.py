@@ -0,0 +1,97 @@
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.tests.transaction.local_rpc_server import LocalJsonRpcServer
+from cloak.transaction.blockchain.web3py import Web3TesterBlockchain, Web3HttpBlockchain
+from cloak.transaction.interface import PendingTransaction, TransactionFailedException
+from cloak.transaction.types import AddressValue
+
+# Contract without constructor arguments, whose runtime code returns 1
+runtime_code = '600160005260206000f3'
+bytecode = '600a600c600039600a6000f3' + runtime_code
+
+sender = '0x' + '22' * 20
+
+
+def receipt(tx_hash: str, status: int) -> dict:
+    return {'transactionHash': tx_hash, 'transactionIndex': '0x0', 'blockHash': '0x' + '33' * 32, 'blockNumber': '0x1',
+            'from': sender, 'to': None, 'cumulativeGasUsed': '0x5208', 'gasUsed': '0x5208', 'contractAddress': None,
+            'logs': [], 'logsBloom': '0x' + '00' * 256, 'status': hex(status)}
+
+
+class TestTesterPipeline(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_pipelined = cfg.pipelined_transactions
+        cfg.pipelined_transactions = True
+        self.chain = Web3TesterBlockchain()
+        self.sender = self.chain.w3.eth.accounts[0]
+        self.contract = self.chain.w3.eth.contract(abi=[], bytecode=bytecode)
+
+    def tearDown(self):
+        cfg.pipelined_transactions = self.old_pipelined
+        super().tearDown()
+
+    def submit(self) -> PendingTransaction:
+        return self.chain.submit(self.contract, AddressValue(self.sender), 'constructor', [], [])
+
+    def test_batch(self):
+        pending = [self.submit() for _ in range(5)]
+        self.assertEqual([self.chain.w3.eth.getTransaction(p.tx_hash)['nonce'] for p in pending], list(range(5)))
+
+        receipts = self.chain.wait_for_transactions(pending)
+        self.assertEqual(len({r['contractAddress'] for r in receipts}), 5)
+        self.assertTrue(all(p.done() for p in pending))
+        self.assertEqual(pending[0].wait(), receipts[0])
+
+    def test_mixed_with_synchronous_transactions(self):
+        self.submit()
+        self.chain.transact(self.contract, AddressValue(self.sender), 'constructor', [], [])
+        self.submit().wait()
+        self.assertEqual(self.chain.w3.eth.getTransactionCount(self.sender), 3)
+
+
+class TestBulkReceiptPolling(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_uri = cfg.blockchain_node_uri
+        self.polls = 0
+        self.server = LocalJsonRpcServer({'eth_getTransactionReceipt': self.get_receipt,
+                                          'eth_getTransactionCount': lambda params: '0x7'}).__enter__()
+        cfg.blockchain_node_uri = self.server.url
+        self.chain = Web3HttpBlockchain()
+
+    def tearDown(self):
+        self.server.__exit__()
+        cfg.blockchain_node_uri = self.old_uri
+        super().tearDown()
+
+    def get_receipt(self, params):
+        self.polls += 1
+        # Transactions are included after the first poll, the one with hash 0x..ff fails
+        if self.polls <= 3:
+            return None
+        return receipt(params[0], 0 if params[0].endswith('ff') else 1)
+
+    def pending(self, last_byte: str) -> PendingTransaction:
+        return PendingTransaction(self.chain, '0x' + '00' * 31 + last_byte, 'f')
+
+    def test_single_round_trip_per_poll(self):
+        receipts = self.chain.wait_for_transactions([self.pending('01'), self.pending('02'), self.pending('03')])
+        self.assertEqual([r['status'] for r in receipts], [1, 1, 1])
+        self.assertEqual(receipts[0]['gasUsed'], 21000)
+        self.assertEqual(self.server.http_requests - 1, 2)
+        self.assertEqual(self.server.calls.count('eth_getTransactionReceipt'), 6)
+
+    def test_failed_transaction(self):
+        pending = [self.pending('01'), self.pending('ff')]
+        with self.assertRaises(TransactionFailedException):
+            self.chain.wait_for_transactions(pending)
+        self.assertTrue(all(p.done() for p in pending))
+
+    def test_local_nonces(self):
+        self.assertEqual([self.chain._next_nonce(sender) for _ in range(3)], [7, 8, 9])
+        self.chain._reset_nonce(sender)
+        self.assertEqual(self.chain._next_nonce(sender), 7)
+        self.assertEqual(self.server.calls.count('eth_getTransactionCount'), 2)
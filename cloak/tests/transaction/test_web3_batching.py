@@ -0,0 +1,49 @@
+from cloak.config import cfg
+from cloak.tests.cloak_unit_test import CloakTestCase
+from cloak.tests.transaction.local_rpc_server import LocalJsonRpcServer
+from cloak.transaction.blockchain.web3py import Web3HttpBlockchain
+from cloak.transaction.interface import BlockChainError
+
+contract_address = '0x' + '11' * 20
+
+# uint256 getter with a single uint256 key, the stand-in node returns 2 * key
+getter_abi = [{'name': 'cipher', 'type': 'function', 'stateMutability': 'view',
+               'inputs': [{'name': '', 'type': 'uint256'}], 'outputs': [{'name': '', 'type': 'uint256'}]}]
+
+
+def eth_call(params):
+    key = int(params[0]['data'][10:], 16)
+    if key == 99:
+        raise ValueError('execution reverted')
+    return '0x' + format(2 * key, '064x')
+
+
+class TestWeb3StateBatching(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_uri = cfg.blockchain_node_uri
+        self.server = LocalJsonRpcServer({'eth_call': eth_call}).__enter__()
+        cfg.blockchain_node_uri = self.server.url
+        self.chain = Web3HttpBlockchain()
+        self.contract = self.chain.w3.eth.contract(address=self.chain.w3.toChecksumAddress(contract_address), abi=getter_abi)
+
+    def tearDown(self):
+        self.server.__exit__()
+        cfg.blockchain_node_uri = self.old_uri
+        super().tearDown()
+
+    def test_single_round_trip(self):
+        requests_before = self.server.http_requests
+        vals = self.chain.req_state_vars(self.contract, [('cipher', (i, )) for i in range(5)])
+        self.assertEqual(vals, [0, 2, 4, 6, 8])
+        self.assertEqual(self.server.http_requests - requests_before, 1)
+        self.assertEqual(self.server.calls.count('eth_call'), 5)
+
+    def test_same_result_as_single_requests(self):
+        self.assertEqual(self.chain.req_state_vars(self.contract, [('cipher', (7, ))]),
+                         [self.chain.req_state_var(self.contract, 'cipher', 7)])
+
+    def test_error(self):
+        with self.assertRaises(BlockChainError):
+            self.chain.req_state_vars(self.contract, [('cipher', (1, )), ('cipher', (99, ))])
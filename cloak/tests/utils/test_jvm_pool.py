@@ -0,0 +1,112 @@
+import os
+import shutil
+import sys
+import unittest
+import tempfile
+import textwrap
+from subprocess import SubprocessError
+from unittest.mock import patch
+
+from cloak.config import cfg
+from cloak.jsnark_interface import jsnark_interface
+from cloak.jsnark_interface.jvm_pool import JvmPool
+from cloak.tests.cloak_unit_test import CloakTestCase
+
+# Speaks the CloakJvmWorker protocol, main classes: echo (print args), touch (create file), fail, exit
+fake_worker = textwrap.dedent('''\
+    import os, sys
+    out = sys.stdout.buffer
+    for line in sys.stdin:
+        cp, main_class, *args = line.rstrip('\\n').split('\\t')
+        if main_class == 'exit':
+            sys.exit(1)
+        if main_class == 'touch':
+            open(args[0], 'w').close()
+        res = (' '.join(args) if main_class == 'echo' else '').encode()
+        status = 1 if main_class == 'fail' else 0
+        out.write(f'{status} {len(res)} 0\\n'.encode() + res)
+        out.flush()
+''')
+
+
+class TestJvmPool(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pool = JvmPool([sys.executable, '-c', fake_worker], max_workers=2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+        super().tearDown()
+
+    def test_reuse(self):
+        self.assertEqual(self.pool.run('echo', ['a', 'b']), (0, 'a b', ''))
+        self.assertEqual(self.pool.run('fail', []), (1, '', ''))
+        self.assertEqual(self.pool._worker_count, 1)
+
+    def test_output_files_moved(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.pool.run('touch', ['out.txt'], cwd=d)
+            self.assertTrue(os.path.exists(os.path.join(d, 'out.txt')))
+
+    def test_worker_died(self):
+        with self.assertRaises(SubprocessError):
+            self.pool.run('exit', [])
+        self.assertEqual(self.pool._worker_count, 0)
+        self.assertEqual(self.pool.run('echo', ['a']), (0, 'a', ''))
+
+
+class TestJvmWorkerCompilation(CloakTestCase):
+
+    def test_failed_compilation_cleaned_up(self):
+        old_data_dir = cfg.data_dir
+        with tempfile.TemporaryDirectory() as d:
+            cfg.data_dir = d
+            try:
+                with patch.object(jsnark_interface, 'run_command', side_effect=SubprocessError('javac failed')):
+                    with self.assertRaises(SubprocessError):
+                        jsnark_interface._compile_jvm_worker()
+                self.assertEqual(os.listdir(os.path.join(d, 'jvm_worker')), [])
+            finally:
+                cfg.data_dir = old_data_dir
+
+
+# Main class which writes its arguments to an output file in the working directory (like jsnark circuit compilation)
+compile_main = textwrap.dedent('''\
+    public class PoolCompile {
+        public static void main(String[] args) throws Exception {
+            System.out.println("compiled " + String.join(" ", args));
+            java.nio.file.Files.write(java.nio.file.Paths.get("out.txt"), String.join(" ", args).getBytes());
+        }
+    }
+''')
+
+
+@unittest.skipUnless(shutil.which('java') and shutil.which('javac'), 'requires a java toolchain')
+class TestPooledJavaOperations(CloakTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old_operations = cfg.jvm_pool_operations
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp_dir.name, 'PoolCompile.java'), 'w') as f:
+            f.write(compile_main)
+        jsnark_interface.run_command(['javac', '-cp', jsnark_interface.circuit_builder_jar, 'PoolCompile.java'], cwd=self.tmp_dir.name)
+
+    def tearDown(self):
+        cfg.jvm_pool_operations = self.old_operations
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def run_compile(self):
+        out_dir = tempfile.mkdtemp(dir=self.tmp_dir.name)
+        output, _ = jsnark_interface.run_java_main('compile', 'PoolCompile', ['compile', 'a'], classpath_dir=self.tmp_dir.name, cwd=out_dir)
+        with open(os.path.join(out_dir, 'out.txt')) as f:
+            return output, f.read()
+
+    def test_pooled_compile_matches_fresh_jvm(self):
+        cfg.jvm_pool_operations = ''
+        expected = self.run_compile()
+        cfg.jvm_pool_operations = 'compile'
+        self.assertEqual(self.run_compile(), expected)
+        self.assertEqual(expected, ('compiled compile a', 'compile a'))
@@ -7,6 +7,7 @@ Submodules
 * :py:mod:`.interface`: Runtime API interface
 * :py:mod:`.offchain`: Offchain simulator base class with common functionality
 * :py:mod:`.runtime`: Static class which provides access to the individual API backend singletons.
+* :py:mod:`.state_cache`: Cache of state values which is shared between transactions issued at the same chain head.
 * :py:mod:`.types`: Type wrapper classes (for safer API interactions) used by the Runtime API.
 
 ===========
@@ -4,9 +4,15 @@ This package contains the blockchain interaction backends
 ==========
 Submodules
 ==========
+* :py:mod:`.ccf_transport`: Pooled keep-alive transport to CCF nodes.
+* :py:mod:`.deployment_registry`: Local registry of deployed contracts, keyed by chain id and deployed bytecode hash.
+* :py:mod:`.head_subscription`: Background detection of new chain heads.
+* :py:mod:`.integrity_cache`: Persistent, auditable record of successful contract integrity checks.
+* :py:mod:`.local_signer`: Locally held account keys, for signing transactions in-process.
+* :py:mod:`.tee_results`: Event-driven retrieval of TEE transaction results (long polling with exponential backoff).
 * :py:mod:`.web3py`: Contains several web3-based backends.
 """
 
 from .web3py import Web3TesterBlockchain, Web3HttpGanacheBlockchain
-from .web3py import Web3IpcBlockchain, Web3WebsocketBlockchain, Web3HttpBlockchain, Web3CustomBlockchain
+from .web3py import Web3IpcBlockchain, Web3WebsocketBlockchain, Web3HttpBlockchain, Web3AsyncHttpBlockchain, Web3CustomBlockchain
 from .web3py import Web3CloakCCFNetwork
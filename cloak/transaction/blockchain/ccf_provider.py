@@ -1,10 +1,13 @@
-import itertools
-from eth_utils import types
+import os
+import tempfile
 import web3
 import ccf.clients
-from loguru import logger as LOG
 import http
 import json
+import requests
+
+from cloak import my_logging
+from cloak.config import cfg
 
 
 class CloakCCFProvider(web3.providers.BaseProvider):
@@ -14,16 +17,35 @@ class CloakCCFProvider(web3.providers.BaseProvider):
         if not logging:
             self.disable_logging()
 
-        response = self.ccf_client.get("/app/api")
-        self.supported_methods = response.body.json()["paths"]
+        self._methods_from_cache = False
+        self.supported_methods = self._load_cached_methods()
+        if self.supported_methods is None:
+            self.supported_methods = self._request_methods()
         # print(json.dumps(self.supported_methods, sort_keys=True, indent=4, separators=(', ', ': '), ensure_ascii=False))
 
     def disable_logging(self):
         pass
 
+    def supports(self, method):
+        return self._http_path(method) is not None
+
     def make_request(self, method, params):
-        http_path = "/" + method
-        if http_path not in self.supported_methods:
+        return self._parse_response(method, self.ccf_client.call(*self._prepare_call(method, params)))
+
+    def make_requests(self, method_calls):
+        """
+        Issue all (method, params) requests and return their responses in order.
+
+        If the ccf client supports it (see CCFHttpTransport.call_many), the requests are issued concurrently.
+        """
+        calls = [self._prepare_call(method, params) for method, params in method_calls]
+        call_many = getattr(self.ccf_client, 'call_many', None)
+        responses = call_many(calls) if call_many is not None else [self.ccf_client.call(*c) for c in calls]
+        return [self._parse_response(method, response) for (method, _), response in zip(method_calls, responses)]
+
+    def _prepare_call(self, method, params):
+        http_path = self._http_path(method)
+        if http_path is None:
             raise web3.exceptions.CannotHandleRequest(
                 f"CCF does not support '{method}'"
             )
@@ -32,20 +54,59 @@ class CloakCCFProvider(web3.providers.BaseProvider):
 
         # if method == "cloak_sendPrivacyPolicy":
         #     params[0] = params[0].hex()
-            
-        response = self.ccf_client.call("/app"+http_path, params, http_verb)
-     
+
+        return "/app" + http_path, params, http_verb
+
+    def _http_path(self, method):
+        http_path = "/" + method
+        if http_path not in self.supported_methods and self._methods_from_cache:
+            # The node may have been upgraded since the method table was cached
+            self.supported_methods = self._request_methods()
+        return http_path if http_path in self.supported_methods else None
+
+    @staticmethod
+    def _parse_response(method, response):
         if response.status_code != http.HTTPStatus.OK:
-            LOG.warning("CCF fail to process HTTP request: "+str(response))
+            my_logging.warning(f"CCF fail to process HTTP request: {response}")
 
-        print("response: {}".format(response.body))
+        my_logging.debug(f"CCF response to {method}: {response.body}")
         return response.body.json()
 
+    def _method_cache_file(self):
+        identity = getattr(self.ccf_client, 'identity', None)
+        return None if identity is None else os.path.join(cfg.data_dir, 'ccf_api', f'{identity}.json')
+
+    def _load_cached_methods(self):
+        filename = self._method_cache_file()
+        if filename is None or not os.path.exists(filename):
+            return None
+        try:
+            with open(filename) as f:
+                methods = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._methods_from_cache = True
+        return methods
+
+    def _request_methods(self):
+        response = self.ccf_client.get("/app/api")
+        methods = response.body.json()["paths"]
+        self._methods_from_cache = False
+
+        filename = self._method_cache_file()
+        if filename is not None:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(filename))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(methods, f)
+            os.replace(tmp_file, filename)
+        return methods
+
     def isConnected(self):
         try:
             r = self.ccf_client.get("/node/state")
             return r.status_code == http.HTTPStatus.OK
-        except ccf.clients.CCFConnectionException as con_exec:
-            LOG.warning("Fail to connect CCF node: " + con_exec)
+        except (ccf.clients.CCFConnectionException, requests.exceptions.ConnectionError) as con_exec:
+            my_logging.warning(f"Fail to connect CCF node: {con_exec}")
 
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,92 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cloak.config import cfg
+
+
+class CCFResponse:
+    """Response of a CCF node (same shape as the responses of ccf.clients.CCFClient)."""
+
+    class Body:
+        def __init__(self, data: bytes):
+            self.data = data
+
+        def json(self) -> Any:
+            return json.loads(self.data)
+
+        def __str__(self):
+            return self.data.decode('utf-8', errors='replace')
+
+    def __init__(self, status_code: int, data: bytes):
+        self.status_code = status_code
+        self.body = CCFResponse.Body(data)
+
+    def __str__(self):
+        return f'{self.status_code} {self.body}'
+
+
+class CCFHttpTransport:
+    """
+    Pooled keep-alive transport to a CCF node, which can be used in place of ccf.clients.CCFClient by CloakCCFProvider.
+
+    All requests share a pool of pool_size connections (requests wait for a free connection instead of opening new ones).
+    Independent requests can be issued concurrently with call_many, such that up to pool_size requests are in flight at once.
+    If ca is given, https is used and the node certificate is verified against ca (client authentication uses cert and key).
+    """
+
+    def __init__(self, host: str, port: int, ca: Optional[str] = None, cert: Optional[str] = None, key: Optional[str] = None,
+                 pool_size: Optional[int] = None, timeout: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.ca = ca
+        self.pool_size = cfg.blockchain_http_pool_size if pool_size is None else pool_size
+        self.timeout = cfg.blockchain_http_timeout if timeout is None else timeout
+        self.base_url = f'{"https" if ca else "http"}://{host}:{port}'
+
+        self._session = requests.Session()
+        self._session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True))
+        if ca:
+            self._session.verify = ca
+            if cert:
+                self._session.cert = (cert, key) if key else cert
+        if not cfg.blockchain_http_keepalive:
+            self._session.headers['Connection'] = 'close'
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def identity(self) -> str:
+        """Identifies the node (address and network certificate), e.g. to cache node specific information."""
+        h = hashlib.sha256(f'{self.host}:{self.port}'.encode())
+        if self.ca:
+            with open(self.ca, 'rb') as f:
+                h.update(f.read())
+        return h.hexdigest()
+
+    def get(self, path: str) -> CCFResponse:
+        return self.call(path, None, 'GET')
+
+    def call(self, path: str, body: Any = None, http_verb: str = 'POST') -> CCFResponse:
+        if http_verb == 'GET':
+            response = self._session.get(self.base_url + path, timeout=self.timeout)
+        else:
+            response = self._session.request(http_verb, self.base_url + path, json=body, timeout=self.timeout)
+        return CCFResponse(response.status_code, response.content)
+
+    def call_many(self, calls: List[Tuple[str, Any, str]]) -> List[CCFResponse]:
+        """Issue all (path, body, http verb) calls concurrently over the pooled connections, return the responses in order."""
+        if len(calls) <= 1:
+            return [self.call(*c) for c in calls]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.pool_size, thread_name_prefix='ccf-transport')
+        return list(self._executor.map(lambda c: self.call(*c), calls))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._session.close()
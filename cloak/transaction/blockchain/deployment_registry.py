@@ -0,0 +1,52 @@
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from cloak.config import cfg
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS deployments (
+    chain_id INTEGER NOT NULL,
+    code_hash TEXT NOT NULL,
+    address TEXT NOT NULL,
+    contract_name TEXT NOT NULL,
+    PRIMARY KEY (chain_id, code_hash)
+);
+'''
+
+
+class DeploymentRegistry:
+    """
+    Registry of contracts which were deployed from this machine, keyed by chain id and hash of the deployed bytecode.
+
+    Contracts without constructor arguments (e.g. verification contracts) are fully determined by their deployed
+    bytecode, hence an existing deployment with the same bytecode hash can be used instead of deploying the contract again.
+    The registry is stored in cfg.data_dir/deployments.sqlite (or only in memory if db_file is ':memory:').
+    """
+
+    def __init__(self, db_file: Optional[str] = None):
+        self.db_file = os.path.join(cfg.data_dir, 'deployments.sqlite') if db_file is None else db_file
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_file, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(_schema)
+
+    def lookup(self, chain_id: int, code_hash: str) -> Optional[str]:
+        """Return the address of the registered deployment of the given code on the given chain or None."""
+        with self._lock:
+            row = self._db.execute('SELECT address FROM deployments WHERE chain_id = ? AND code_hash = ?', (chain_id, code_hash)).fetchone()
+        return None if row is None else row[0]
+
+    def register(self, chain_id: int, code_hash: str, address: str, contract_name: str):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO deployments VALUES (?, ?, ?, ?)', (chain_id, code_hash, address, contract_name))
+
+    def forget(self, chain_id: int, code_hash: str):
+        """Remove a deployment which turned out to be stale (e.g. the chain was reset)."""
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM deployments WHERE chain_id = ? AND code_hash = ?', (chain_id, code_hash))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
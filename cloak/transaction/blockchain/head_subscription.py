@@ -0,0 +1,40 @@
+import threading
+from typing import Callable
+
+from web3 import Web3
+
+
+class NewHeadSubscription:
+    """
+    Background subscription to new chain heads.
+
+    A new block filter is polled every poll_interval seconds in a daemon thread, and on_new_head is called whenever
+    the node reports new blocks. If the node cannot be polled, on_new_head is called as well (a head might have been
+    missed), such that values cached by the subscriber are never served for longer than one poll interval after a head change.
+    """
+
+    def __init__(self, w3: Web3, on_new_head: Callable[[], None], poll_interval: float = 1.0):
+        self._w3 = w3
+        self._on_new_head = on_new_head
+        self._poll_interval = poll_interval
+        self._filter = w3.eth.filter('latest')
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='cloak-new-heads', daemon=True)
+        self._thread.start()
+
+    @property
+    def active(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self._poll_interval):
+            try:
+                new_head = bool(self._filter.get_new_entries())
+            except Exception:
+                new_head = True
+            if new_head:
+                self._on_new_head()
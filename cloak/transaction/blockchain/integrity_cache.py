@@ -0,0 +1,95 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, List, Dict, Any
+
+from cloak.config import cfg
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS verified_contracts (
+    chain_id INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    code_hash TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    contract_name TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    abi TEXT NOT NULL,
+    cloak_version TEXT NOT NULL,
+    verified_at REAL NOT NULL,
+    PRIMARY KEY (chain_id, address, code_hash, source_hash)
+);
+CREATE TABLE IF NOT EXISTS verified_library_links (
+    chain_id INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    code_hash TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    contract_name TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    libraries TEXT NOT NULL,
+    cloak_version TEXT NOT NULL,
+    verified_at REAL NOT NULL,
+    PRIMARY KEY (chain_id, address, code_hash, source_hash)
+);
+'''
+
+
+class IntegrityCache:
+    """
+    Persistent record of successful contract integrity checks.
+
+    A check is identified by chain id, contract address, hash of the code at the address and hash of the local sources
+    (including imports and the compiler settings). If all four match a recorded check, the deployed contract is known to
+    match the local sources and does not have to be compiled and compared again. Every record keeps the contract name,
+    source file, cloak version and time of the check, such that the cache can be audited (see entries).
+    Library link checks (which library addresses a deployed contract is linked against) are recorded the same way,
+    together with the resolved library addresses (see lookup_libraries).
+    The records are stored in cfg.data_dir/integrity.sqlite (or only in memory if db_file is ':memory:').
+    """
+
+    def __init__(self, db_file: Optional[str] = None):
+        self.db_file = os.path.join(cfg.data_dir, 'integrity.sqlite') if db_file is None else db_file
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_file, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(_schema)
+
+    def lookup(self, chain_id: int, address: str, code_hash: str, source_hash: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the abi of the contract if the given check succeeded before, otherwise None."""
+        with self._lock:
+            row = self._db.execute('SELECT abi FROM verified_contracts WHERE chain_id = ? AND address = ? AND code_hash = ? AND source_hash = ?',
+                                   (chain_id, address, code_hash, source_hash)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def record(self, chain_id: int, address: str, code_hash: str, source_hash: str, contract_name: str, source_file: str, abi: List[Dict[str, Any]]):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO verified_contracts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (chain_id, address, code_hash, source_hash, contract_name, source_file, json.dumps(abi), cfg.cloak_version, time.time()))
+
+    def lookup_libraries(self, chain_id: int, address: str, code_hash: str, source_hash: str) -> Optional[Dict[str, str]]:
+        """Return the library addresses (by library name) if the given library link check succeeded before, otherwise None."""
+        with self._lock:
+            row = self._db.execute('SELECT libraries FROM verified_library_links WHERE chain_id = ? AND address = ? AND code_hash = ? AND source_hash = ?',
+                                   (chain_id, address, code_hash, source_hash)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def record_libraries(self, chain_id: int, address: str, code_hash: str, source_hash: str, contract_name: str, source_file: str, libraries: Dict[str, str]):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO verified_library_links VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (chain_id, address, code_hash, source_hash, contract_name, source_file, json.dumps(libraries), cfg.cloak_version, time.time()))
+
+    def entries(self, chain_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return all recorded checks (optionally only those on the given chain), most recent first."""
+        query = 'SELECT chain_id, address, code_hash, source_hash, contract_name, source_file, cloak_version, verified_at FROM verified_contracts'
+        with self._lock:
+            if chain_id is None:
+                rows = self._db.execute(f'{query} ORDER BY verified_at DESC').fetchall()
+            else:
+                rows = self._db.execute(f'{query} WHERE chain_id = ? ORDER BY verified_at DESC', (chain_id, )).fetchall()
+        keys = ['chain_id', 'address', 'code_hash', 'source_hash', 'contract_name', 'source_file', 'cloak_version', 'verified_at']
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
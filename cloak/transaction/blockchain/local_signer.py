@@ -0,0 +1,83 @@
+import threading
+from typing import Dict, List, Optional, Union
+
+from eth_account import Account
+from eth_account.signers.local import LocalAccount
+from eth_utils import keccak, to_checksum_address
+
+# Order of the secp256k1 group, valid private keys are in [1, n)
+_secp256k1_n = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+
+class LocalAccountPool:
+    """
+    Ethereum accounts whose private keys are held locally, such that their transactions can be signed in-process.
+
+    Transactions of pool accounts are sent as raw transactions, hence the node neither needs to manage these accounts
+    nor to sign on their behalf. The pool is filled from a key file (see cfg.blockchain_signing_keys), from
+    individual keys (add_key) or with any number of deterministically derived load-test accounts (derive_accounts).
+    """
+
+    def __init__(self):
+        self._accounts: Dict[str, LocalAccount] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_key_file(filename: str) -> 'LocalAccountPool':
+        """Return a pool holding the hex-encoded private keys in filename (one per line, empty lines and lines starting with # are ignored)."""
+        pool = LocalAccountPool()
+        with open(filename) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    pool.add_key(line)
+        return pool
+
+    @property
+    def addresses(self) -> List[str]:
+        """Checksum addresses of all pool accounts, in the order they were added."""
+        with self._lock:
+            return list(self._accounts)
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def __contains__(self, address: Union[bytes, str]) -> bool:
+        return to_checksum_address(address) in self._accounts
+
+    def add_key(self, private_key: Union[bytes, str]) -> str:
+        """Add the account with the given private key, return its address."""
+        account = Account.from_key(private_key)
+        with self._lock:
+            self._accounts[account.address] = account
+        return account.address
+
+    def derive_accounts(self, seed: Union[bytes, str], count: int, start: int = 0) -> List[str]:
+        """
+        Add count accounts whose private keys are derived from seed (e.g. a pool of load-test accounts), return their addresses.
+
+        The same seed and index always yield the same account, hence several clients can share a pool without exchanging keys.
+        Note that the accounts still need to be funded before they can issue transactions.
+        """
+        seed = seed.encode() if isinstance(seed, str) else seed
+        addresses = []
+        for idx in range(start, start + count):
+            key = keccak(seed + idx.to_bytes(32, 'big'))
+            while not 0 < int.from_bytes(key, 'big') < _secp256k1_n:
+                key = keccak(key)
+            addresses.append(self.add_key(key))
+        return addresses
+
+    def account(self, address: Union[bytes, str]) -> Optional[LocalAccount]:
+        return self._accounts.get(to_checksum_address(address))
+
+    def sign_transaction(self, tx: Dict) -> bytes:
+        """
+        Sign tx with the key of its sender (tx['from']) and return the raw transaction.
+
+        tx must be complete, i.e. specify nonce, gas, gasPrice and chainId.
+        """
+        account = self.account(tx['from'])
+        if account is None:
+            raise KeyError(f'No local key for account {tx["from"]}')
+        return account.sign_transaction({k: v for k, v in tx.items() if k != 'from'}).rawTransaction
@@ -0,0 +1,56 @@
+import time
+from typing import Callable, Optional, TypeVar, Any
+
+from hexbytes import HexBytes
+from web3 import Web3
+
+from cloak.transaction.interface import BlockChainError
+
+T = TypeVar('T')
+
+
+def poll_with_backoff(poll: Callable[[], Optional[T]], timeout: float, initial_delay: float = 0.01, max_delay: float = 1.0) -> T:
+    """
+    Call poll until it returns a value other than None and return that value.
+
+    The delay between two calls starts at initial_delay and doubles after every call (up to max_delay), such that
+    results which are available quickly are picked up quickly, without flooding the node while waiting for slow results.
+
+    :raise BlockChainError: if no value was returned within timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        val = poll()
+        if val is not None:
+            return val
+        if time.monotonic() > deadline:
+            raise BlockChainError(f'No result within {timeout} seconds')
+        time.sleep(delay)
+        delay = min(2 * delay, max_delay)
+
+
+class TeeResultWaiter:
+    """
+    Waits for the results of TEE transactions.
+
+    A TEE transaction which depends on inputs of several parties is only executed once all of them were provided.
+    If the cloak network reports such results (JSON-RPC method result_method, which returns null while the
+    transaction is still waiting), they are long-polled with exponential backoff and handed to the caller as soon as
+    they exist. Otherwise, the transaction is complete once its receipt is available.
+    """
+
+    result_method = 'cloak_getTransactionResult'
+
+    def __init__(self, w3: Web3, timeout: float = 120):
+        self.w3 = w3
+        self.timeout = timeout
+
+    def supported(self) -> bool:
+        supports = getattr(self.w3.provider, 'supports', None)
+        return supports is not None and supports(self.result_method)
+
+    def wait(self, tx_hash: Any) -> Any:
+        """Return the result of the TEE transaction with the given hash, as soon as the cloak network reports it."""
+        tx_hash = HexBytes(tx_hash).hex()
+        return poll_with_backoff(lambda: self.w3.manager.request_blocking(self.result_method, [tx_hash]), self.timeout)
@@ -1,31 +1,56 @@
 from __future__ import with_statement
-from cloak.tests.utils.test_timer import sleep
+import asyncio
+import hashlib
+import itertools
 import json
 import os
 import ccf
 import tempfile
+import threading
+import time
 from abc import abstractmethod
 from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple, List, Union
 
+import aiohttp
+import requests
+from eth.db.atomic import AtomicDB
+from eth.db.backends.memory import MemoryDB
 from eth_tester import PyEVMBackend, EthereumTester
-from web3 import Web3
+from eth_tester.exceptions import SnapshotNotFound
+from hexbytes import HexBytes
+from requests.adapters import HTTPAdapter
+from web3 import Web3, HTTPProvider
+from web3._utils.abi import get_abi_output_types, map_abi_data
+from web3._utils.method_formatters import PYTHONIC_RESULT_FORMATTERS
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from web3._utils.request import make_post_request
+from web3.datastructures import AttributeDict
+from web3.exceptions import TransactionNotFound
 
 from cloak import my_logging
 from cloak.compiler.privacy import library_contracts
-from cloak.compiler.solidity.compiler import compile_solidity_json
+from cloak.compiler.privacy.manifest import Manifest
+from cloak.compiler.solidity.compiler import compile_solidity_sources, hash_solidity_sources
 from cloak.config import cfg, zk_print, zk_print_banner
 from cloak.my_logging.log_context import log_context
 from cloak.transaction.interface import CloakBlockchainInterface, IntegrityError, BlockChainError, \
-    TransactionFailedException
+    TransactionFailedException, PendingTransaction
 from cloak.transaction.types import PublicKeyValue, AddressValue, MsgStruct, BlockStruct, TxStruct, Value
 from cloak.transaction.blockchain.ccf_provider import CloakCCFProvider
+from cloak.transaction.blockchain.ccf_transport import CCFHttpTransport
+from cloak.transaction.blockchain.deployment_registry import DeploymentRegistry
+from cloak.transaction.blockchain.head_subscription import NewHeadSubscription
+from cloak.transaction.blockchain.integrity_cache import IntegrityCache
+from cloak.transaction.blockchain.local_signer import LocalAccountPool
+from cloak.transaction.blockchain.tee_results import TeeResultWaiter
 from cloak.transaction.blockchain import ccf_config
 from cloak.utils.helpers import get_contract_names, save_to_file
-from cloak.cloak_ast.process_ast import get_verification_contract_names
 
 max_gas_limit = 10000000
+receipt_timeout = 120
+head_poll_interval = 1.0
 count = 0
 
 
@@ -35,16 +60,81 @@ class Web3Blockchain(CloakBlockchainInterface):
         self.w3 = self._create_w3_instance()
         if not self.w3.isConnected():
             raise BlockChainError(f'Failed to connect to blockchain: {self.w3.provider}')
+        self._chain_id: Optional[int] = None
+        self._deployment_registry: Optional[DeploymentRegistry] = None
+        self._integrity_cache: Optional[IntegrityCache] = None
+        self._nonces: Dict[str, int] = {}
+        """Next nonce of each sender, assigned locally such that a sender can have many transactions in flight"""
+        self._nonce_lock = threading.Lock()
+        self._gas_limit: Optional[Tuple[int, int]] = None
+        """(block number, gas limit) of the most recent block the gas limit was requested for"""
+        self._gas_estimates: Dict[Tuple, int] = {}
+        """Gas estimates by (contract address, function selector, call data size class)"""
+        self._cached_estimate_txs: Dict[str, Tuple] = {}
+        """Gas estimate cache key of each pending transaction whose gas amount was taken from the cache"""
+        self._special_values: Optional[Tuple[int, int, Dict, str, int]] = None
+        """(head number, head generation, pending block, coinbase, gas price) from which the special variables are populated"""
+        self._head_generation = 0
+        """Incremented whenever the head is known to have advanced, invalidates _special_values"""
+        self._head_subscription: Optional[NewHeadSubscription] = None
+        self._signer: Optional[LocalAccountPool] = None
+        self._gas_price: Optional[Tuple[int, int]] = None
+        """(block number, gas price) at the time the gas price for locally signed transactions was requested"""
+
+    @property
+    def chain_id(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chainId
+        return self._chain_id
+
+    @property
+    def deployment_registry(self) -> Optional[DeploymentRegistry]:
+        """Registry of deployed contracts (only kept in memory for debug backends, whose chain state does not survive the process)."""
+        if cfg.deployment_registry == 'off':
+            return None
+        if self._deployment_registry is None:
+            self._deployment_registry = DeploymentRegistry(':memory:' if self.is_debug_backend() else None)
+        return self._deployment_registry
+
+    @property
+    def integrity_cache(self) -> IntegrityCache:
+        """Record of successful integrity checks (only kept in memory for debug backends)."""
+        if self._integrity_cache is None:
+            self._integrity_cache = IntegrityCache(':memory:' if self.is_debug_backend() else None)
+        return self._integrity_cache
+
+    @property
+    def signer(self) -> LocalAccountPool:
+        """Accounts whose transactions are signed locally (initially the accounts in cfg.blockchain_signing_keys)."""
+        if self._signer is None:
+            self._signer = LocalAccountPool.from_key_file(cfg.blockchain_signing_keys) if cfg.blockchain_signing_keys else LocalAccountPool()
+        return self._signer
 
     @staticmethod
     def compile_contract(sol_filename: str, contract_name: str, libs: Optional[Dict] = None, cwd=None):
-        solp = Path(sol_filename)
-        jout = compile_solidity_json(sol_filename, libs, optimizer_runs=cfg.opt_solc_optimizer_runs, cwd=cwd)['contracts'][solp.name][contract_name]
-        return {
-            'abi': json.loads(jout['metadata'])['output']['abi'],
-            'bin': jout['evm']['bytecode']['object'],
-            'deployed_bin': jout['evm']['deployedBytecode']['object']
-        }
+        return Web3Blockchain.compile_contracts([(sol_filename, contract_name)], libs, cwd)[contract_name]
+
+    @staticmethod
+    def compile_contracts(contracts: List[Tuple[str, str]], libs: Optional[Dict] = None, cwd=None) -> Dict[str, Dict]:
+        """Compile all given (solidity file, contract name) pairs with a single solc invocation, return outputs by contract name."""
+        sol_filenames, contract_names = [], {}
+        for sol_filename, contract_name in contracts:
+            solp = Path(sol_filename)
+            if solp.name not in contract_names:
+                sol_filenames.append(sol_filename)
+                contract_names[solp.name] = []
+            contract_names[solp.name].append(contract_name)
+
+        jout = compile_solidity_sources(sol_filenames, contract_names, libs, optimizer_runs=cfg.opt_solc_optimizer_runs, cwd=cwd)['contracts']
+        couts = {}
+        for sol_filename, contract_name in contracts:
+            cout = jout[Path(sol_filename).name][contract_name]
+            couts[contract_name] = {
+                'abi': json.loads(cout['metadata'])['output']['abi'],
+                'bin': cout['evm']['bytecode']['object'],
+                'deployed_bin': cout['evm']['deployedBytecode']['object']
+            }
+        return couts
 
     def deploy_solidity_contract(self, sol_filename: str, contract_name: Optional[str], sender: Union[bytes, str]) -> str:
         contract_name = get_contract_names(sol_filename)[0] if contract_name is None else contract_name
@@ -52,11 +142,44 @@ class Web3Blockchain(CloakBlockchainInterface):
         return str(contract.address)
 
     def get_special_variables(self, sender: AddressValue, wei_amount: int = 0) -> Tuple[MsgStruct, BlockStruct, TxStruct]:
-        block = self.w3.eth.getBlock('pending')
+        block, coinbase, gas_price = self._special_block_values()
         zk_print(f'Current block timestamp: {block["timestamp"]}')
         return MsgStruct(sender, wei_amount), \
-               BlockStruct(AddressValue(self.w3.eth.coinbase), block['difficulty'], block['gasLimit'], block['number'], block['timestamp']),\
-               TxStruct(self.w3.eth.gasPrice, sender)
+               BlockStruct(AddressValue(coinbase), block['difficulty'], block['gasLimit'], block['number'], block['timestamp']),\
+               TxStruct(gas_price, sender)
+
+    def _special_block_values(self) -> Tuple[Dict, str, int]:
+        """
+        Return the pending block, coinbase and gas price, which are only requested again once the head advanced (see cfg.special_variables_cache).
+        """
+        mode = cfg.special_variables_cache
+        if mode == 'subscription' and (self._head_subscription is None or not self._head_subscription.active):
+            self._head_subscription = NewHeadSubscription(self.w3, self._invalidate_head, head_poll_interval)
+            self._invalidate_head()
+
+        cached = self._special_values
+        if cached is not None and cached[1] == self._head_generation:
+            # In head mode, checking the head is the only request per transaction (the callers take the block number
+            # from the returned values, there is no earlier head number to reuse), subscription mode needs none
+            if mode == 'subscription' or (mode == 'head' and cached[0] == self.w3.eth.blockNumber):
+                return cached[2:]
+
+        generation = self._head_generation
+        block, coinbase, gas_price = self._request_special_values()
+        self._special_values = (block['number'] - 1, generation, block, coinbase, gas_price)
+        return block, coinbase, gas_price
+
+    def _request_special_values(self) -> Tuple[Dict, str, int]:
+        if self._supports_batches():
+            # Single round trip
+            methods = ['eth_getBlockByNumber', 'eth_coinbase', 'eth_gasPrice']
+            results = self._batch_requests([(methods[0], ['pending', False]), (methods[1], []), (methods[2], [])])
+            block, coinbase, gas_price = [PYTHONIC_RESULT_FORMATTERS[m](r) for m, r in zip(methods, results)]
+            return AttributeDict.recursive(block), coinbase, gas_price
+        return self.w3.eth.getBlock('pending'), self.w3.eth.coinbase, self.w3.eth.gasPrice
+
+    def _invalidate_head(self):
+        self._head_generation += 1
 
     @abstractmethod
     def _create_w3_instance(self) -> Web3:
@@ -66,6 +189,8 @@ class Web3Blockchain(CloakBlockchainInterface):
         if cfg.blockchain_default_account is None:
             return None
         elif isinstance(cfg.blockchain_default_account, int):
+            if cfg.blockchain_signing_keys:
+                return self.signer.addresses[cfg.blockchain_default_account]
             return self.w3.eth.accounts[cfg.blockchain_default_account]
         else:
             return cfg.blockchain_default_account
@@ -76,6 +201,12 @@ class Web3Blockchain(CloakBlockchainInterface):
     def _req_public_key(self, address: Union[bytes, str]) -> PublicKeyValue:
         return PublicKeyValue(self._req_state_var(self.pki_contract, 'getPk', address))
 
+    def _req_public_keys(self, addresses: List[Union[bytes, str]]) -> List[PublicKeyValue]:
+        return [PublicKeyValue(pk) for pk in self._req_state_vars(self.pki_contract, [('getPk', (address, )) for address in addresses])]
+
+    def _get_block_number(self) -> int:
+        return self.w3.eth.blockNumber
+
     def _announce_public_key(self, address: Union[bytes, str], pk: Tuple[int, ...]) -> Any:
         with log_context('transaction', f'announcePk'):
             return self._transact(self.pki_contract, address, 'announcePk', pk)
@@ -93,37 +224,179 @@ class Web3Blockchain(CloakBlockchainInterface):
         except Exception as e:
             raise BlockChainError(e.args)
 
+    def _req_state_vars(self, contract_handle, requests: List[Tuple[str, Tuple]]) -> List[Any]:
+        try:
+            fcts = [contract_handle.functions[name](*indices) for name, indices in requests]
+            txs = [{'to': fct.address, 'data': fct._encode_transaction_data()} for fct in fcts]
+            if self._supports_batches() and len(txs) > 1:
+                return_data = self._batch_eth_call(txs)
+            else:
+                return_data = [self.w3.eth.call(tx) for tx in txs]
+            return [self._decode_call_output(fct, data) for fct, data in zip(fcts, return_data)]
+        except BlockChainError:
+            raise
+        except Exception as e:
+            raise BlockChainError(e.args)
+
+    def _batch_eth_call(self, txs: List[Dict]) -> List[bytes]:
+        """Issue all eth_calls in a single JSON-RPC batch request and return the raw return data of each call."""
+        return [HexBytes(result) for result in self._batch_request('eth_call', [[tx, 'latest'] for tx in txs])]
+
+    def _batch_request(self, method: str, params: List[List]) -> List[Any]:
+        """Issue one call of method per params entry in a single JSON-RPC batch request and return the raw results."""
+        return self._batch_requests([(method, p) for p in params])
+
+    def _supports_batches(self) -> bool:
+        """Whether several requests can be sent at once (as JSON-RPC batch, or concurrently by the cloak network provider)."""
+        return isinstance(self.w3.provider, HTTPProvider) or hasattr(self.w3.provider, 'make_requests')
+
+    def _batch_requests(self, requests: List[Tuple[str, List]]) -> List[Any]:
+        """Issue all (method, params) calls at once (a single JSON-RPC batch request over http) and return the raw results."""
+        provider = self.w3.provider
+        if isinstance(provider, HTTPProvider):
+            batch = [{'jsonrpc': '2.0', 'id': idx, 'method': method, 'params': p} for idx, (method, p) in enumerate(requests)]
+            raw_response = make_post_request(provider.endpoint_uri, json.dumps(batch).encode('utf-8'), **provider.get_request_kwargs())
+            responses = {r['id']: r for r in json.loads(raw_response)}
+        else:
+            responses = dict(enumerate(provider.make_requests(requests)))
+        if len(responses) != len(requests):
+            raise BlockChainError('Incomplete response to batch request')
+        results = []
+        for idx in range(len(requests)):
+            if 'error' in responses[idx]:
+                raise BlockChainError(responses[idx]['error'])
+            results.append(responses[idx]['result'])
+        return results
+
+    def _decode_call_output(self, fct, return_data: bytes) -> Any:
+        output_types = get_abi_output_types(fct.abi)
+        output_data = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, self.w3.codec.decode_abi(output_types, return_data))
+        return output_data[0] if len(output_data) == 1 else output_data
+
     def _call(self, contract_handle, sender: Union[bytes, str], name: str, *args) -> Union[bool, int, str]:
         try:
-            fct = contract_handle.functions[name]
-            gas_amount = self._gas_heuristic(sender, fct(*args))
-            tx = {'from': sender, 'gas': gas_amount}
-            return fct(*args).call(tx)
+            fct = contract_handle.functions[name](*args)
+            tx = {'from': sender, 'to': fct.address, 'data': fct._encode_transaction_data()}
+            tx['gas'] = self._gas_heuristic(sender, tx)
+            return self._decode_call_output(fct, self.w3.eth.call(tx))
         except Exception as e:
             raise BlockChainError(e.args)
 
     def _transact(self, contract_handle, sender: Union[bytes, str], function: str, *actual_params, wei_amount: Optional[int] = None) -> Any:
+        pending = self._submit(contract_handle, sender, function, *actual_params, wei_amount=wei_amount)
+        tx_receipt = self._wait_for_receipts([pending.tx_hash])[0]
+        if not self._transaction_succeeded(tx_receipt):
+            raise TransactionFailedException("Transaction failed")
+        return tx_receipt
+
+    def _submit(self, contract_handle, sender: Union[bytes, str], function: str, *actual_params, wei_amount: Optional[int] = None) -> PendingTransaction:
         try:
-            fct = contract_handle.constructor if function == 'constructor' else contract_handle.functions[function]
-            gas_amount = self._gas_heuristic(sender, fct(*actual_params))
-            tx = {'from': sender, 'gas': gas_amount}
+            # Encode the call data only once, it is used for both gas estimation and the transaction itself
+            if function == 'constructor':
+                tx = {'from': sender, 'data': contract_handle.constructor(*actual_params).data_in_transaction}
+            else:
+                fct = contract_handle.functions[function](*actual_params)
+                tx = {'from': sender, 'to': fct.address, 'data': fct._encode_transaction_data()}
             if wei_amount:
                 tx['value'] = wei_amount
-            tx_hash = fct(*actual_params).transact(tx)
-            tx_receipt = self.w3.eth.waitForTransactionReceipt(tx_hash)
+            key = self.__gas_estimate_key(tx)
+            estimate_cached = key is not None and key in self._gas_estimates
+            tx['gas'] = self._gas_heuristic(sender, tx)
+            if cfg.pipelined_transactions or sender in self.signer:
+                # Several transactions of a sender may be in flight and raw transactions must specify their nonce,
+                # hence it is assigned locally. Otherwise the node assigns it (other clients may use the same account).
+                tx['nonce'] = self._next_nonce(sender)
+            if sender in self.signer:
+                # Sign in-process, the node does not need to know the account
+                tx['chainId'] = self.chain_id
+                tx['gasPrice'] = self._signing_gas_price()
+                tx_hash = self.w3.eth.sendRawTransaction(self.signer.sign_transaction(tx))
+            else:
+                tx_hash = self.w3.eth.sendTransaction(tx)
         except Exception as e:
+            # The nonce may or may not have been used up and the gas limit/price may have changed, resynchronize with the node
+            self._reset_nonce(sender)
+            self._gas_limit = None
+            self._gas_price = None
             raise BlockChainError(e.args)
+        if estimate_cached:
+            self._cached_estimate_txs[HexBytes(tx_hash).hex()] = key
+        return PendingTransaction(self, tx_hash, function)
+
+    def _next_nonce(self, sender: Union[bytes, str]) -> int:
+        key = self.w3.toChecksumAddress(sender)
+        with self._nonce_lock:
+            nonce = self._nonces.get(key)
+            if nonce is None:
+                nonce = self.w3.eth.getTransactionCount(key, 'pending')
+            self._nonces[key] = nonce + 1
+            return nonce
+
+    def _reset_nonce(self, sender: Union[bytes, str]):
+        with self._nonce_lock:
+            self._nonces.pop(self.w3.toChecksumAddress(sender), None)
+
+    def _wait_for_receipts(self, tx_hashes: List[Any]) -> List[Any]:
+        receipts: List[Any] = [None] * len(tx_hashes)
+        pending = list(range(len(tx_hashes)))
+        deadline = time.monotonic() + receipt_timeout
+        poll_latency = 0.01
+        while True:
+            try:
+                for idx, receipt in zip(pending, self._get_receipts([tx_hashes[idx] for idx in pending])):
+                    receipts[idx] = receipt
+            except BlockChainError:
+                raise
+            except Exception as e:
+                raise BlockChainError(e.args)
+            pending = [idx for idx in pending if receipts[idx] is None]
+            if not pending:
+                break
+            if time.monotonic() > deadline:
+                raise BlockChainError(f'{len(pending)} transaction(s) were not included within {receipt_timeout} seconds')
+            time.sleep(poll_latency)
+            poll_latency = min(2 * poll_latency, 1.0)
+
+        self._process_receipts(tx_hashes, receipts)
+        return receipts
+
+    def _process_receipts(self, tx_hashes: List[Any], receipts: List[Any]):
+        for tx_hash, receipt in zip(tx_hashes, receipts):
+            self._observe_block(receipt['blockNumber'])
+            key = self._cached_estimate_txs.pop(HexBytes(tx_hash).hex(), None)
+            if key is not None and not self._transaction_succeeded(receipt):
+                # The cached estimate may not fit these arguments (e.g. a different branch was taken), estimate again next time
+                self._gas_estimates.pop(key, None)
+            gas = receipt['gasUsed']
+            zk_print(f"Consumed gas: {gas}")
+            my_logging.data('gas', gas)
+
+    def _get_receipts(self, tx_hashes: List[Any]) -> List[Optional[Any]]:
+        """Return the receipts of the given transactions (None for transactions which were not included yet)."""
+        if self._supports_batches() and len(tx_hashes) > 1:
+            results = self._batch_request('eth_getTransactionReceipt', [[HexBytes(h).hex()] for h in tx_hashes])
+            return [self._format_receipt(r) for r in results]
+
+        receipts = []
+        for tx_hash in tx_hashes:
+            try:
+                receipts.append(self.w3.eth.getTransactionReceipt(tx_hash))
+            except TransactionNotFound:
+                receipts.append(None)
+        return receipts
 
-        if tx_receipt['status'] == 0:
-            raise TransactionFailedException("Transaction failed")
-        gas = tx_receipt['gasUsed']
-        zk_print(f"Consumed gas: {gas}")
-        my_logging.data('gas', gas)
-        return tx_receipt
+    @staticmethod
+    def _format_receipt(raw_receipt: Optional[Dict]) -> Optional[AttributeDict]:
+        """Convert a raw JSON-RPC receipt into the format returned by web3 (None stays None)."""
+        if raw_receipt is None:
+            return None
+        return AttributeDict.recursive(PYTHONIC_RESULT_FORMATTERS['eth_getTransactionReceipt'](raw_receipt))
+
+    def _transaction_succeeded(self, receipt: Any) -> bool:
+        return receipt['status'] != 0
 
     def _deploy(self, project_dir: str, sender: Union[bytes, str], contract: str, *actual_args, wei_amount: Optional[int] = None) -> Any:
-        with open(os.path.join(project_dir, 'contract.cloak')) as f:
-            verifier_names = get_verification_contract_names(f.read())
+        verifier_names = Manifest.get_verifier_names(project_dir)
 
         # Deploy verification contracts if not already done
         external_contract_addresses =  self._deploy_dependencies(sender, project_dir, verifier_names)
@@ -151,15 +424,38 @@ class Web3Blockchain(CloakBlockchainInterface):
     def _deploy_dependencies(self, sender: Union[bytes, str], project_dir: str, verifier_names: List[str]) -> Dict[str, AddressValue]:
         # Deploy verification contracts if not already done
         vf = {}
+        couts = self.compile_contracts([(os.path.join(project_dir, f'{verifier_name}.sol'), verifier_name) for verifier_name in verifier_names],
+                                       self.lib_addresses) if verifier_names else {}
         for verifier_name in verifier_names:
             with log_context('transaction', f'deploy_{verifier_name}'):
-                filename = os.path.join(project_dir, f'{verifier_name}.sol')
-                cout = self.compile_contract(filename, verifier_name, self.lib_addresses)
-                vf[verifier_name] = AddressValue(self._deploy_contract(sender, cout).address)
+                vf[verifier_name] = AddressValue(self._deploy_or_link_contract(sender, verifier_name, couts[verifier_name]))
         vf[cfg.pki_contract_name] = AddressValue(self.pki_contract.address)
         vf[cfg.service_contract_name] = AddressValue(self.service_contract.address)
         return vf
 
+    def _deploy_or_link_contract(self, sender: Union[bytes, str], contract_name: str, contract_interface) -> str:
+        """
+        Deploy a contract without constructor arguments, unless the deployment registry knows an existing deployment of the same code.
+
+        :return: address of the (new or existing) deployment
+        """
+        registry = self.deployment_registry
+        if registry is None:
+            return self._deploy_contract(sender, contract_interface).address
+
+        expected_code = self.__normalized_hex(contract_interface['deployed_bin'])
+        code_hash = hashlib.sha256(expected_code.encode()).hexdigest()
+        address = registry.lookup(self.chain_id, code_hash)
+        if address is not None:
+            if cfg.deployment_registry == 'trust' or self.__normalized_hex(self.w3.eth.getCode(address)) == expected_code:
+                zk_print(f'Using existing deployment of "{contract_name}" at address "{address}"')
+                return address
+            registry.forget(self.chain_id, code_hash)
+
+        address = self._deploy_contract(sender, contract_interface).address
+        registry.register(self.chain_id, code_hash, address, contract_name)
+        return address
+
     def _connect_libraries(self):
         if not cfg.blockchain_pki_address:
             raise BlockChainError('Must specify pki address in config.')
@@ -203,6 +499,15 @@ class Web3Blockchain(CloakBlockchainInterface):
         if not actual_byte_code:
             raise IntegrityError(f'Expected contract {contract_name} is not deployed at address {address}')
 
+        # Skip the check if it already succeeded for the same deployed code and local sources
+        code_hash = hashlib.sha256(actual_byte_code.encode()).hexdigest()
+        source_hash = self.__integrity_source_hash(sol_filename, contract_name, libraries, is_library, cwd)
+        if not cfg.reverify:
+            abi = self.integrity_cache.lookup(self.chain_id, address, code_hash, source_hash)
+            if abi is not None:
+                zk_print(f'Contract@{address} matches {sol_filename[sol_filename.rfind("/") + 1:]}:{contract_name} (verified before)')
+                return self.w3.eth.contract(address=address, abi=abi)
+
         cout = self.compile_contract(sol_filename, contract_name, libs=libraries, cwd=cwd)
         expected_byte_code = self.__normalized_hex(cout['deployed_bin'])
 
@@ -213,16 +518,49 @@ class Web3Blockchain(CloakBlockchainInterface):
         if actual_byte_code != expected_byte_code:
             raise IntegrityError(f'Deployed contract at address {address} does not match local contract {sol_filename}')
         zk_print(f'Contract@{address} matches {sol_filename[sol_filename.rfind("/") + 1:]}:{contract_name}')
+        self.integrity_cache.record(self.chain_id, address, code_hash, source_hash, contract_name, os.path.abspath(sol_filename), cout['abi'])
 
         return self.w3.eth.contract(
             address=address, abi=cout['abi']
         )
 
+    @staticmethod
+    def __integrity_source_hash(sol_filename: str, contract_name: str, libraries: Optional[Dict], is_library: bool, cwd) -> str:
+        """Hash of everything the expected bytecode of contract_name is derived from (sources including imports and compiler settings)."""
+        base_path = os.path.dirname(os.path.abspath(sol_filename)) if cwd is None else os.path.abspath(cwd)
+        return hashlib.sha256(json.dumps({
+            'sources': sorted(str(h) for h in hash_solidity_sources([sol_filename], base_path).values()),
+            'contract': contract_name, 'libraries': libraries, 'is_library': is_library,
+            'solc': cfg.solc_version, 'optimizer_runs': cfg.opt_solc_optimizer_runs
+        }, sort_keys=True).encode()).hexdigest()
+
     def _verify_library_integrity(self, libraries: List[Tuple[str, str]], contract_with_libs_addr: str, sol_with_libs_filename: str) -> Dict[str, str]:
         cname = get_contract_names(sol_with_libs_filename)[0]
         actual_code = self.__normalized_hex(self.w3.eth.getCode(contract_with_libs_addr))
         if not actual_code:
             raise IntegrityError(f'Expected contract {cname} is not deployed at address {contract_with_libs_addr}')
+
+        # The library addresses only need to be extracted from the deployed code again if the code or the local sources changed
+        code_hash = hashlib.sha256(actual_code.encode()).hexdigest()
+        source_hash = hashlib.sha256(json.dumps({
+            'contract': self.__integrity_source_hash(sol_with_libs_filename, cname, None, False, None), 'libraries': libraries
+        }, sort_keys=True).encode()).hexdigest()
+        addresses = None if cfg.reverify else self.integrity_cache.lookup_libraries(self.chain_id, contract_with_libs_addr, code_hash, source_hash)
+        cached = addresses is not None
+        if not cached:
+            addresses = self.__extract_library_addresses(libraries, actual_code, sol_with_libs_filename, cname)
+
+        lib_sols = dict(libraries)
+        for lib_name, lib_address in addresses.items():
+            with cfg.library_compilation_environment():
+                self._verify_contract_integrity(lib_address, lib_sols[lib_name], contract_name=lib_name, is_library=True)
+        if not cached:
+            self.integrity_cache.record_libraries(self.chain_id, contract_with_libs_addr, code_hash, source_hash, cname,
+                                                  os.path.abspath(sol_with_libs_filename), addresses)
+        return addresses
+
+    def __extract_library_addresses(self, libraries: List[Tuple[str, str]], actual_code: str, sol_with_libs_filename: str, cname: str) -> Dict[str, str]:
+        """Compile sol_with_libs_filename and return the addresses of the libraries which actual_code is linked against."""
         code_with_placeholders = self.__normalized_hex(self.compile_contract(sol_with_libs_filename, cname)['deployed_bin'])
 
         if len(actual_code) != len(code_with_placeholders):
@@ -235,13 +573,10 @@ class Web3Blockchain(CloakBlockchainInterface):
             hash = self.w3.solidityKeccak(['string'], [f'{lib_sol[lib_sol.rfind("/") + 1:]}:{lib_name}'])
             placeholder = f'__${self.__normalized_hex(hash)[:34]}$__'
 
-            # Retrieve concrete address in deployed code at placeholder offset in local code and verify library contract integrity
+            # Retrieve concrete address in deployed code at placeholder offset in local code
             lib_address_offset = code_with_placeholders.find(placeholder)
             if lib_address_offset != -1:
-                lib_address = self.w3.toChecksumAddress(actual_code[lib_address_offset:lib_address_offset+40])
-                with cfg.library_compilation_environment():
-                    self._verify_contract_integrity(lib_address, lib_sol, contract_name=lib_name, is_library=True)
-                addresses[lib_name] = lib_address
+                addresses[lib_name] = self.w3.toChecksumAddress(actual_code[lib_address_offset:lib_address_offset+40])
         return addresses
 
     def _verify_zkay_contract_integrity(self, address: str, project_dir: str, pki_verifier_addresses: Dict):
@@ -270,27 +605,71 @@ class Web3Blockchain(CloakBlockchainInterface):
         val = val[2:] if val.startswith('0x') else val
         return val.lower()
 
-    def _gas_heuristic(self, sender, tx) -> int:
-        limit = self.w3.eth.getBlock('latest')['gasLimit']
-        estimate = tx.estimateGas({'from': sender, 'gas': limit})
+    def _gas_heuristic(self, sender, tx: Dict) -> int:
+        limit = self._block_gas_limit()
+        key = self.__gas_estimate_key(tx)
+        estimate = self._gas_estimates.get(key) if key is not None else None
+        if estimate is None:
+            estimate = self.w3.eth.estimateGas({**tx, 'gas': limit})
+            if key is not None:
+                self._gas_estimates[key] = estimate
         return min(int(estimate * 1.2), limit)
 
+    def _block_gas_limit(self) -> int:
+        """Return the gas limit of the latest block, it is only requested again once a newer block was observed."""
+        if self._gas_limit is None:
+            block = self.w3.eth.getBlock('latest')
+            self._gas_limit = (block['number'], block['gasLimit'])
+        return self._gas_limit[1]
+
+    def _signing_gas_price(self) -> int:
+        """Return the gas price for locally signed transactions, it is only requested again once a newer block was observed."""
+        if self._gas_price is None:
+            self._gas_price = (self.w3.eth.blockNumber, self.w3.eth.gasPrice)
+        return self._gas_price[1]
+
+    def _observe_block(self, block_number: int):
+        if self._gas_limit is not None and block_number > self._gas_limit[0]:
+            self._gas_limit = None
+        if self._gas_price is not None and block_number > self._gas_price[0]:
+            self._gas_price = None
+        if self._special_values is not None and block_number > self._special_values[0]:
+            self._invalidate_head()
+
+    def _forget_chain_state(self):
+        """Drop all locally cached chain state (e.g. after the chain was reverted to a snapshot)."""
+        with self._nonce_lock:
+            self._nonces.clear()
+        self._gas_limit = None
+        self._gas_price = None
+        self._gas_estimates.clear()
+        self._cached_estimate_txs.clear()
+        self._special_values = None
+        self._invalidate_head()
+
+    @staticmethod
+    def __gas_estimate_key(tx: Dict) -> Optional[Tuple]:
+        """
+        Gas estimate cache key of tx: sender, contract address, function selector and size class (power of two) of the call data.
+
+        The sender is part of the key since the execution path (and thus the gas usage) may depend on msg.sender.
+        Deployments are never cached.
+        """
+        if not cfg.gas_estimate_cache or 'to' not in tx:
+            return None
+        data = tx['data']
+        return Web3.toChecksumAddress(tx['from']), tx['to'], data[:10], (len(data) // 2).bit_length(), 'value' in tx
+
 
 class Web3CloakCCFNetwork(Web3Blockchain):
     def __init__(self) -> None:
         super().__init__()
-        
+        self.tee_results = TeeResultWaiter(self.w3, receipt_timeout)
 
     def _create_w3_instance(self) -> Web3:
-        # config = ccf.clients.CCFClient(
-        #     ccf_config.host, 
-        #     ccf_config.port, 
-        #     ccf_config.ca, 
-        #     ccf_config.cert, 
-        #     ccf_config.key
-        # )
-        # w3 = Web3(CloakCCFProvider(config))
-        # return w3
+        if cfg.ccf_transport == 'pooled':
+            transport = CCFHttpTransport(ccf_config.host, ccf_config.port, ccf_config.ca, ccf_config.cert, ccf_config.key)
+            return Web3(CloakCCFProvider(transport))
 
         # TODO: renqian - replace with CCF
         genesis_overrides = {'gas_limit': int(max_gas_limit * 1.2)}
@@ -309,7 +688,6 @@ class Web3CloakCCFNetwork(Web3Blockchain):
 
     def _transact(self, contract_handle, sender: Union[bytes, str], function: str, *actual_params, wei_amount: Optional[int] = None) -> Any:
         if function == "compareToAverage":
-            sleep(2)
             global count
             if (count == 0):
                 zk_print("Waiting for manager to summit avgScore, examinator to submit point[msg.sender]...")
@@ -331,6 +709,11 @@ class Web3CloakCCFNetwork(Web3Blockchain):
 
         if tx_receipt['status'] == 0:
             raise TransactionFailedException("Transaction failed")
+        if self.tee_results.supported():
+            # The TEE executes the transaction once all involved parties provided their inputs
+            result = self.tee_results.wait(tx_hash)
+            zk_print(f"Get public return of {function}: {result}")
+            return result
         if function == "compareToAverage" and count == 2:
             zk_print(f"Get public return of {function}: {0}")
         return tx_receipt
@@ -345,6 +728,12 @@ class Web3CloakCCFNetwork(Web3Blockchain):
 
 
 class Web3TesterBlockchain(Web3Blockchain):
+    _bootstrap_states: Dict[str, Tuple[Dict[bytes, bytes], Dict, Dict, Dict]] = {}
+    """
+    Chain database right after deploying the library contracts to a fresh chain, together with the pki contract, service contract
+    and crypto library addresses, by library configuration. New chains start from this state instead of deploying the libraries again.
+    """
+
     def __init__(self) -> None:
         self.eth_tester = None
         super().__init__()
@@ -355,28 +744,65 @@ class Web3TesterBlockchain(Web3Blockchain):
         return True
 
     def _connect_libraries(self):
-        zk_print_banner(f'Deploying Libraries')
-
-        sender = self.w3.eth.accounts[0]
-        # Since eth-tester is not persistent, always automatically deploy libraries
         with cfg.library_compilation_environment():
+            sources = {
+                cfg.pki_contract_name: library_contracts.get_pki_contract(),
+                cfg.service_contract_name: library_contracts.get_service_contract(),
+                'verify_libs': library_contracts.get_verify_libs_code()
+            }
+            h = hashlib.sha256(cfg.library_solc_version.encode())
+            for name, code in sources.items():
+                h.update(f'{name}:{code}'.encode())
+            h.update(','.join(cfg.external_crypto_lib_names).encode())
+            state_key = h.hexdigest()
+
+            at_genesis = self.w3.eth.blockNumber == 0
+            if at_genesis and state_key in Web3TesterBlockchain._bootstrap_states:
+                self.__restore_bootstrap_state(*Web3TesterBlockchain._bootstrap_states[state_key])
+                return
+
+            zk_print_banner(f'Deploying Libraries')
+
+            sender = self.w3.eth.accounts[0]
+            # Since eth-tester is not persistent, always automatically deploy libraries
             with tempfile.TemporaryDirectory() as tmpdir:
+                pki_sol = save_to_file(tmpdir, f'{cfg.pki_contract_name}.sol', sources[cfg.pki_contract_name])
+                service_sol = save_to_file(tmpdir, f'{cfg.service_contract_name}.sol', sources[cfg.service_contract_name])
+                verify_sol = save_to_file(tmpdir, 'verify_libs.sol', sources['verify_libs'])
+                couts = self.compile_contracts([(pki_sol, cfg.pki_contract_name), (service_sol, cfg.service_contract_name)]
+                                               + [(verify_sol, lib) for lib in cfg.external_crypto_lib_names])
+
                 with log_context('transaction', 'deploy_pki'):
-                    pki_sol = save_to_file(tmpdir, f'{cfg.pki_contract_name}.sol', library_contracts.get_pki_contract())
-                    self._pki_contract = self._deploy_contract(sender, self.compile_contract(pki_sol, cfg.pki_contract_name))
+                    self._pki_contract = self._deploy_contract(sender, couts[cfg.pki_contract_name])
                     zk_print(f'Deployed pki contract at address "{self.pki_contract.address}"')
-                    service_sol = save_to_file(tmpdir, f'{cfg.service_contract_name}.sol', library_contracts.get_service_contract())
-                    self._service_contract = self._deploy_contract(sender, self.compile_contract(service_sol, cfg.service_contract_name))
+                    self._service_contract = self._deploy_contract(sender, couts[cfg.service_contract_name])
                     zk_print(f'Deployed sevice contract at address "{self.service_contract.address}"')
                 
                 with log_context('transaction', 'deploy_verify_libs'):
-                    verify_sol = save_to_file(tmpdir, 'verify_libs.sol', library_contracts.get_verify_libs_code())
                     self._lib_addresses = {}
                     for lib in cfg.external_crypto_lib_names:
-                        out = self._deploy_contract(sender, self.compile_contract(verify_sol, lib))
+                        out = self._deploy_contract(sender, couts[lib])
                         self._lib_addresses[lib] = out.address
                         zk_print(f'Deployed crypto lib {lib} at address "{out.address}"')
 
+            if at_genesis:
+                db = self.eth_tester.backend.chain.chaindb.db.wrapped_db
+                Web3TesterBlockchain._bootstrap_states[state_key] = (
+                    dict(db.kv_store),
+                    {'address': self._pki_contract.address, 'abi': self._pki_contract.abi},
+                    {'address': self._service_contract.address, 'abi': self._service_contract.abi},
+                    dict(self._lib_addresses)
+                )
+
+    def __restore_bootstrap_state(self, db: Dict[bytes, bytes], pki: Dict, service: Dict, lib_addresses: Dict):
+        backend = self.eth_tester.backend
+        backend.chain = type(backend.chain)(AtomicDB(MemoryDB(dict(db))))
+        self._forget_chain_state()
+        self._pki_contract = self.w3.eth.contract(address=pki['address'], abi=pki['abi'])
+        self._service_contract = self.w3.eth.contract(address=service['address'], abi=service['abi'])
+        self._lib_addresses = dict(lib_addresses)
+        zk_print(f'Started from pre-deployed libraries (pki contract at address "{pki["address"]}")')
+
     def _create_w3_instance(self) -> Web3:
         genesis_overrides = {'gas_limit': int(max_gas_limit * 1.2)}
         custom_genesis_params = PyEVMBackend._generate_genesis_params(overrides=genesis_overrides)
@@ -392,9 +818,21 @@ class Web3TesterBlockchain(Web3Blockchain):
         self.next_acc_idx += count
         return dummy_accounts
 
-    def _gas_heuristic(self, sender, tx) -> int:
+    def _gas_heuristic(self, sender, tx: Dict) -> int:
         return max_gas_limit
 
+    def _snapshot(self) -> Tuple[int, int]:
+        return self.eth_tester.take_snapshot(), self.next_acc_idx
+
+    def _revert(self, snapshot: Tuple[int, int]):
+        snapshot_id, next_acc_idx = snapshot
+        try:
+            self.eth_tester.revert_to_snapshot(snapshot_id)
+        except SnapshotNotFound as e:
+            raise BlockChainError(f'Cannot revert chain: {e}') from e
+        self.next_acc_idx = next_acc_idx
+        self._forget_chain_state()
+
 
 class Web3IpcBlockchain(Web3Blockchain):
     def _create_w3_instance(self) -> Web3:
@@ -411,7 +849,109 @@ class Web3WebsocketBlockchain(Web3Blockchain):
 class Web3HttpBlockchain(Web3Blockchain):
     def _create_w3_instance(self) -> Web3:
         assert cfg.blockchain_node_uri is None or isinstance(cfg.blockchain_node_uri, str)
-        return Web3(Web3.HTTPProvider(cfg.blockchain_node_uri))
+        return Web3(self._pooled_http_provider(cfg.blockchain_node_uri))
+
+    @staticmethod
+    def _pooled_http_provider(uri: Optional[str]) -> HTTPProvider:
+        """
+        Return a http provider whose requests share a pool of cfg.blockchain_http_pool_size (keep-alive) connections.
+
+        When all connections are in use, requests wait for a free connection instead of opening a new one.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=cfg.blockchain_http_pool_size, pool_block=True)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not cfg.blockchain_http_keepalive:
+            session.headers['Connection'] = 'close'
+        return HTTPProvider(uri, request_kwargs={'timeout': cfg.blockchain_http_timeout}, session=session)
+
+
+class Web3AsyncHttpBlockchain(Web3HttpBlockchain):
+    """
+    w3-http backend whose read APIs can also be awaited, such that many requests to the node can be in flight at once.
+
+    The awaitable requests share a pool of cfg.blockchain_http_pool_size keep-alive connections (one pool per event loop).
+    All synchronous APIs behave like in :py:class:`Web3HttpBlockchain`.
+    The simulator awaits these reads in StateDict.prefetch_async and ApiWrapper.call_async.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._async_session: Optional[aiohttp.ClientSession] = None
+        self._async_session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._request_ids = itertools.count()
+
+    async def req_state_var_async(self, contract_handle, name: str, *indices) -> Union[bool, int, str, bytes]:
+        """Awaitable variant of :py:meth:`req_state_var`."""
+        assert contract_handle is not None
+        fct = contract_handle.functions[name](*Value.unwrap_values(list(indices)))
+        return_data = await self._request_async('eth_call', [{'to': fct.address, 'data': fct._encode_transaction_data()}, 'latest'])
+        return self._decode_call_output(fct, HexBytes(return_data))
+
+    async def req_state_vars_async(self, contract_handle, requests: List[Tuple[str, Tuple]]) -> List[Union[bool, int, str, bytes]]:
+        """Request several state variable values concurrently (see :py:meth:`req_state_var_async`)."""
+        return list(await asyncio.gather(*[self.req_state_var_async(contract_handle, name, *indices) for name, indices in requests]))
+
+    async def call_async(self, contract_handle, sender: AddressValue, name: str, *args) -> Union[bool, int, str, bytes, List]:
+        """Awaitable variant of :py:meth:`call` (uses the default gas limit of the node)."""
+        assert contract_handle is not None
+        fct = contract_handle.functions[name](*Value.unwrap_values(list(args)))
+        tx = {'from': self.w3.toChecksumAddress(sender.val), 'to': fct.address, 'data': fct._encode_transaction_data()}
+        return self._decode_call_output(fct, HexBytes(await self._request_async('eth_call', [tx, 'latest'])))
+
+    async def get_receipt_async(self, tx_hash: Any) -> Optional[AttributeDict]:
+        """Return the receipt of the given transaction, or None if it was not included yet."""
+        return self._format_receipt(await self._request_async('eth_getTransactionReceipt', [HexBytes(tx_hash).hex()]))
+
+    async def wait_for_transactions_async(self, pending: List[PendingTransaction]) -> List[Any]:
+        """Awaitable variant of :py:meth:`wait_for_transactions`, the receipts of all transactions are polled concurrently."""
+        waiting = [p for p in pending if not p.done()]
+        deadline = time.monotonic() + receipt_timeout
+        poll_latency = 0.01
+        remaining = waiting
+        while remaining:
+            receipts = await asyncio.gather(*[self.get_receipt_async(p.tx_hash) for p in remaining])
+            for p, receipt in zip(remaining, receipts):
+                p.receipt = receipt
+            remaining = [p for p in remaining if not p.done()]
+            if remaining:
+                if time.monotonic() > deadline:
+                    raise BlockChainError(f'{len(remaining)} transaction(s) were not included within {receipt_timeout} seconds')
+                await asyncio.sleep(poll_latency)
+                poll_latency = min(2 * poll_latency, 1.0)
+        self._process_receipts([p.tx_hash for p in waiting], [p.receipt for p in waiting])
+
+        failed = [p.function for p in pending if not self._transaction_succeeded(p.receipt)]
+        if failed:
+            raise TransactionFailedException(f'Transaction failed ({", ".join(failed)})')
+        return [p.receipt for p in pending]
+
+    async def close_async(self):
+        """Close the pooled connections of the current event loop."""
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+    def _session_for_running_loop(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_session.closed or self._async_session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=cfg.blockchain_http_pool_size, force_close=not cfg.blockchain_http_keepalive)
+            self._async_session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=cfg.blockchain_http_timeout))
+            self._async_session_loop = loop
+        return self._async_session
+
+    async def _request_async(self, method: str, params: List) -> Any:
+        payload = {'jsonrpc': '2.0', 'id': next(self._request_ids), 'method': method, 'params': params}
+        try:
+            async with self._session_for_running_loop().post(self.w3.provider.endpoint_uri, json=payload) as response:
+                response.raise_for_status()
+                result = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise BlockChainError(e.args)
+        if 'error' in result:
+            raise BlockChainError(result['error'])
+        return result['result']
 
 
 class Web3HttpGanacheBlockchain(Web3HttpBlockchain):
@@ -431,8 +971,19 @@ class Web3HttpGanacheBlockchain(Web3HttpBlockchain):
         self.next_acc_idx += count
         return dummy_accounts
 
-    def _gas_heuristic(self, sender, tx) -> int:
-        return self.w3.eth.getBlock('latest')['gasLimit']
+    def _gas_heuristic(self, sender, tx: Dict) -> int:
+        return self._block_gas_limit()
+
+    def _snapshot(self) -> Tuple[str, int]:
+        return self.w3.manager.request_blocking('evm_snapshot', []), self.next_acc_idx
+
+    def _revert(self, snapshot: Tuple[str, int]):
+        # Note: ganache discards a snapshot once it was reverted to (take a new snapshot to revert again)
+        snapshot_id, next_acc_idx = snapshot
+        if not self.w3.manager.request_blocking('evm_revert', [snapshot_id]):
+            raise BlockChainError(f'Cannot revert chain: unknown snapshot {snapshot_id}')
+        self.next_acc_idx = next_acc_idx
+        self._forget_chain_state()
 
 
 class Web3CustomBlockchain(Web3Blockchain):
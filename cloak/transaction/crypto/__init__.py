@@ -7,4 +7,8 @@ Submodules
 * :py:mod:`.dummy`: Fast but insecure key generation (pk == sk == address) and encryption (enc = (+), dec = (-)) for debugging
 * :py:mod:`.rsa_pkcs15`: Slow, secure rsa key generation and encryption using RSA PKCS1.5 padding
 * :py:mod:`.rsa_oaep`: Very slow, secure rsa key generation and encryption using RSA OAEP padding
+* :py:mod:`.ecdh_aes`: ECDH key exchange with AES-CBC encryption
+* :py:mod:`.ecdh_chaskey`: ECDH key exchange with Chaskey-LTS-CBC encryption
+* :py:mod:`.ec_curve`: Native implementation of the elliptic curve arithmetic used by the ecdh backends
+* :py:mod:`.chaskey`: Native implementation of the Chaskey-LTS-CBC cipher used by ecdh-chaskey
 """
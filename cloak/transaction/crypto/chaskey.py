@@ -0,0 +1,106 @@
+"""
+Native Chaskey-LTS block cipher in CBC mode for the ecdh-chaskey crypto backend.
+
+This is a python port of zkay.ChaskeyLTSEngine / zkay.ChaskeyLtsCbc (JsnarkCircuitBuilder.jar), the outputs are identical
+to the java implementation.
+
+Chaskey-LTS is used as an Even-Mansour block cipher: E_k(m) = pi(m ^ k) ^ k, where pi is the 16 round chaskey permutation
+on four little-endian 32 bit words.
+"""
+import struct
+from functools import lru_cache
+from typing import Tuple
+
+BLOCK_SIZE = 16
+ROUNDS = 16
+
+_MASK = 0xffffffff
+_WORDS = struct.Struct('<4I')
+
+
+def _rotl(x: int, n: int) -> int:
+    return ((x << n) | (x >> (32 - n))) & _MASK
+
+
+def _rotr(x: int, n: int) -> int:
+    return ((x >> n) | (x << (32 - n))) & _MASK
+
+
+def _permute(v0: int, v1: int, v2: int, v3: int) -> Tuple[int, int, int, int]:
+    for _ in range(ROUNDS):
+        v0 = (v0 + v1) & _MASK
+        v1 = _rotl(v1, 5) ^ v0
+        v0 = _rotl(v0, 16)
+        v2 = (v2 + v3) & _MASK
+        v3 = _rotl(v3, 8) ^ v2
+        v0 = (v0 + v3) & _MASK
+        v3 = _rotl(v3, 13) ^ v0
+        v2 = (v2 + v1) & _MASK
+        v1 = _rotl(v1, 7) ^ v2
+        v2 = _rotl(v2, 16)
+    return v0, v1, v2, v3
+
+
+def _inverse_permute(v0: int, v1: int, v2: int, v3: int) -> Tuple[int, int, int, int]:
+    for _ in range(ROUNDS):
+        v2 = _rotr(v2, 16)
+        v1 = _rotr(v1 ^ v2, 7)
+        v2 = (v2 - v1) & _MASK
+        v3 = _rotr(v3 ^ v0, 13)
+        v0 = (v0 - v3) & _MASK
+        v3 = _rotr(v3 ^ v2, 8)
+        v2 = (v2 - v3) & _MASK
+        v0 = _rotr(v0, 16)
+        v1 = _rotr(v1 ^ v0, 5)
+        v0 = (v0 - v1) & _MASK
+    return v0, v1, v2, v3
+
+
+class ChaskeyLtsCbc:
+    """Chaskey-LTS in CBC mode (without padding) for a fixed 128 bit key."""
+
+    def __init__(self, key: bytes):
+        if len(key) != BLOCK_SIZE:
+            raise ValueError(f'Chaskey key must be {BLOCK_SIZE} bytes long')
+        self._key_words = _WORDS.unpack(key)
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def for_key(key: bytes) -> 'ChaskeyLtsCbc':
+        """Return a cipher instance for key, the key schedule is computed only once per key."""
+        return ChaskeyLtsCbc(key)
+
+    def _encrypt_block(self, block: Tuple[int, ...]) -> Tuple[int, ...]:
+        k = self._key_words
+        v = _permute(*(b ^ kw for b, kw in zip(block, k)))
+        return tuple(x ^ kw for x, kw in zip(v, k))
+
+    def _decrypt_block(self, block: Tuple[int, ...]) -> Tuple[int, ...]:
+        k = self._key_words
+        v = _inverse_permute(*(b ^ kw for b, kw in zip(block, k)))
+        return tuple(x ^ kw for x, kw in zip(v, k))
+
+    def encrypt(self, iv: bytes, plain: bytes) -> bytes:
+        """Encrypt plain (length must be a multiple of the block size), the result does not include the iv."""
+        if len(iv) != BLOCK_SIZE or len(plain) % BLOCK_SIZE != 0:
+            raise ValueError('Invalid iv or plaintext length')
+        prev = _WORDS.unpack(iv)
+        out = []
+        for i in range(0, len(plain), BLOCK_SIZE):
+            block = _WORDS.unpack_from(plain, i)
+            prev = self._encrypt_block(tuple(b ^ p for b, p in zip(block, prev)))
+            out.append(_WORDS.pack(*prev))
+        return b''.join(out)
+
+    def decrypt(self, iv: bytes, cipher: bytes) -> bytes:
+        """Decrypt cipher (length must be a multiple of the block size) which was encrypted with the given iv."""
+        if len(iv) != BLOCK_SIZE or len(cipher) % BLOCK_SIZE != 0:
+            raise ValueError('Invalid iv or ciphertext length')
+        prev = _WORDS.unpack(iv)
+        out = []
+        for i in range(0, len(cipher), BLOCK_SIZE):
+            block = _WORDS.unpack_from(cipher, i)
+            plain = self._decrypt_block(block)
+            out.append(_WORDS.pack(*(b ^ p for b, p in zip(plain, prev))))
+            prev = block
+        return b''.join(out)
@@ -0,0 +1,80 @@
+"""
+Native elliptic curve arithmetic for the ecdh-* crypto backends.
+
+This is a python port of the key derivation and key exchange performed by zkay.ZkayECDHGenerator
+(JsnarkCircuitBuilder.jar), the outputs are identical to the java implementation.
+
+The curve is the montgomery curve y^2 = x^3 + 126932*x^2 + x over the bn128 scalar field (see jsnark ZkayEcGadget),
+public keys are x coordinates of secret * G where G is the base point with x = 4.
+"""
+import hashlib
+
+from cloak.compiler.privacy.library_contracts import bn128_scalar_field
+
+COEFF_A = 126932
+BASE_X = 4
+
+SECRET_BITWIDTH = 253
+"""The most significant secret bit is always set and the three least significant bits are always cleared."""
+
+_SECRET_MASK = (1 << SECRET_BITWIDTH) - 8
+_SECRET_MSB = 1 << (SECRET_BITWIDTH - 1)
+_A24 = (COEFF_A + 2) * pow(4, -1, bn128_scalar_field) % bn128_scalar_field
+
+
+def secret_from_randomness(rnd: bytes) -> int:
+    """Derive a valid secret key from 32 bytes of randomness (same derivation as the jsnark key generator)."""
+    return (int.from_bytes(rnd, byteorder='big') & _SECRET_MASK) | _SECRET_MSB
+
+
+def is_on_curve(x: int) -> bool:
+    """Return true if there is a curve point with x coordinate x."""
+    p = bn128_scalar_field
+    rhs = (x * x * x + COEFF_A * x * x + x) % p
+    return rhs == 0 or pow(rhs, (p - 1) // 2, p) == 1
+
+
+def scalar_mult(k: int, x: int) -> int:
+    """
+    Compute the x coordinate of k * P, where P is a curve point with x coordinate x.
+
+    Uses the x-only montgomery ladder in projective coordinates, which is independent of the sign of the y coordinate.
+
+    :raise ValueError: if x does not belong to a curve point or if the result is the point at infinity
+    """
+    p = bn128_scalar_field
+    if not 0 <= x < p or not is_on_curve(x):
+        raise ValueError(f'{x} is not the x coordinate of a curve point')
+
+    x2, z2, x3, z3 = 1, 0, x, 1
+    swap = 0
+    for i in reversed(range(k.bit_length())):
+        bit = (k >> i) & 1
+        if swap ^ bit:
+            x2, z2, x3, z3 = x3, z3, x2, z2
+        swap = bit
+
+        a, b = (x2 + z2) % p, (x2 - z2) % p
+        c, d = (x3 + z3) % p, (x3 - z3) % p
+        aa, bb = a * a % p, b * b % p
+        e = (aa - bb) % p
+        da, cb = d * a % p, c * b % p
+        x3, z3 = (da + cb) * (da + cb) % p, x * (da - cb) * (da - cb) % p
+        x2, z2 = aa * bb % p, e * (bb + _A24 * e) % p
+    if swap:
+        x2, z2 = x3, z3
+
+    if z2 == 0:
+        raise ValueError('Scalar multiplication resulted in the point at infinity')
+    return x2 * pow(z2, -1, p) % p
+
+
+def derive_pk(sk: int) -> int:
+    """Return the public key (x coordinate of sk * G) which belongs to secret key sk."""
+    return scalar_mult(sk, BASE_X)
+
+
+def ecdh_sha256(other_pk: int, my_sk: int) -> bytes:
+    """Return the 16 byte symmetric key sha256(x(my_sk * other_pk))[:16]."""
+    shared_x = scalar_mult(my_sk, other_pk)
+    return hashlib.sha256(shared_x.to_bytes(32, byteorder='big')).digest()[:16]
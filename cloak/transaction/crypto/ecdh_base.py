@@ -1,30 +1,170 @@
+import hashlib
 import os
 import secrets
+import struct
+from collections import OrderedDict
+from abc import abstractmethod
+from typing import Dict, Tuple, List, Any
 
 from cloak.config import cfg
-from cloak.jsnark_interface.jsnark_interface import circuit_builder_jar
+from cloak.jsnark_interface.jsnark_interface import run_java_main
 from cloak.transaction.interface import PrivateKeyValue, PublicKeyValue, KeyPair
-from cloak.transaction.interface import ZkayCryptoInterface
-from cloak.utils.run_command import run_command
+from cloak.transaction.interface import ZkayCryptoInterface, ZkayKeystoreInterface
+from cloak.transaction.crypto import ec_curve
+
+
+_LEGACY_KEY_FILE_LEN = 32
+
+_KEY_FILE_MAGIC = b'CLOAKEC'
+_KEY_FILE_VERSION = 1
+_KEY_FILE_BODY = struct.Struct(f'>{len(_KEY_FILE_MAGIC)}sB32s32s32s')
+"""Key file layout: magic, version, randomness, pk, sk, followed by the sha256 digest of all preceding bytes."""
+
+
+def _write_key_file(key_file: str, rnd: bytes, pk: int, sk: int):
+    body = _KEY_FILE_BODY.pack(_KEY_FILE_MAGIC, _KEY_FILE_VERSION, rnd, pk.to_bytes(32, byteorder='big'),
+                               sk.to_bytes(32, byteorder='big'))
+    tmp_file = f'{key_file}.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(body + hashlib.sha256(body).digest())
+    os.replace(tmp_file, key_file)
+
+
+def _parse_key_file(key_file: str, data: bytes) -> Tuple[bytes, int, int]:
+    """
+    Return (randomness, pk, sk) stored in a key file.
+
+    :raise ValueError: if the file has an unknown format or is corrupted
+    """
+    body, digest = data[:_KEY_FILE_BODY.size], data[_KEY_FILE_BODY.size:]
+    if len(body) != _KEY_FILE_BODY.size or hashlib.sha256(body).digest() != digest:
+        raise ValueError(f'Corrupted key file {key_file}')
+    magic, version, rnd, pk, sk = _KEY_FILE_BODY.unpack(body)
+    if magic != _KEY_FILE_MAGIC or version != _KEY_FILE_VERSION:
+        raise ValueError(f'Unsupported key file format in {key_file}')
+    pk, sk = int.from_bytes(pk, byteorder='big'), int.from_bytes(sk, byteorder='big')
+    if sk != ec_curve.secret_from_randomness(rnd):
+        raise ValueError(f'Corrupted key file {key_file}')
+    return rnd, pk, sk
+
+
+class SharedKeyCache:
+    """LRU cache of ecdh shared keys, keyed by (own address, peer public key)."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._keys: 'OrderedDict[Tuple[str, int], bytes]' = OrderedDict()
+
+    def get(self, address: str, other_pk: int):
+        """Return the cached key or None."""
+        key = self._keys.get((address, other_pk))
+        if key is None:
+            self.misses += 1
+        else:
+            self._keys.move_to_end((address, other_pk))
+            self.hits += 1
+        return key
+
+    def put(self, address: str, other_pk: int, key: bytes):
+        if self.max_size == 0:
+            return
+        self._keys[(address, other_pk)] = key
+        self._keys.move_to_end((address, other_pk))
+        while len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+
+    def invalidate(self, address: str):
+        """Remove all keys which were derived from the secret key of address."""
+        for k in [k for k in self._keys if k[0] == address]:
+            del self._keys[k]
 
 
 class EcdhBase(ZkayCryptoInterface):
+    def __init__(self, keystore: ZkayKeystoreInterface):
+        super().__init__(keystore)
+        self.shared_keys = SharedKeyCache(cfg.ecdh_key_cache_size)
+
+        # Own address (hex) for every secret key which was generated or loaded by this backend
+        self._sk_owners: Dict[int, str] = {}
+
     @classmethod
     def is_symmetric_cipher(cls) -> bool:
         return True
 
     @staticmethod
     def _gen_keypair(rnd: bytes):
-        keys, _ = run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}', 'zkay.ZkayECDHGenerator', rnd.hex()])
+        if cfg.crypto_impl == 'python':
+            sk = ec_curve.secret_from_randomness(rnd)
+            return ec_curve.derive_pk(sk), sk
+
+        keys, _ = run_java_main('ecdh', 'zkay.ZkayECDHGenerator', [rnd.hex()])
         keys = keys.splitlines()[-2:]
         return int(keys[0], 16), int(keys[1], 16)
 
+    def _shared_key(self, other_pk: int, my_sk: int) -> bytes:
+        """Return the symmetric key for communication between the owner of my_sk and the owner of other_pk (cached)."""
+        # Keys which were loaded by the keystore without this backend are not associated with an address
+        address = self._sk_owners.get(my_sk, f'sk:{my_sk:x}')
+        key = self.shared_keys.get(address, other_pk)
+        if key is None:
+            key = self._ecdh_sha256(other_pk, my_sk)
+            self.shared_keys.put(address, other_pk, key)
+        return key
+
     @staticmethod
     def _ecdh_sha256(other_pk: int, my_sk: int):
-        ret, _ = run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}', 'zkay.ZkayECDHGenerator', hex(my_sk)[2:], hex(other_pk)[2:]])
+        if cfg.crypto_impl == 'python':
+            return ec_curve.ecdh_sha256(other_pk, my_sk)
+
+        ret, _ = run_java_main('ecdh', 'zkay.ZkayECDHGenerator', [hex(my_sk)[2:], hex(other_pk)[2:]])
         key = ret.splitlines()[-1]
         return int(key, 16).to_bytes(16, byteorder='big')
 
+    def _enc(self, plain: int, my_sk: int, target_pk: int) -> Tuple[List[int], None]:
+        return self._enc_many([plain], my_sk, target_pk)[0]
+
+    def _dec(self, cipher: Tuple[int, ...], my_sk: Any) -> Tuple[int, None]:
+        return self._dec_many([cipher], my_sk)[0]
+
+    def _enc_many(self, plains: List[int], my_sk: int, target_pk: int) -> List[Tuple[List[int], None]]:
+        # Compute shared key once for all values
+        key = self._shared_key(target_pk, my_sk)
+        ivs = secrets.token_bytes(16 * len(plains))
+
+        plains_bytes = [plain.to_bytes(32, byteorder='big') for plain in plains]
+        ciphers_bytes = self._sym_enc_many(key, [ivs[i:i + 16] for i in range(0, len(ivs), 16)], plains_bytes)
+        return [(self.pack_byte_array(iv_cipher, cfg.cipher_chunk_size), None) for iv_cipher in ciphers_bytes]
+
+    def _dec_many(self, ciphers: List[Tuple[int, ...]], my_sk: Any) -> List[Tuple[int, None]]:
+        # Extract sender public key from cipher metadata and group ciphers by sender
+        groups: Dict[int, List[int]] = {}
+        for idx, cipher in enumerate(ciphers):
+            assert len(cipher) - 1 == cfg.cipher_payload_len
+            groups.setdefault(cipher[-1], []).append(idx)
+
+        ret: List[Tuple[int, None]] = [(0, None)] * len(ciphers)
+        for sender_pk, indices in groups.items():
+            # Compute shared key once per sender
+            key = self._shared_key(sender_pk, my_sk)
+            iv_ciphers = [self.unpack_to_byte_array(ciphers[idx][:-1], cfg.cipher_chunk_size, cfg.cipher_bytes_payload)
+                          for idx in indices]
+            plains = self._sym_dec_many(key, [c[:16] for c in iv_ciphers], [c[16:] for c in iv_ciphers])
+            for idx, plain_bytes in zip(indices, plains):
+                ret[idx] = int.from_bytes(plain_bytes, byteorder='big'), None
+        return ret
+
+    @abstractmethod
+    def _sym_enc_many(self, key: bytes, ivs: List[bytes], plains: List[bytes]) -> List[bytes]:
+        """Encrypt every plains[i] with key and ivs[i], return iv + cipher bytes for each value."""
+        pass
+
+    @abstractmethod
+    def _sym_dec_many(self, key: bytes, ivs: List[bytes], ciphers: List[bytes]) -> List[bytes]:
+        """Decrypt every ciphers[i] with key and ivs[i]."""
+        pass
+
     def _generate_or_load_key_pair(self, address: str) -> KeyPair:
         key_file = os.path.join(cfg.data_dir, 'keys', f'ec_{address}.bin')
         os.makedirs(os.path.dirname(key_file), exist_ok=True)
@@ -32,18 +172,27 @@ class EcdhBase(ZkayCryptoInterface):
             # Generate fresh randomness for ec private key
             print(f'Key pair not found, generating new EC secret...')
             rnd = secrets.token_bytes(32)
+            pk, sk = self._gen_keypair(rnd)
 
-            # Store randomness so that address will have the same key every time
-            with open(key_file, 'wb') as f:
-                f.write(rnd)
+            # Store randomness and derived keys so that address will have the same key every time
+            _write_key_file(key_file, rnd, pk, sk)
             print('done')
         else:
-            # Restore saved randomness
+            # Restore saved keys
             print(f'EC secret found, loading from file {key_file}')
             with open(key_file, 'rb') as f:
-                rnd = f.read()
+                data = f.read()
+            if len(data) == _LEGACY_KEY_FILE_LEN:
+                # Old format (randomness only), derive keys and upgrade the file
+                rnd = data
+                pk, sk = self._gen_keypair(rnd)
+                _write_key_file(key_file, rnd, pk, sk)
+            else:
+                rnd, pk, sk = _parse_key_file(key_file, data)
 
-        # Derive keys from randomness
-        pk, sk = self._gen_keypair(rnd)
+        # Shared keys of a previous key pair of this address are no longer valid
+        self.shared_keys.invalidate(address)
+        self._sk_owners = {s: a for s, a in self._sk_owners.items() if a != address}
+        self._sk_owners[sk] = address
 
         return KeyPair(PublicKeyValue([pk]), PrivateKeyValue(sk))
@@ -1,41 +1,33 @@
-import secrets
-from typing import Tuple, List, Any
+from typing import List
 
 from cloak.config import cfg
-from cloak.jsnark_interface.jsnark_interface import circuit_builder_jar
+from cloak.jsnark_interface.jsnark_interface import run_java_main
+from cloak.transaction.crypto.chaskey import ChaskeyLtsCbc
 from cloak.transaction.crypto.ecdh_base import EcdhBase
-from cloak.utils.run_command import run_command
 
 
 class EcdhChaskeyCrypto(EcdhBase):
 
-    def _enc(self, plain: int, my_sk: int, target_pk: int) -> Tuple[List[int], None]:
-        # Compute shared key
-        key = self._ecdh_sha256(target_pk, my_sk)
-        plain_bytes = plain.to_bytes(32, byteorder='big')
+    def _sym_enc_many(self, key: bytes, ivs: List[bytes], plains: List[bytes]) -> List[bytes]:
+        if cfg.crypto_impl == 'python':
+            cipher = ChaskeyLtsCbc.for_key(key)
+            return [iv + cipher.encrypt(iv, plain) for iv, plain in zip(ivs, plains)]
 
         # Call java implementation
-        iv = secrets.token_bytes(16)
-        iv_cipher, _ = run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}',
-                                    'zkay.ChaskeyLtsCbc', 'enc', key.hex(), iv.hex(), plain_bytes.hex()])
-        iv_cipher = iv + int(iv_cipher.splitlines()[-1], 16).to_bytes(32, byteorder='big')
+        ret = []
+        for iv, plain in zip(ivs, plains):
+            iv_cipher, _ = run_java_main('chaskey', 'zkay.ChaskeyLtsCbc', ['enc', key.hex(), iv.hex(), plain.hex()])
+            ret.append(iv + int(iv_cipher.splitlines()[-1], 16).to_bytes(32, byteorder='big'))
+        return ret
 
-        return self.pack_byte_array(iv_cipher, cfg.cipher_chunk_size), None
-
-    def _dec(self, cipher: Tuple[int, ...], my_sk: Any) -> Tuple[int, None]:
-        # Extract sender address from cipher metadata and request corresponding public key
-        sender_pk = cipher[-1]
-        cipher = cipher[:-1]
-        assert len(cipher) == cfg.cipher_payload_len
-
-        # Compute shared key
-        key = self._ecdh_sha256(sender_pk, my_sk)
+    def _sym_dec_many(self, key: bytes, ivs: List[bytes], ciphers: List[bytes]) -> List[bytes]:
+        if cfg.crypto_impl == 'python':
+            cipher = ChaskeyLtsCbc.for_key(key)
+            return [cipher.decrypt(iv, c) for iv, c in zip(ivs, ciphers)]
 
         # Call java implementation
-        iv_cipher = self.unpack_to_byte_array(cipher, cfg.cipher_chunk_size, cfg.cipher_bytes_payload)
-        iv, cipher_bytes = iv_cipher[:16], iv_cipher[16:]
-        plain, _ = run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}',
-                                'zkay.ChaskeyLtsCbc', 'dec', key.hex(), iv.hex(), cipher_bytes.hex()])
-        plain = int(plain.splitlines()[-1], 16)
-
-        return plain, None
+        ret = []
+        for iv, c in zip(ivs, ciphers):
+            plain, _ = run_java_main('chaskey', 'zkay.ChaskeyLtsCbc', ['dec', key.hex(), iv.hex(), c.hex()])
+            ret.append(int(plain.splitlines()[-1], 16).to_bytes(32, byteorder='big'))
+        return ret
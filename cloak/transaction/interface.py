@@ -11,12 +11,12 @@ It provides high level functions for
 import os
 from abc import ABCMeta, abstractmethod
 from builtins import type
-from typing import Tuple, List, Optional, Union, Any, Dict, Collection
+from typing import Tuple, List, Optional, Union, Any, Dict, Collection, Iterable
 
 from cloak.frontend import compile_cloak_file
 from cloak.compiler.privacy.library_contracts import bn128_scalar_field
 from cloak.compiler.privacy.proving_scheme.proving_scheme import ProvingScheme
-from cloak.cloak_ast.process_ast import get_verification_contract_names
+from cloak.compiler.privacy.manifest import Manifest
 from cloak.config import cfg, zk_print, zk_print_banner
 from cloak.transaction.types import AddressValue, MsgStruct, BlockStruct, TxStruct, PublicKeyValue, Value, \
     PrivateKeyValue, CipherValue, RandomnessValue, KeyPair
@@ -46,6 +46,35 @@ class ProofGenerationError(Exception):
     pass
 
 
+class PendingTransaction:
+    """
+    Handle for a transaction which was submitted to the chain, but whose receipt was possibly not retrieved yet.
+
+    Use :py:meth:`wait` to block until the transaction is included, or \
+    :py:meth:`CloakBlockchainInterface.wait_for_transactions` to wait for many transactions at once.
+    """
+
+    def __init__(self, conn: 'CloakBlockchainInterface', tx_hash: Any, function: str, receipt: Any = None):
+        self.conn = conn
+        self.tx_hash = tx_hash
+        self.function = function
+        self.receipt = receipt
+        """Backend-specific transaction receipt (None until the transaction was included)"""
+
+    def done(self) -> bool:
+        return self.receipt is not None
+
+    def wait(self) -> Any:
+        """
+        Wait until the transaction is included.
+
+        :raise BlockChainError: if there is an error in the backend
+        :raise TransactionFailedException: if the transaction failed
+        :return: backend-specific transaction receipt
+        """
+        return self.conn.wait_for_transactions([self])[0]
+
+
 class CloakBlockchainInterface(metaclass=ABCMeta):
     """
     API to interact with the blockchain.
@@ -110,6 +139,30 @@ class CloakBlockchainInterface(metaclass=ABCMeta):
         # may not be supported by all backends
         raise NotImplementedError('Current blockchain backend does not support creating pre-funded test accounts.')
 
+    def snapshot(self) -> Any:
+        """
+        Take a snapshot of the chain state (only implemented for w3-eth-tester and w3-ganache, for testing).
+
+        Test suites can take a snapshot after the common setup (e.g. accounts and keys) and revert to it before each case,
+        instead of setting up a new chain.
+
+        :raise NotImplementedError: if the backend does not support snapshots
+        :return: snapshot handle, which can be passed to revert
+        """
+        return self._snapshot(), (self._pki_contract, self._service_contract, self._lib_addresses)
+
+    def revert(self, snapshot: Any):
+        """
+        Restore the chain state (including the handed out test accounts) at the time the snapshot was taken.
+
+        :param snapshot: handle returned by snapshot
+        :raise NotImplementedError: if the backend does not support snapshots
+        :raise BlockChainError: if the snapshot is unknown to the backend
+        """
+        chain_snapshot, (pki_contract, service_contract, lib_addresses) = snapshot
+        self._revert(chain_snapshot)
+        self._pki_contract, self._service_contract, self._lib_addresses = pki_contract, service_contract, lib_addresses
+
     @abstractmethod
     def get_special_variables(self, sender: AddressValue, wei_amount: int = 0) -> Tuple[MsgStruct, BlockStruct, TxStruct]:
         """
@@ -137,6 +190,22 @@ class CloakBlockchainInterface(metaclass=ABCMeta):
         zk_print(f'Requesting public key for address "{address}"', verbosity_level=2)
         return self._req_public_key(address.val)
 
+    def req_public_keys(self, addresses: List[AddressValue]) -> List[PublicKeyValue]:
+        """
+        Request the public keys for all designated addresses from the PKI contract.
+
+        :param addresses: Addresses for which to request public keys
+        :raise BlockChainError: if request fails
+        :return: the public keys, in the same order as addresses
+        """
+        assert all(isinstance(address, AddressValue) for address in addresses)
+        zk_print(f'Requesting public keys for {len(addresses)} addresses', verbosity_level=2)
+        return self._req_public_keys([address.val for address in addresses])
+
+    def get_block_number(self) -> int:
+        """Return the number of the most recent block."""
+        return self._get_block_number()
+
     def announce_public_key(self, sender: AddressValue, pk: PublicKeyValue) -> Any:
         """
         Announce a public key to the PKI
@@ -188,6 +257,23 @@ class CloakBlockchainInterface(metaclass=ABCMeta):
         zk_print(f'Got value {val} for state variable "{name}"', verbosity_level=2)
         return val
 
+    def req_state_vars(self, contract_handle, requests: List[Tuple[str, Tuple]]) -> List[Union[bool, int, str, bytes]]:
+        """
+        Request several contract state variable values at once (see req_state_var).
+
+        Depending on the backend, all values are retrieved with a single request to the blockchain node.
+
+        :param contract_handle: contract from which to read state
+        :param requests: list of (state variable name, index key values) tuples
+        :raise BlockChainError: if any of the requests fails
+        :return: The values, in the same order as requests
+        """
+        assert contract_handle is not None
+        zk_print(f'Requesting {len(requests)} state variable values', verbosity_level=2)
+        vals = self._req_state_vars(contract_handle, [(name, tuple(Value.unwrap_values(list(indices)))) for name, indices in requests])
+        zk_print(f'Got values {vals}', verbosity_level=2)
+        return vals
+
     def call(self, contract_handle, sender: AddressValue, name: str, *args) -> Union[bool, int, str, bytes, List]:
         """
         Call the specified pure/view function in the given contract with the provided arguments.
@@ -230,6 +316,43 @@ class CloakBlockchainInterface(metaclass=ABCMeta):
         zk_print()
         return ret
 
+    def submit(self, contract_handle, sender: AddressValue, function: str, actual_args: List, should_encrypt: List[bool], wei_amount: Optional[int] = None) -> PendingTransaction:
+        """
+        Issue a transaction like :py:meth:`transact`, but return as soon as it was submitted instead of waiting for its receipt.
+
+        This allows a sender to have many transactions in flight at once (nonces are assigned locally by the backend).
+        Backends which do not support pipelining issue the transaction synchronously and return a completed handle.
+
+        **WARNING: THIS ISSUES A CRYPTO CURRENCY TRANSACTION (GAS COST)**
+
+        :raise BlockChainError: if submission fails
+        :return: handle which can be waited on for the transaction receipt
+        """
+        assert contract_handle is not None
+        self.__check_args(actual_args, should_encrypt)
+        zk_print(f'Submitting transaction for function "{function}" from account "{sender}"')
+        zk_print(Value.collection_to_string(actual_args), verbosity_level=2)
+        return self._submit(contract_handle, sender.val, function, *Value.unwrap_values(actual_args), wei_amount=wei_amount)
+
+    def wait_for_transactions(self, pending: List[PendingTransaction]) -> List[Any]:
+        """
+        Wait until all given transactions are included, polling for their receipts in bulk.
+
+        :param pending: handles returned by :py:meth:`submit`
+        :raise BlockChainError: if there is an error in the backend
+        :raise TransactionFailedException: if any of the transactions failed (after all receipts were retrieved)
+        :return: the backend-specific transaction receipts, in the same order as pending
+        """
+        waiting = [p for p in pending if not p.done()]
+        if waiting:
+            zk_print(f'Waiting for {len(waiting)} transaction(s)', verbosity_level=2)
+            for p, receipt in zip(waiting, self._wait_for_receipts([p.tx_hash for p in waiting])):
+                p.receipt = receipt
+        failed = [p.function for p in pending if not self._transaction_succeeded(p.receipt)]
+        if failed:
+            raise TransactionFailedException(f'Transaction failed ({", ".join(failed)})')
+        return [p.receipt for p in pending]
+
     def deploy(self, project_dir: str, sender: AddressValue, contract: str, actual_args: List, should_encrypt: List[bool], wei_amount: Optional[int] = None) -> Any:
         """
         Issue a deployment transaction which constructs the specified contract with the provided constructor arguments on the chain.
@@ -310,8 +433,7 @@ class CloakBlockchainInterface(metaclass=ABCMeta):
         if not os.path.exists(os.path.join(project_dir, 'public_contract.sol')):
             compile_cloak_file(zk_file, project_dir, import_keys=True, verifier_names=verifier_names)
         else:
-            with open(zk_file) as f:
-                verifier_names = get_verification_contract_names(f.read())
+            verifier_names = Manifest.get_verifier_names(project_dir)
 
         zk_print(f'Connecting to contract {contract}@{contract_address}')
         contract_on_chain = self._connect(project_dir, contract, contract_address.val)
@@ -429,6 +551,13 @@ class CloakBlockchainInterface(metaclass=ABCMeta):
     def _req_public_key(self, address: Union[bytes, str]) -> PublicKeyValue:
         pass
 
+    def _req_public_keys(self, addresses: List[Union[bytes, str]]) -> List[PublicKeyValue]:
+        return [self._req_public_key(address) for address in addresses]
+
+    @abstractmethod
+    def _get_block_number(self) -> int:
+        pass
+
     @abstractmethod
     def _announce_public_key(self, address: Union[bytes, str], pk: Tuple[int, ...]) -> Any:
         pass
@@ -449,10 +578,31 @@ class CloakBlockchainInterface(metaclass=ABCMeta):
     def _req_state_var(self, contract_handle, name: str, *indices) -> Union[bool, int, str]:
         pass
 
+    def _req_state_vars(self, contract_handle, requests: List[Tuple[str, Tuple]]) -> List[Union[bool, int, str]]:
+        return [self._req_state_var(contract_handle, name, *indices) for name, indices in requests]
+
     @abstractmethod
     def _transact(self, contract_handle, sender: Union[bytes, str], function: str, *actual_args, wei_amount: Optional[int] = None) -> Any:
         pass
 
+    def _submit(self, contract_handle, sender: Union[bytes, str], function: str, *actual_args, wei_amount: Optional[int] = None) -> PendingTransaction:
+        # Backends without pipelining support issue the transaction synchronously
+        receipt = self._transact(contract_handle, sender, function, *actual_args, wei_amount=wei_amount)
+        return PendingTransaction(self, None, function, receipt)
+
+    def _wait_for_receipts(self, tx_hashes: List[Any]) -> List[Any]:
+        raise NotImplementedError('Current blockchain backend does not support pipelined transactions.')
+
+    def _transaction_succeeded(self, receipt: Any) -> bool:
+        return True
+
+    def _snapshot(self) -> Any:
+        # may not be supported by all backends
+        raise NotImplementedError('Current blockchain backend does not support chain snapshots.')
+
+    def _revert(self, snapshot: Any):
+        raise NotImplementedError('Current blockchain backend does not support chain snapshots.')
+
     @abstractmethod
     def _deploy(self, project_dir: str, sender: Union[bytes, str], contract: str, *actual_args, wei_amount: Optional[int] = None) -> Any:
         pass
@@ -496,6 +646,32 @@ class ZkayKeystoreInterface(metaclass=ABCMeta):
         """Return true if keys for address are already in the store."""
         return address in self.local_key_pairs
 
+    def load_key_pairs(self, addresses: Optional[Iterable[AddressValue]] = None) -> int:
+        """
+        Load the stored key pairs of all given addresses (default: of all addresses) into memory at once.
+
+        Keystores which do not persist key pairs have nothing to load.
+
+        :return: number of loaded key pairs
+        """
+        return 0
+
+    def forget_chain_state(self, keep_key_pairs: Optional[Iterable[AddressValue]] = None):
+        """
+        Drop all keystore state which depends on the chain, e.g. after the chain was reverted to a snapshot.
+
+        Cached public keys of other accounts are always dropped. Key pairs are only dropped from memory for the addresses
+        which are not in keep_key_pairs (default: all key pairs are kept), such that the keys of accounts which are handed
+        out again after a revert go through initialization again (persistent keystores load the stored keys again).
+
+        :param keep_key_pairs: addresses whose key pairs remain initialized
+        """
+        self.local_pk_store.clear()
+        if keep_key_pairs is not None:
+            keep = set(keep_key_pairs)
+            for address in [address for address in self.local_key_pairs if address not in keep]:
+                del self.local_key_pairs[address]
+
     def getPk(self, address: AddressValue) -> PublicKeyValue:
         """
         Return public key for address.
@@ -517,6 +693,20 @@ class ZkayKeystoreInterface(metaclass=ABCMeta):
             self.local_pk_store[address] = pk
             return pk
 
+    def prefetch_public_keys(self, addresses: List[AddressValue]):
+        """
+        Make the public keys of all addresses available locally, such that subsequent getPk calls do not block.
+
+        Keys which are not cached yet are requested from the pki contract in a single bulk request.
+
+        :param addresses: addresses whose public keys will be needed
+        :raise BlockChainError: if key request fails
+        """
+        missing = list(dict.fromkeys(address for address in addresses if address not in self.local_pk_store))
+        if missing:
+            for address, pk in zip(missing, self.conn.req_public_keys(missing)):
+                self.local_pk_store[address] = pk
+
     def sk(self, address: AddressValue) -> PrivateKeyValue:
         """
         Return secret key for address from the local key store.
@@ -596,6 +786,51 @@ class ZkayCryptoInterface(metaclass=ABCMeta):
 
         return cipher, rnd
 
+    def enc_many(self, plains: List[Union[int, AddressValue]], my_addr: AddressValue,
+                 target_addrs: List[AddressValue]) -> List[Tuple[CipherValue, Optional[RandomnessValue]]]:
+        """
+        Encrypt plains[i] for receiver target_addrs[i] (for all i).
+
+        Values are grouped by receiver, such that key lookup and key derivation happen only once per receiver.
+
+        :param plains: plain texts to encrypt
+        :param my_addr: address of the sender who encrypts
+        :param target_addrs: addresses of the receivers, same length as plains
+        :return: list with an enc result (see enc) for every plain text, in the same order as plains
+        """
+        assert len(plains) == len(target_addrs)
+        assert isinstance(my_addr, AddressValue)
+        groups: Dict[AddressValue, List[int]] = {}
+        for idx, target_addr in enumerate(target_addrs):
+            assert isinstance(target_addr, AddressValue)
+            groups.setdefault(target_addr, []).append(idx)
+
+        sk = self.keystore.sk(my_addr).val
+        ret: List[Optional[Tuple[CipherValue, Optional[RandomnessValue]]]] = [None] * len(plains)
+        for target_addr, indices in groups.items():
+            zk_print(f'Encrypting {len(indices)} values for destination "{target_addr}"', verbosity_level=2)
+            group_plains = []
+            for idx in indices:
+                plain = plains[idx]
+                if isinstance(plain, AddressValue):
+                    plain = int.from_bytes(plain.val, byteorder='big')
+                assert not isinstance(plain, Value), f"Tried to encrypt value of type {type(plain).__name__}"
+                assert int(plain) < bn128_scalar_field, f"Integer overflow, plaintext is >= field prime"
+                group_plains.append(int(plain))
+
+            raw_pk = self.keystore.getPk(target_addr)
+            if self.is_symmetric_cipher():
+                assert len(raw_pk) == 1
+                pk = raw_pk[0]
+            else:
+                pk = self.deserialize_pk(raw_pk[:])
+            for idx, plain, (cipher, rnd) in zip(indices, group_plains, self._enc_many(group_plains, sk, pk)):
+                while CipherValue(cipher) == CipherValue():
+                    # Retry until cipher text is not 0
+                    cipher, rnd = self._enc(plain, sk, pk)
+                ret[idx] = CipherValue(cipher), RandomnessValue(rnd) if rnd is not None else None
+        return ret
+
     def dec(self, cipher: CipherValue, my_addr: AddressValue) -> Tuple[int, Optional[RandomnessValue]]:
         """
         Decrypt cipher encrypted for my_addr.
@@ -617,6 +852,27 @@ class ZkayCryptoInterface(metaclass=ABCMeta):
 
         return ret
 
+    def dec_many(self, ciphers: List[CipherValue], my_addr: AddressValue) -> List[Tuple[int, Optional[RandomnessValue]]]:
+        """
+        Decrypt all ciphers, which were encrypted for my_addr.
+
+        :param ciphers: encrypted values
+        :param my_addr: ciphers are encrypted for this address
+        :return: list with a dec result (see dec) for every cipher, in the same order as ciphers
+        """
+        assert isinstance(my_addr, AddressValue)
+        for cipher in ciphers:
+            assert isinstance(cipher, CipherValue), f"Tried to decrypt value of type {type(cipher).__name__}"
+        zk_print(f'Decrypting {len(ciphers)} values for {my_addr}', verbosity_level=2)
+
+        ret: List[Tuple[int, Optional[RandomnessValue]]] = [(0, None if cfg.is_symmetric_cipher() else RandomnessValue())] * len(ciphers)
+        indices = [idx for idx, cipher in enumerate(ciphers) if cipher != CipherValue()]
+        if indices:
+            sk = self.keystore.sk(my_addr)
+            for idx, (plain, rnd) in zip(indices, self._dec_many([ciphers[idx][:] for idx in indices], sk.val)):
+                ret[idx] = plain, RandomnessValue(rnd) if rnd is not None else None
+        return ret
+
     @staticmethod
     def serialize_pk(key: int, total_bytes: int) -> List[int]:
         """Serialize a large integer into an array of {cfg.cipher_chunk_size}-byte ints."""
@@ -658,6 +914,14 @@ class ZkayCryptoInterface(metaclass=ABCMeta):
     def _dec(self, cipher: Tuple[int, ...], sk: Any) -> Tuple[int, List[int]]:
         pass
 
+    def _enc_many(self, plains: List[int], my_sk: int, target_pk: int) -> List[Tuple[List[int], List[int]]]:
+        """Encrypt all plains for the same receiver, backends can override this to share work between the values."""
+        return [self._enc(plain, my_sk, target_pk) for plain in plains]
+
+    def _dec_many(self, ciphers: List[Tuple[int, ...]], sk: Any) -> List[Tuple[int, List[int]]]:
+        """Decrypt all ciphers, backends can override this to share work between the values."""
+        return [self._dec(cipher, sk) for cipher in ciphers]
+
 
 class ZkayProverInterface(metaclass=ABCMeta):
     """API to generate zero knowledge proofs for a particular circuit and arguments."""
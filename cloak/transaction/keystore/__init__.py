@@ -5,6 +5,8 @@ This package contains the keystore backends.
 Submodules
 ==========
 * :py:mod:`.simple`: Basic key store implementation
+* :py:mod:`.sqlite`: Persistent key store backed by an indexed sqlite database
 """
 
 from .simple import SimpleKeystore
+from .sqlite import SqliteKeystore
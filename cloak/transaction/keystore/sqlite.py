@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Iterable, Tuple, Any, Set
+
+from Crypto.PublicKey import RSA
+
+from cloak.config import cfg, zk_print
+from cloak.transaction.interface import ZkayKeystoreInterface, CloakBlockchainInterface
+from cloak.transaction.types import AddressValue, PublicKeyValue, PrivateKeyValue, KeyPair
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS key_pairs (
+    crypto_backend TEXT NOT NULL,
+    key_bits INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    pk TEXT NOT NULL,
+    sk_type TEXT NOT NULL,
+    sk TEXT NOT NULL,
+    PRIMARY KEY (crypto_backend, key_bits, address)
+);
+CREATE TABLE IF NOT EXISTS public_keys (
+    chain TEXT NOT NULL,
+    crypto_backend TEXT NOT NULL,
+    key_bits INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    pk TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    PRIMARY KEY (chain, crypto_backend, key_bits, address)
+);
+'''
+
+
+def _serialize_sk(sk: Any) -> Tuple[str, str]:
+    if isinstance(sk, int):
+        return 'int', format(sk, 'x')
+    elif isinstance(sk, RSA.RsaKey):
+        return 'rsa', sk.export_key().decode()
+    else:
+        raise ValueError(f'Cannot store secret key of type {type(sk).__name__}')
+
+
+def _deserialize_sk(sk_type: str, sk: str) -> Any:
+    if sk_type == 'int':
+        return int(sk, 16)
+    elif sk_type == 'rsa':
+        return RSA.import_key(sk)
+    else:
+        raise ValueError(f'Unknown secret key type {sk_type}')
+
+
+class SqliteKeystore(ZkayKeystoreInterface):
+    """
+    Keystore which persists key pairs in a single sqlite database (cfg.data_dir/keystore.sqlite).
+
+    Key pairs are indexed by crypto backend, key size and address, such that they can be looked up individually or in
+    bulk. The database only serves as an index, the key files of the crypto backend remain authoritative: keys count as
+    initialized only once the crypto backend registered them in this process (see add_keypair), such that it always
+    loads its own key material and a stored pair which drifted from the key file is replaced. Public keys of other accounts which were requested from the pki are cached
+    together with the number of the block at which they were requested, and are requested again once they are older
+    than cfg.keystore_pk_cache_blocks blocks (foreign keys are never persisted for debug backends, whose chain state
+    does not survive the process).
+    """
+
+    def __init__(self, conn: CloakBlockchainInterface, db_file: Optional[str] = None):
+        super().__init__(conn)
+        self.db_file = os.path.join(cfg.data_dir, 'keystore.sqlite') if db_file is None else db_file
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_file, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(_schema)
+        self._looked_up: Set[AddressValue] = set()
+        """Addresses whose key pairs were already looked up in the database (whether or not any were stored)"""
+        self._initialized: Set[AddressValue] = set()
+        """Addresses whose key pairs were registered by the crypto backend in this process"""
+
+    @property
+    def _key_scope(self) -> Tuple[str, int]:
+        return cfg.crypto_backend, cfg.key_bits
+
+    @property
+    def _chain(self) -> Optional[str]:
+        """Identifier of the chain whose pki the foreign public keys come from, None if they must not be persisted."""
+        if self.conn.is_debug_backend() or cfg.keystore_pk_cache_blocks == 0:
+            return None
+        node = cfg.blockchain_node_uri if isinstance(cfg.blockchain_node_uri, str) else ''
+        return f'{cfg.blockchain_backend}|{node}|{cfg.blockchain_pki_address}'
+
+    def add_keypair(self, address: AddressValue, key_pair: KeyPair):
+        super().add_keypair(address, key_pair)
+        self._initialized.add(address)
+        sk_type, sk = _serialize_sk(key_pair.sk.val)
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO key_pairs VALUES (?, ?, ?, ?, ?, ?)',
+                             (*self._key_scope, address.val.hex(), json.dumps(key_pair.pk[:]), sk_type, sk))
+
+    def load_key_pairs(self, addresses: Optional[Iterable[AddressValue]] = None) -> int:
+        """
+        Load the stored key pairs of all given addresses (default: of all addresses) into memory.
+
+        Loaded pairs serve sk and pk lookups, but do not count as initialized until the crypto backend registers them.
+
+        :return: number of loaded key pairs
+        """
+        query = 'SELECT address, pk, sk_type, sk FROM key_pairs WHERE crypto_backend = ? AND key_bits = ?'
+        with self._lock:
+            if addresses is None:
+                rows = self._db.execute(query, self._key_scope).fetchall()
+            else:
+                addresses = list(addresses)
+                self._looked_up.update(addresses)
+                rows = []
+                addrs = [a.val.hex() for a in addresses]
+                for i in range(0, len(addrs), 500):
+                    chunk = addrs[i:i + 500]
+                    rows += self._db.execute(f'{query} AND address IN ({",".join("?" * len(chunk))})',
+                                             (*self._key_scope, *chunk)).fetchall()
+        for address, pk, sk_type, sk in rows:
+            self.local_key_pairs[AddressValue(address)] = KeyPair(PublicKeyValue(json.loads(pk)), PrivateKeyValue(_deserialize_sk(sk_type, sk)))
+        zk_print(f'Loaded {len(rows)} key pairs from {self.db_file}', verbosity_level=2)
+        return len(rows)
+
+    def _lookup(self, address: AddressValue):
+        if address not in self.local_key_pairs and address not in self._looked_up:
+            self.load_key_pairs([address])
+
+    def has_initialized_keys_for(self, address: AddressValue) -> bool:
+        return address in self._initialized
+
+    def sk(self, address: AddressValue) -> PrivateKeyValue:
+        self._lookup(address)
+        return super().sk(address)
+
+    def pk(self, address: AddressValue) -> PublicKeyValue:
+        self._lookup(address)
+        return super().pk(address)
+
+    def getPk(self, address: AddressValue) -> PublicKeyValue:
+        assert isinstance(address, AddressValue)
+        self.prefetch_public_keys([address])
+        return self.local_pk_store[address]
+
+    def prefetch_public_keys(self, addresses: List[AddressValue]):
+        missing = list(dict.fromkeys(address for address in addresses if address not in self.local_pk_store))
+        chain = self._chain
+        if not missing or chain is None:
+            super().prefetch_public_keys(missing)
+            return
+
+        # Take valid keys from the persistent cache
+        block_number = self.conn.get_block_number()
+        min_block = block_number - cfg.keystore_pk_cache_blocks
+        query = 'SELECT address, pk FROM public_keys WHERE chain = ? AND crypto_backend = ? AND key_bits = ? AND block_number >= ?'
+        with self._lock:
+            for i in range(0, len(missing), 500):
+                chunk = [a.val.hex() for a in missing[i:i + 500]]
+                for address, pk in self._db.execute(f'{query} AND address IN ({",".join("?" * len(chunk))})',
+                                                    (chain, *self._key_scope, min_block, *chunk)):
+                    self.local_pk_store[AddressValue(address)] = PublicKeyValue(json.loads(pk))
+
+        # Request the remaining keys and remember at which block they were requested
+        missing = [address for address in missing if address not in self.local_pk_store]
+        if missing:
+            super().prefetch_public_keys(missing)
+            with self._lock, self._db:
+                self._db.executemany('INSERT OR REPLACE INTO public_keys VALUES (?, ?, ?, ?, ?, ?)',
+                                     [(chain, *self._key_scope, address.val.hex(), json.dumps(self.local_pk_store[address][:]), block_number)
+                                      for address in missing])
+
+    def forget_chain_state(self, keep_key_pairs: Optional[Iterable[AddressValue]] = None):
+        if keep_key_pairs is not None:
+            # Dropped key pairs must be looked up again
+            keep = set(keep_key_pairs)
+            self._looked_up = {address for address in self._looked_up if address in keep}
+            self._initialized = {address for address in self._initialized if address in keep}
+        super().forget_chain_state(keep_key_pairs)
+        chain = self._chain
+        if chain is not None:
+            with self._lock, self._db:
+                self._db.execute('DELETE FROM public_keys WHERE chain = ?', (chain, ))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -2,17 +2,21 @@ from __future__ import annotations
 from cloak.tests.utils.test_timer import sleep
 
 import inspect
+import json
+import os
 from contextlib import contextmanager, nullcontext
 from enum import IntEnum
-from typing import Dict, Union, Callable, Any, Optional, List, Tuple, ContextManager
+from typing import Dict, Union, Callable, Any, Optional, List, Tuple, ContextManager, Set
 
 from cloak.compiler.privacy.library_contracts import bn128_scalar_field
 from cloak.compiler.privacy.manifest import Manifest
 from cloak.config import cfg, zk_print, zk_print_banner
 from cloak.my_logging.log_context import log_context
 from cloak.transaction.int_casts import __convert as int_cast
-from cloak.transaction.interface import BlockChainError
+from cloak.transaction.interface import BlockChainError, PendingTransaction, CloakBlockchainInterface, ZkayKeystoreInterface, \
+    ZkayCryptoInterface, ZkayProverInterface
 from cloak.transaction.runtime import Runtime
+from cloak.transaction.state_cache import StateCache
 from cloak.transaction.types import AddressValue, RandomnessValue, CipherValue, MsgStruct, BlockStruct, TxStruct, Value, \
     PrivateKeyValue, PublicKeyValue
 from cloak.utils.progress_printer import fail_print
@@ -28,13 +32,39 @@ class RequireException(Exception):
 class StateDict:
     """Dictionary which wraps access to state variables"""
 
-    def __init__(self, api) -> None:
+    def __init__(self, api, cache: Optional[StateCache] = None) -> None:
         self.api = api
         self.__state: Dict[str, Any] = {}
         self.__constructors: Dict[str, Callable] = {}
 
-    def clear(self):
+        self.__cache = cache
+        self.__cache_scope: Optional[Tuple[str, int]] = None
+        """(contract address, block number) under which values are shared with other transactions via the cache"""
+
+        self.__written: Set[str] = set()
+
+        self.__view_block_number: Optional[int] = None
+        """Chain head shared by all view reads within view_scope"""
+
+    def clear(self, contract: Optional[str] = None, block_number: Optional[int] = None):
+        """
+        Clear the state scope (at the beginning and at the end of every transaction).
+
+        Locations which were written since the last clear are invalidated in the state cache.
+
+        :param contract: address of the contract whose state the next transaction accesses
+        :param block_number: number of the block at which the next transaction is executed, if both are given,
+                             values which other transactions read at the same block are reused via the state cache
+        """
+        if self.__cache is not None and self.__cache_scope is not None and self.__written:
+            self.__cache.invalidate(self.__cache_scope[0], self.__written)
         self.__state.clear()
+        self.__written.clear()
+        if self.__cache is None or contract is None or block_number is None:
+            self.__cache_scope = None
+        else:
+            self.__cache.set_block_number(block_number)
+            self.__cache_scope = (contract, block_number)
 
     def decl(self, name, constructor: Callable = lambda x: x, *, cipher: bool = False):
         """Define the wrapper constructor for a state variable."""
@@ -47,7 +77,7 @@ class StateDict:
 
     def get_plain(self, name: str, *indices):
         is_cipher, constr = self.__constructors[name]
-        val = self.__get((name, *indices), cache=False)
+        val = self.__get_view((name, *indices))
         if is_cipher:
             ret, _ = self.api.dec(val, constr)
             return ret
@@ -55,7 +85,47 @@ class StateDict:
             return val
 
     def get_raw(self, name: str, *indices):
-        return self.__get((name, *indices), cache=False)
+        return self.__get_view((name, *indices))
+
+    @contextmanager
+    def view_scope(self, block_number: Optional[int] = None):
+        """
+        Share a single chain head between all view reads (get_plain, get_raw) within the context.
+
+        Only relevant if state values are reused (cfg.strict_state_reads disabled): the head is then requested once when
+        entering the context (unless block_number, the number of the current head, is given) instead of once per view read.
+        """
+        prev = self.__view_block_number
+        if self.__cache is not None and not cfg.strict_state_reads:
+            self.__view_block_number = self.api.blockchain.get_block_number() if block_number is None else block_number
+        try:
+            yield
+        finally:
+            self.__view_block_number = prev
+
+    def __get_view(self, key: Tuple):
+        """
+        Return the value of key on the chain (ignoring values written by the current transaction).
+
+        If cfg.strict_state_reads is disabled, values are shared with other reads at the current chain head via the state
+        cache outside of transactions, such that repeated view calls do not request them again.
+        """
+        if self.__cache is None or cfg.strict_state_reads or self.__cache_scope is not None:
+            return self.__get(key, cache=False)
+
+        head = self.__view_block_number
+        if head is None:
+            head = self.api.blockchain.get_block_number()
+
+        # Same block number as the one at which the next transaction is executed (see ContractSimulator._function_ctx)
+        contract, block_number = str(self.api.verifier_contract_address), head + 1
+        self.__cache.set_block_number(block_number)
+        loc = self.__loc(key)
+        val = self.__cache.get(contract, loc, block_number)
+        if val is None:
+            val = self.__get(key, cache=False)
+            self.__cache.put(contract, loc, block_number, val)
+        return val
 
     def __getitem__(self, key: Union[str, Tuple]):
         """
@@ -82,6 +152,83 @@ class StateDict:
 
         # Write to state
         self.__state[loc] = value
+        self.__written.add(loc)
+
+    def prefetch(self, keys: List[Union[str, Tuple]]):
+        """
+        Load the values of all given state locations into the state scope using a single request.
+
+        Locations which are already in the state scope are skipped.
+
+        :param keys: state variable names (primitive variables) or tuples with the name and all index key values
+        :raise KeyError: if any location does not exist on the chain
+        """
+        requests = self.__prefetch_requests(keys)
+        if not requests:
+            return
+
+        try:
+            vals = self.api._req_state_vars(self.__state_var_requests(requests))
+        except BlockChainError:
+            raise KeyError(list(requests.values()))
+        self.__store_prefetched(requests, vals)
+
+    async def prefetch_async(self, keys: List[Union[str, Tuple]]):
+        """
+        Awaitable variant of prefetch.
+
+        With a blockchain backend which provides awaitable reads (e.g. w3-http-async), the values are requested
+        concurrently and other tasks of the event loop can run in the meantime.
+        """
+        requests = self.__prefetch_requests(keys)
+        if not requests:
+            return
+
+        try:
+            vals = await self.api._req_state_vars_async(self.__state_var_requests(requests))
+        except BlockChainError:
+            raise KeyError(list(requests.values()))
+        self.__store_prefetched(requests, vals)
+
+    def __prefetch_requests(self, keys: List[Union[str, Tuple]]) -> Dict[str, Tuple]:
+        """Return the keys (by location) which are neither in the state scope nor in the state cache."""
+        requests = {}
+        for key in keys:
+            if not isinstance(key, Tuple):
+                key = (key, )
+            loc = self.__loc(key)
+            if loc not in self.__state and loc not in requests and not self.__load_cached(loc):
+                requests[loc] = key
+        return requests
+
+    def __state_var_requests(self, requests: Dict[str, Tuple]) -> List[Tuple[str, Tuple, int]]:
+        return [(key[0], key[1:], cfg.cipher_len if self.__constructors[key[0]][0] else 0) for key in requests.values()]
+
+    def __store_prefetched(self, requests: Dict[str, Tuple], vals: List[Any]):
+        for (loc, key), val in zip(requests.items(), vals):
+            is_cipher, constr = self.__constructors[key[0]]
+            self.__state[loc] = CipherValue(val) if is_cipher else constr(val)
+            self.__store_cached(loc)
+
+    @staticmethod
+    def __loc(key: Tuple) -> str:
+        return key[0] + ''.join(f'[{k}]' for k in key[1:])
+
+    def __load_cached(self, loc: str) -> bool:
+        """Copy the value of loc from the state cache into the state scope, return whether it was cached."""
+        if self.__cache_scope is None:
+            return False
+        contract, block_number = self.__cache_scope
+        val = self.__cache.get(contract, loc, block_number)
+        if val is None:
+            return False
+        self.__state[loc] = val
+        return True
+
+    def __store_cached(self, loc: str):
+        if self.__cache_scope is not None:
+            contract, block_number = self.__cache_scope
+            self.__cache.put(contract, loc, block_number, self.__state[loc])
 
     def __get(self, key: Union[str, Tuple], cache: bool):
         if not isinstance(key, Tuple):
@@ -89,8 +236,8 @@ class StateDict:
         var, indices = key[0], key[1:]
         loc = var + ''.join(f'[{k}]' for k in key[1:])
 
-        # Retrieve from state scope
-        if cache and loc in self.__state:
+        # Retrieve from state scope (or from values which other transactions read at the same block)
+        if cache and (loc in self.__state or self.__load_cached(loc)):
             return self.__state[loc]
         else:
             is_cipher, constr = self.__constructors[var]
@@ -103,6 +250,7 @@ class StateDict:
                 raise KeyError(key)
             if cache:
                 self.__state[loc] = val
+                self.__store_cached(loc)
             return val
 
 
@@ -171,13 +319,19 @@ class ContractSimulator:
         self.locals: Optional[LocalsDict] = None
         """Hierarchical dictionary (scopes are managed internally) which holds the currently accessible local variables"""
 
-        self.state: StateDict = StateDict(self.api)
+        self.state: StateDict = StateDict(self.api, Runtime.state_cache())
         """
         Dict which stores stores state variable values. Empty at the beginning of a transaction.
         State variable read: 1. if not in dict -> request from chain and insert into dict, 2. return dict value
         State variable write: store in dict
         """
 
+        self.policy_path: Optional[str] = None
+        """Path to the privacy policy (policy.json) of the contract, which determines the state locations to prefetch"""
+
+        self.__prefetch_keys: Optional[Dict[str, List[Tuple]]] = None
+        """Statically resolved state locations which are read or mutated by each function (loaded lazily from the policy)"""
+
     @property
     def address(self):
         return self.api.address
@@ -229,9 +383,10 @@ class ContractSimulator:
 
     @staticmethod
     def initialize_keys_for(address: Union[bytes, str]):
-        """Generate/Load keys for the given address."""
+        """Generate/Load keys for the given address (unless the keystore already holds them)."""
         account = AddressValue(address)
-        Runtime.crypto().generate_or_load_key_pair(account)
+        if not Runtime.keystore().has_initialized_keys_for(account):
+            Runtime.crypto().generate_or_load_key_pair(account)
 
     @staticmethod
     def use_config_from_manifest(project_dir: str):
@@ -250,6 +405,8 @@ class ContractSimulator:
         """
         ContractSimulator.initialize_tee_account()
         accounts = Runtime.blockchain().create_test_accounts(count)
+        # Look up the stored keys of all accounts at once (the crypto backend still loads its key files)
+        Runtime.keystore().load_key_pairs([AddressValue(account) for account in accounts])
         for account in accounts:
             ContractSimulator.initialize_keys_for(account)
 
@@ -258,6 +415,38 @@ class ContractSimulator:
         else:
             return accounts
 
+    @staticmethod
+    def wait_for_transactions(pending: List[PendingTransaction]) -> List[Any]:
+        """
+        Wait until all given pipelined transactions (see cfg.pipelined_transactions) are included.
+
+        :param pending: handles returned by contract function calls (of any contract and sender)
+        :return: the transaction receipts, in the same order as pending
+        """
+        return Runtime.blockchain().wait_for_transactions(pending)
+
+    @staticmethod
+    def snapshot_chain() -> Any:
+        """
+        Take a snapshot of the chain state (if supported by backend).
+
+        :return: snapshot handle to pass to revert_chain
+        """
+        return Runtime.blockchain().snapshot(), list(Runtime.keystore().local_key_pairs)
+
+    @staticmethod
+    def revert_chain(snapshot: Any):
+        """
+        Restore the chain state at the time the snapshot was taken.
+
+        Cached state values and public keys are dropped, as are the key pairs of all accounts whose keys were initialized
+        after the snapshot was taken (test accounts which are handed out again get their keys initialized again).
+        """
+        chain_snapshot, key_pair_addresses = snapshot
+        Runtime.blockchain().revert(chain_snapshot)
+        Runtime.state_cache().clear()
+        Runtime.keystore().forget_chain_state(keep_key_pairs=key_pair_addresses)
+
     @staticmethod
     def initialize_tee_account():
         """
@@ -269,13 +458,67 @@ class ContractSimulator:
         address = AddressValue(account)
         Runtime.blockchain().set_tee_address(address)
 
+    def _policy_state_keys(self, name: str) -> List[Tuple]:
+        """
+        Return the state locations which function name reads or mutates according to the privacy policy.
+
+        Only locations whose keys can be resolved before the function is executed (constants and me/msg.sender/tx.origin)
+        are returned. Functions which are executed in the TEE are skipped, since their state is not read by the simulator.
+        """
+        if self.__prefetch_keys is None:
+            self.__prefetch_keys = {}
+            if self.policy_path is not None and os.path.exists(self.policy_path):
+                with open(self.policy_path) as f:
+                    policy = json.load(f)
+                for fct in policy.get('functions', []):
+                    if fct.get('privacy') != 3:  # FunctionPrivacyType.TEE
+                        self.__prefetch_keys.setdefault(fct['name'], []).extend(self.__resolve_policy_keys(fct))
+        return self.__prefetch_keys.get(name, [])
+
+    def __resolve_policy_keys(self, fct_policy: Dict) -> List[Tuple]:
+        keys = []
+        for var in fct_policy.get('read', []) + fct_policy.get('mutate', []):
+            if var['name'] not in self.state.names:
+                continue
+            if 'keys' not in var:
+                keys.append((var['name'], ))
+            for key in var.get('keys', []):
+                indices = [self.__resolve_policy_key(k.strip()) for k in key.split(':')]
+                if None not in indices:
+                    keys.append((var['name'], *indices))
+        return keys
+
+    def __resolve_policy_key(self, key: str) -> Union[None, int, AddressValue]:
+        if key in ['me', 'msg.sender', 'tx.origin']:
+            return self.api.user_address
+        elif key.isdigit():
+            return int(key)
+        else:
+            return None
+
+    def _prefetch_state(self, name: str):
+        """Warm the state dict with the statically known state locations of function name using a single request."""
+        keys = self._policy_state_keys(name)
+        if keys:
+            try:
+                self.state.prefetch(keys)
+            except KeyError:
+                # Some location does not exist on the chain, fall back to lazy requests
+                pass
+
     @contextmanager
     def _function_ctx(self, trans_sec_size=-1, *, wei_amount: int = 0, name: str = '?'):
         with self.api.api_function_ctx(trans_sec_size, wei_amount) as is_external:
             if is_external:
                 zk_print_banner(f'Calling {name}')
                 assert self.locals is None
-                self.state.clear()
+                if cfg.strict_state_reads or name == 'constructor':
+                    self.state.clear()
+                else:
+                    _, block, _ = self.api.get_special_variables()
+                    self.state.clear(str(self.api.verifier_contract_address), block.number)
+                if cfg.state_prefetch and name != 'constructor':
+                    self._prefetch_state(name)
                 t_idx = self.tidx.get(name, 0)
                 self.tidx[name] = t_idx + 1
 
@@ -302,12 +545,6 @@ class ContractSimulator:
 class ApiWrapper:
     def __init__(self, project_dir, contract_name, user_addr) -> None:
         super().__init__()
-        self.__blockchain = Runtime.blockchain()
-        self.__cloak_network = Runtime.cloak_network()
-        self.__keystore = Runtime.keystore()
-        self.__crypto = Runtime.crypto()
-        self.__prover = Runtime.prover()
-
         self.__project_dir = project_dir
         self.__contract_name = contract_name
 
@@ -374,6 +611,29 @@ class ApiWrapper:
     def blockchain(self):
         return self.__blockchain
 
+    # Backends are only initialized once they are first used (see Runtime), such that e.g. a client which only reads
+    # state does not pay for starting the cloak network or the prover.
+
+    @property
+    def __blockchain(self) -> CloakBlockchainInterface:
+        return Runtime.blockchain()
+
+    @property
+    def __cloak_network(self) -> CloakBlockchainInterface:
+        return Runtime.cloak_network()
+
+    @property
+    def __keystore(self) -> ZkayKeystoreInterface:
+        return Runtime.keystore()
+
+    @property
+    def __crypto(self) -> ZkayCryptoInterface:
+        return Runtime.crypto()
+
+    @property
+    def __prover(self) -> ZkayProverInterface:
+        return Runtime.prover()
+
     def get_my_sk(self) -> PrivateKeyValue:
         return self.__keystore.sk(self.user_address)
 
@@ -410,23 +670,45 @@ class ApiWrapper:
 
     def transact(self, fname: str, args: List, should_encrypt: List[bool], wei_amount: Optional[int] = None) -> Any:
         """
-        Transact to the blockchain
+        Transact to the blockchain (only submit the transaction and return a PendingTransaction if cfg.pipelined_transactions)
         """
+        if cfg.pipelined_transactions:
+            return self.__blockchain.submit(self.__private_contract_handle, self.__user_addr, fname, args, should_encrypt, wei_amount=wei_amount)
         return self.__blockchain.transact(self.__private_contract_handle, self.__user_addr, fname, args, should_encrypt, wei_amount=wei_amount)
 
     def tee_transact(self, fname: str, args: List, should_encrypt: List[bool], wei_amount: Optional[int] = None) -> Any:
         """
         Transact to the cloak network
+
+        If the cloak network reports TEE results, the result is returned as soon as the TEE executed the transaction
+        (i.e. once all parties provided their inputs), otherwise the transaction receipt is returned.
         """
         return self.__cloak_network.transact(self.__private_contract_handle, self.__user_addr, fname, args, should_encrypt, wei_amount=wei_amount)
 
     def call(self, fname: str, args: List, ret_val_constructors: List[Tuple[bool, Callable]]):
         retvals = self.__blockchain.call(self.__verifier_contract_handle, self.__user_addr, fname, *args)
+        return self.__get_decrypted_retvals(retvals, ret_val_constructors)
+
+    async def call_async(self, fname: str, args: List, ret_val_constructors: List[Tuple[bool, Callable]]):
+        """Awaitable variant of call, the call is only awaited if the blockchain backend provides call_async."""
+        if hasattr(self.__blockchain, 'call_async'):
+            retvals = await self.__blockchain.call_async(self.__verifier_contract_handle, self.__user_addr, fname, *args)
+        else:
+            retvals = self.__blockchain.call(self.__verifier_contract_handle, self.__user_addr, fname, *args)
+        return self.__get_decrypted_retvals(retvals, ret_val_constructors)
+
+    def __get_decrypted_retvals(self, retvals, ret_val_constructors: List[Tuple[bool, Callable]]):
         if len(ret_val_constructors) == 1:
             return self.__get_decrypted_retval(retvals, *ret_val_constructors[0])
         else:
-            return tuple([self.__get_decrypted_retval(retval, is_cipher, constr)
-                          for retval, (is_cipher, constr) in zip(retvals, ret_val_constructors)])
+            # Decrypt all cipher return values at once
+            ret = [constr(retval) if not is_cipher else None for retval, (is_cipher, constr) in zip(retvals, ret_val_constructors)]
+            cipher_indices = [idx for idx, (is_cipher, _) in enumerate(ret_val_constructors) if is_cipher]
+            plains = self.dec_many([CipherValue(retvals[idx]) for idx in cipher_indices],
+                                   [ret_val_constructors[idx][1] for idx in cipher_indices]) if cipher_indices else []
+            for idx, (plain, _) in zip(cipher_indices, plains):
+                ret[idx] = plain
+            return tuple(ret)
 
     def __get_decrypted_retval(self, raw_value, is_cipher, constructor):
         return self.dec(CipherValue(raw_value), constructor)[0] if is_cipher else constructor(raw_value)
@@ -449,6 +731,18 @@ class ApiWrapper:
         res = self.__crypto.dec(cipher, self.__user_addr)
         return constr(res[0]), res[1]
 
+    def enc_many(self, plains: List[Union[int, AddressValue]], target_addrs: Optional[List[Optional[AddressValue]]] = None) -> List[Tuple[CipherValue, Optional[RandomnessValue]]]:
+        """Encrypt plains[i] for target_addrs[i] (default: for the user), see ZkayCryptoInterface.enc_many."""
+        if target_addrs is None:
+            target_addrs = [None] * len(plains)
+        target_addrs = [self.__user_addr if addr is None else addr for addr in target_addrs]
+        return self.__crypto.enc_many(plains, self.__user_addr, target_addrs)
+
+    def dec_many(self, ciphers: List[CipherValue], constrs: List[Callable[[int], Any]]) -> List[Tuple[Any, Optional[RandomnessValue]]]:
+        """Decrypt all ciphers and wrap the results with the corresponding constructors, see ZkayCryptoInterface.dec_many."""
+        res = self.__crypto.dec_many(ciphers, self.__user_addr)
+        return [(constr(plain), rnd) for constr, (plain, rnd) in zip(constrs, res)]
+
     def _req_state_var(self, name: str, *indices, count=0) -> Any:
         if self.__verifier_contract_handle is None:
             # TODO check this statically in the type checker
@@ -457,9 +751,55 @@ class ApiWrapper:
         if count == 0:
             val = self.__blockchain.req_state_var(self.__verifier_contract_handle, name, *indices)
         else:
-            val = [self.__blockchain.req_state_var(self.__verifier_contract_handle, name, *indices, i) for i in range(count)]
+            # Request all elements (e.g. of a cipher text) at once
+            val = self.__blockchain.req_state_vars(self.__verifier_contract_handle, [(name, (*indices, i)) for i in range(count)])
         return val
 
+    def _req_state_vars(self, requests: List[Tuple[str, Tuple, int]]) -> List[Any]:
+        """
+        Request the values of several state variable locations at once.
+
+        :param requests: list of (name, indices, count) tuples, with the same meaning as the arguments of _req_state_var
+        :return: list with the result of _req_state_var for every request
+        """
+        if self.__verifier_contract_handle is None:
+            raise ValueError(f'Cannot read state variables within constructor before they are assigned a value.')
+
+        flat_vals = self.__blockchain.req_state_vars(self.__verifier_contract_handle, self.__flatten_state_requests(requests))
+        return self.__group_state_values(requests, flat_vals)
+
+    async def _req_state_vars_async(self, requests: List[Tuple[str, Tuple, int]]) -> List[Any]:
+        """
+        Awaitable variant of _req_state_vars.
+
+        If the blockchain backend provides req_state_vars_async, the values are requested concurrently without
+        blocking the event loop, otherwise this falls back to the (batched) synchronous request.
+        """
+        if self.__verifier_contract_handle is None:
+            raise ValueError(f'Cannot read state variables within constructor before they are assigned a value.')
+
+        flat_requests = self.__flatten_state_requests(requests)
+        if hasattr(self.__blockchain, 'req_state_vars_async'):
+            flat_vals = await self.__blockchain.req_state_vars_async(self.__verifier_contract_handle, flat_requests)
+        else:
+            flat_vals = self.__blockchain.req_state_vars(self.__verifier_contract_handle, flat_requests)
+        return self.__group_state_values(requests, flat_vals)
+
+    @staticmethod
+    def __flatten_state_requests(requests: List[Tuple[str, Tuple, int]]) -> List[Tuple[str, Tuple]]:
+        flat_requests = []
+        for name, indices, count in requests:
+            flat_requests += [(name, tuple(indices))] if count == 0 else [(name, (*indices, i)) for i in range(count)]
+        return flat_requests
+
+    @staticmethod
+    def __group_state_values(requests: List[Tuple[str, Tuple, int]], flat_vals: List[Any]) -> List[Any]:
+        vals, idx = [], 0
+        for _, _, count in requests:
+            vals.append(flat_vals[idx] if count == 0 else flat_vals[idx:idx + count])
+            idx += max(count, 1)
+        return vals
+
     def check_policy_consistency(self, params):
         # TODO: check the correct and completeness of params according to policy in json
         return True
@@ -1,13 +1,19 @@
+import atexit
+import time
+from typing import Callable, Dict, TypeVar
+
+from cloak import my_logging
 from cloak.config import cfg
 from cloak.transaction.crypto.ecdh_chaskey import EcdhChaskeyCrypto
 from cloak.transaction.interface import CloakBlockchainInterface, ZkayCryptoInterface, ZkayKeystoreInterface, ZkayProverInterface
-from cloak.transaction.blockchain import Web3TesterBlockchain, Web3HttpGanacheBlockchain, Web3IpcBlockchain, Web3WebsocketBlockchain, Web3HttpBlockchain, Web3CustomBlockchain, Web3CloakCCFNetwork
+from cloak.transaction.blockchain import Web3TesterBlockchain, Web3HttpGanacheBlockchain, Web3IpcBlockchain, Web3WebsocketBlockchain, Web3HttpBlockchain, Web3AsyncHttpBlockchain, Web3CustomBlockchain, Web3CloakCCFNetwork
 from cloak.transaction.crypto.ecdh_aes import EcdhAesCrypto
 from cloak.transaction.crypto.dummy import DummyCrypto
 from cloak.transaction.crypto.rsa_pkcs15 import RSAPKCS15Crypto
 from cloak.transaction.crypto.rsa_oaep import RSAOAEPCrypto
 from cloak.transaction.keystore import *
 from cloak.transaction.prover import *
+from cloak.transaction.state_cache import StateCache
 
 _crypto_classes = {
     'dummy': DummyCrypto,
@@ -21,16 +27,24 @@ _prover_classes = {
     'jsnark': JsnarkProver
 }
 
+_keystore_classes = {
+    'simple': SimpleKeystore,
+    'sqlite': SqliteKeystore
+}
+
 _blockchain_classes = {
     'w3-eth-tester': Web3TesterBlockchain,
     'w3-ganache': Web3HttpGanacheBlockchain,
     'w3-ipc': Web3IpcBlockchain,
     'w3-websocket': Web3WebsocketBlockchain,
     'w3-http': Web3HttpBlockchain,
+    'w3-http-async': Web3AsyncHttpBlockchain,
     'w3-custom': Web3CustomBlockchain,
     'w3-ccf': Web3CloakCCFNetwork
 }
 
+T = TypeVar('T')
+
 
 class Runtime:
     """
@@ -38,6 +52,10 @@ class Runtime:
     See interface.py for more information.
 
     The global configuration in config.py determines which backends are made available via the Runtime class.
+
+    Backends are created lazily on first use (e.g. a client which only reads state never initializes the cloak network
+    or the prover). The time needed to initialize each backend is logged as init_<backend> and available via init_times().
+    Cache statistics are logged once per runtime, see log_cache_statistics().
     """
 
     __blockchain = None
@@ -45,6 +63,8 @@ class Runtime:
     __crypto = None
     __keystore = None
     __prover = None
+    __state_cache = None
+    __init_times: Dict[str, float] = {}
 
     @staticmethod
     def reset():
@@ -53,17 +73,45 @@ class Runtime:
 
         When a new backend is selected in the configuration, it will only be loaded after a runtime reset.
         """
+        Runtime.log_cache_statistics()
         Runtime.__blockchain = None
         Runtime.__cloak_network = None
         Runtime.__crypto = None
         Runtime.__keystore = None
         Runtime.__prover = None
+        Runtime.__state_cache = None
+        Runtime.__init_times = {}
+
+    @staticmethod
+    def init_times() -> Dict[str, float]:
+        """Return the initialization time in seconds of each backend which was created since the last reset."""
+        return dict(Runtime.__init_times)
+
+    @staticmethod
+    def log_cache_statistics():
+        """Log the hit and miss counts of the ecdh shared key cache and of the state cache (on reset and at exit)."""
+        shared_keys = getattr(Runtime.__crypto, 'shared_keys', None)
+        if shared_keys is not None:
+            my_logging.data('ecdhKeyCacheHits', shared_keys.hits)
+            my_logging.data('ecdhKeyCacheMisses', shared_keys.misses)
+        if Runtime.__state_cache is not None:
+            my_logging.data('stateCacheHits', Runtime.__state_cache.hits)
+            my_logging.data('stateCacheMisses', Runtime.__state_cache.misses)
+
+    @staticmethod
+    def __init_backend(name: str, create: Callable[[], T]) -> T:
+        start = time.perf_counter()
+        backend = create()
+        elapsed = time.perf_counter() - start
+        Runtime.__init_times[name] = elapsed
+        my_logging.data(f'init_{name}', elapsed)
+        return backend
 
     @staticmethod
     def blockchain() -> CloakBlockchainInterface:
         """Return singleton object which implements CloakBlockchainInterface."""
         if Runtime.__blockchain is None:
-            Runtime.__blockchain = _blockchain_classes[cfg.blockchain_backend]()
+            Runtime.__blockchain = Runtime.__init_backend('blockchain', _blockchain_classes[cfg.blockchain_backend])
             from cloak.transaction.types import AddressValue
             AddressValue.get_balance = Runtime.__blockchain.get_balance
 
@@ -73,26 +121,38 @@ class Runtime:
     def cloak_network() -> CloakBlockchainInterface:
         """Return singleton object which implements CloakBlockchainInterface."""
         if Runtime.__cloak_network is None:
-            Runtime.__cloak_network = _blockchain_classes[cfg.cloak_network]()
+            Runtime.__cloak_network = Runtime.__init_backend('cloak_network', _blockchain_classes[cfg.cloak_network])
         return Runtime.__cloak_network
 
     @staticmethod
     def keystore() -> ZkayKeystoreInterface:
         """Return singleton object which implements ZkayKeystoreInterface."""
         if Runtime.__keystore is None:
-            Runtime.__keystore = SimpleKeystore(Runtime.blockchain())
+            blockchain = Runtime.blockchain()
+            Runtime.__keystore = Runtime.__init_backend('keystore', lambda: _keystore_classes[cfg.keystore_backend](blockchain))
         return Runtime.__keystore
 
     @staticmethod
     def crypto() -> ZkayCryptoInterface:
         """Return singleton object which implements ZkayCryptoInterface."""
         if Runtime.__crypto is None:
-            Runtime.__crypto = _crypto_classes[cfg.crypto_backend](Runtime.keystore())
+            keystore = Runtime.keystore()
+            Runtime.__crypto = Runtime.__init_backend('crypto', lambda: _crypto_classes[cfg.crypto_backend](keystore))
         return Runtime.__crypto
 
     @staticmethod
     def prover() -> ZkayProverInterface:
         """Return singleton object which implements ZkayProverInterface."""
         if Runtime.__prover is None:
-            Runtime.__prover = _prover_classes[cfg.snark_backend]()
+            Runtime.__prover = Runtime.__init_backend('prover', _prover_classes[cfg.snark_backend])
         return Runtime.__prover
+
+    @staticmethod
+    def state_cache() -> StateCache:
+        """Return singleton cache of state values which is shared between the transactions of all contract simulators."""
+        if Runtime.__state_cache is None:
+            Runtime.__state_cache = StateCache()
+        return Runtime.__state_cache
+
+
+atexit.register(Runtime.log_cache_statistics)
@@ -0,0 +1,50 @@
+from typing import Dict, Tuple, Any, Optional, Iterable
+
+
+class StateCache:
+    """
+    Cache of contract state values which were read from the chain, shared between transactions.
+
+    Values are keyed by (contract address, state location) and are only valid for the block number at which they were
+    read. Whenever a transaction is issued at a different block number (i.e. the chain head advanced), all values are
+    discarded. Locations which are written by an own transaction are invalidated once the transaction completes.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._block_number: Optional[int] = None
+        self._vals: Dict[Tuple[str, str], Any] = {}
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def set_block_number(self, block_number: int):
+        """Select the block at which subsequent values are read, discards all values if the chain head advanced."""
+        if block_number != self._block_number:
+            self._vals.clear()
+            self._block_number = block_number
+
+    def get(self, contract: str, loc: str, block_number: int) -> Optional[Any]:
+        """Return the cached value of location loc at block block_number or None."""
+        val = self._vals.get((contract, loc)) if block_number == self._block_number else None
+        if val is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return val
+
+    def put(self, contract: str, loc: str, block_number: int, val: Any):
+        if block_number == self._block_number:
+            self._vals[(contract, loc)] = val
+
+    def invalidate(self, contract: str, locs: Iterable[str]):
+        """Discard the cached values of the given locations (e.g. after they were written by an own transaction)."""
+        for loc in locs:
+            self._vals.pop((contract, loc), None)
+
+    def clear(self):
+        self._vals.clear()
+        self._block_number = None